@@ -17,12 +17,17 @@ BalancedRearrangment = collections.namedtuple(
 )
 
 
-def detect_balanced_rearrangements(
-    breakpoints,
-    dec_nt_per_break=2000.,
-    inc_nt_per_break=500.,
-    cost_resolution=1000.,
-):
+def create_genome_graph(breakpoints):
+    """ Create a genome graph of break ends, breakpoints and segments.
+
+    Args:
+        breakpoints (pandas.DataFrame): breakpoints table
+
+    Returns:
+        networkx.Graph: genome graph with break end tuple nodes
+
+    """
+
     G = networkx.Graph()
 
     breakpoints = breakpoints.copy()
@@ -45,46 +50,72 @@ def detect_balanced_rearrangements(
     break_ends.drop_duplicates(inplace=True)
 
     # Add break end nodes
-    for idx in break_ends.index:
-        break_end = (
-            break_ends.loc[idx, 'chromosome'],
-            break_ends.loc[idx, 'position'],
-            break_ends.loc[idx, 'strand'],
-        )
-        G.add_node(break_end)
+    G.add_nodes_from(zip(
+        break_ends['chromosome'].tolist(),
+        break_ends['position'].tolist(),
+        break_ends['strand'].tolist(),
+    ))
 
     # Add breakpoint edges
-    for idx in breakpoints.index:
-        break_end_1 = (
-            breakpoints.loc[idx, 'chromosome_1'],
-            breakpoints.loc[idx, 'position_1'],
-            breakpoints.loc[idx, 'strand_1'],
-        )
-        break_end_2 = (
-            breakpoints.loc[idx, 'chromosome_2'],
-            breakpoints.loc[idx, 'position_2'],
-            breakpoints.loc[idx, 'strand_2'],
-        )
-        prediction_id = breakpoints.loc[idx, 'prediction_id']
-        G.add_edge(break_end_1, break_end_2, edge_type='breakpoint', prediction_id=prediction_id)
+    break_ends_1 = zip(
+        breakpoints['chromosome_1'].tolist(),
+        breakpoints['position_1'].tolist(),
+        breakpoints['strand_1'].tolist(),
+    )
+    break_ends_2 = zip(
+        breakpoints['chromosome_2'].tolist(),
+        breakpoints['position_2'].tolist(),
+        breakpoints['strand_2'].tolist(),
+    )
+    G.add_edges_from(
+        (break_end_1, break_end_2, {'edge_type': 'breakpoint', 'prediction_id': prediction_id})
+        for break_end_1, break_end_2, prediction_id in zip(
+            break_ends_1, break_ends_2, breakpoints['prediction_id'].tolist()))
 
     # Add reference and segment edges
     for chromosome, chrom_break_ends in break_ends.groupby('chromosome'):
-        chrom_break_ends = chrom_break_ends.sort_values('position')
+        positions = np.sort(chrom_break_ends['position'].values).tolist()
 
         # Add reference edges
-        for position in chrom_break_ends['position'].values:
-            break_end_1 = (chromosome, position, '+')
-            break_end_2 = (chromosome, position, '-')
-            G.add_edge(break_end_1, break_end_2, edge_type='reference')
+        G.add_edges_from(
+            ((chromosome, position, '+'), (chromosome, position, '-'), {'edge_type': 'reference'})
+            for position in positions)
 
         # Add segment edges
-        for start, end in itertools.izip(chrom_break_ends['position'].values[:-1], chrom_break_ends['position'].values[1:]):
-            break_end_1 = (chromosome, start, '-')
-            break_end_2 = (chromosome, end, '+')
-            length = end - start
-            G.add_edge(break_end_1, break_end_2, edge_type='segment', length=length)
+        G.add_edges_from(
+            ((chromosome, start, '-'), (chromosome, end, '+'), {'edge_type': 'segment', 'length': end - start})
+            for start, end in itertools.izip(positions[:-1], positions[1:]))
+
+    return G
+
 
+def detect_balanced_rearrangements(
+    breakpoints,
+    dec_nt_per_break=2000.,
+    inc_nt_per_break=500.,
+    cost_resolution=1000.,
+):
+    G = create_genome_graph(breakpoints)
+
+    # Matching is independent for each connected component of the genome graph
+    rearrangements = []
+    for nodes in networkx.connected_components(G):
+        rearrangements.extend(detect_component_rearrangements(
+            G.subgraph(nodes),
+            dec_nt_per_break=dec_nt_per_break,
+            inc_nt_per_break=inc_nt_per_break,
+            cost_resolution=cost_resolution,
+        ))
+
+    return rearrangements
+
+
+def detect_component_rearrangements(
+    G,
+    dec_nt_per_break=2000.,
+    inc_nt_per_break=500.,
+    cost_resolution=1000.,
+):
     # Create a genome modification graph
     #  - identical node set as genome graph
     #  - create a +1 and -1 signed edge for each original edge
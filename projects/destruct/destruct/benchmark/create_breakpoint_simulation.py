@@ -1,8 +1,10 @@
 import random
 import os
 import subprocess
+import numpy as np
 import pandas as pd
 
+import destruct.utils.fastq
 import destruct.utils.seq
 import destruct.utils.misc
 
@@ -121,6 +123,319 @@ def create_random_breakpoint(genome, adjacent_length, num_inserted, required_hom
             pos1, pos2 = norm_pos1, norm_pos2
         return chr1, str1, pos1, chr2, str2, pos2, inserted, sequence, homology
 
+
+class EncodedGenome(object):
+    """ Genome sequences concatenated into a single uint8 array.
+
+    Args:
+        genome (dict): sequences keyed by chromosome
+
+    """
+
+    def __init__(self, genome):
+        self.chromosomes = np.array(sorted(genome.keys()))
+        self.lengths = np.array([len(genome[a]) for a in self.chromosomes])
+        self.offsets = np.concatenate([[0], np.cumsum(self.lengths)[:-1]])
+        self.sequence = np.frombuffer(''.join(genome[a] for a in self.chromosomes), dtype=np.uint8)
+
+    def random_positions(self, size, dist_to_end, random_state):
+        """ Generate random chromosome indices, strands and 1-based positions.
+
+        Positions are uniform over the genome excluding dist_to_end from
+        either end of each chromosome, as for `random_chromosome_position`.
+
+        """
+
+        usable_lengths = np.maximum(self.lengths - 2 * dist_to_end, 0)
+        usable_offsets = np.concatenate([[0], np.cumsum(usable_lengths)[:-1]])
+
+        genome_position = random_state.randint(0, usable_lengths.sum(), size=size)
+        chrom_idx = np.searchsorted(usable_offsets, genome_position, side='right') - 1
+        position = genome_position - usable_offsets[chrom_idx] + dist_to_end + 1
+
+        strand = np.where(random_state.randint(0, 2, size=size) == 0, '+', '-')
+
+        return chrom_idx, strand, position
+
+    def gather(self, chrom_idx, start, length):
+        """ Gather sequences of a fixed length from 1-based start positions.
+
+        Returns:
+            numpy.array: 2 dimensional uint8 array of nucleotides
+
+        """
+
+        idx = (self.offsets[chrom_idx] + start - 1)[:, np.newaxis] + np.arange(length)
+        return self.sequence[idx]
+
+
+def _reverse_complement_rows(sequences, rows):
+    """ Reverse complement selected rows of a 2 dimensional nucleotide array.
+    """
+
+    sequences = sequences.copy()
+    sequences[rows] = destruct.utils.misc._complement[sequences[rows, ::-1]]
+    return sequences
+
+
+def _prefix_match_length(seq1, seq2):
+    """ Batched `max_similar` for 2 dimensional nucleotide arrays.
+    """
+
+    similar = seq1 == seq2
+    return np.where(similar.all(axis=1), similar.shape[1], np.argmin(similar, axis=1))
+
+
+def _create_distinct_batch(downstream1, downstream2, num_inserted, random_state):
+    """ Batched `create_distinct`, inserted nucleotides differing from both
+    downstream sequences, as a list of strings.
+    """
+
+    nucleotides = np.frombuffer(b'ACTG', dtype=np.uint8)
+
+    max_inserted = num_inserted.max() if len(num_inserted) > 0 else 0
+    downstream1, downstream2 = [
+        np.where((a >= ord('a')) & (a <= ord('z')), a - 32, a).astype(np.uint8)
+        for a in (downstream1[:, :max_inserted], downstream2[:, :max_inserted])]
+
+    # Uniform choice among allowed nucleotides at each inserted position
+    allowed = (
+        (nucleotides[np.newaxis, np.newaxis, :] != downstream1[:, :, np.newaxis]) &
+        (nucleotides[np.newaxis, np.newaxis, :] != downstream2[:, :, np.newaxis]))
+    choice = (random_state.random_sample(allowed.shape[:2]) * allowed.sum(axis=2)).astype(int)
+    chosen = np.argmax(np.cumsum(allowed, axis=2) > choice[:, :, np.newaxis], axis=2)
+    inserted = nucleotides[chosen]
+
+    return [inserted[idx, :num_inserted[idx]].tostring() for idx in xrange(len(num_inserted))]
+
+
+def create_random_breakpoints(genome, adjacent_length, num_inserted, required_homology, random_state, batch_size=10000):
+    """ Create a batch of random breakpoints with the required parameters.
+
+    Args:
+        genome (dict): sequences keyed by chromosome
+        adjacent_length (int): length of sequence either side of the breakpoint
+        num_inserted (numpy.array): number of inserted nucleotides per breakpoint
+        required_homology (numpy.array): required homology per breakpoint
+        random_state (numpy.random.RandomState): random number generator
+
+    KwArgs:
+        batch_size (int): number of candidate breakpoints drawn at once
+
+    Returns:
+        pandas.DataFrame: breakpoints as for `create_random_breakpoint`
+
+    Batched equivalent of `create_random_breakpoint`.  Candidate breakpoints
+    are drawn in batches and assigned to breakpoints requiring the candidate's
+    homology until all breakpoints are assigned.
+
+    """
+
+    encoded = EncodedGenome(genome)
+
+    num_inserted = np.minimum(np.asarray(num_inserted), adjacent_length)
+    required_homology = np.asarray(required_homology)
+    num_breakpoints = len(required_homology)
+
+    columns = dict(
+        chrom_idx_1=np.zeros(num_breakpoints, dtype=int), strand_1=np.zeros(num_breakpoints, dtype='S1'),
+        position_1=np.zeros(num_breakpoints, dtype=int), chrom_idx_2=np.zeros(num_breakpoints, dtype=int),
+        strand_2=np.zeros(num_breakpoints, dtype='S1'), position_2=np.zeros(num_breakpoints, dtype=int),
+        homology=np.zeros(num_breakpoints, dtype=int))
+    sequences = dict(
+        (name, np.zeros((num_breakpoints, adjacent_length), dtype=np.uint8))
+        for name in ('upstream1', 'downstream1', 'upstream2', 'downstream2'))
+
+    assigned = np.zeros(num_breakpoints, dtype=bool)
+
+    while not assigned.all():
+        chrom_idx_1, strand_1, position_1 = encoded.random_positions(batch_size, adjacent_length, random_state)
+        chrom_idx_2, strand_2, position_2 = encoded.random_positions(batch_size, adjacent_length, random_state)
+
+        # Upstream sequences include the breakend position, downstream
+        # sequences start at the adjacent position
+        upstream1 = encoded.gather(chrom_idx_1, np.where(strand_1 == '+', position_1 - adjacent_length + 1, position_1), adjacent_length)
+        downstream1 = encoded.gather(chrom_idx_1, np.where(strand_1 == '+', position_1 + 1, position_1 - adjacent_length), adjacent_length)
+        upstream2 = encoded.gather(chrom_idx_2, np.where(strand_2 == '+', position_2 - adjacent_length + 1, position_2), adjacent_length)
+        downstream2 = encoded.gather(chrom_idx_2, np.where(strand_2 == '+', position_2 + 1, position_2 - adjacent_length), adjacent_length)
+
+        upstream1 = _reverse_complement_rows(upstream1, strand_1 != '+')
+        downstream1 = _reverse_complement_rows(downstream1, strand_1 != '+')
+        upstream2 = _reverse_complement_rows(upstream2, strand_2 != '-')
+        downstream2 = _reverse_complement_rows(downstream2, strand_2 != '-')
+
+        homology = (
+            _prefix_match_length(upstream1[:, ::-1], downstream2[:, ::-1]) +
+            _prefix_match_length(upstream2, downstream1))
+
+        is_n = np.frombuffer(b'Nn', dtype=np.uint8)
+        valid = ~(np.in1d(upstream1, is_n).reshape(upstream1.shape).any(axis=1) |
+                  np.in1d(upstream2, is_n).reshape(upstream2.shape).any(axis=1))
+
+        batch_columns = dict(
+            chrom_idx_1=chrom_idx_1, strand_1=strand_1, position_1=position_1,
+            chrom_idx_2=chrom_idx_2, strand_2=strand_2, position_2=position_2,
+            homology=homology)
+        batch_sequences = dict(
+            upstream1=upstream1, downstream1=downstream1,
+            upstream2=upstream2, downstream2=downstream2)
+
+        # Assign valid candidates to unassigned breakpoints in order, by homology
+        for value in np.unique(required_homology[~assigned]):
+            pending = np.flatnonzero(~assigned & (required_homology == value))
+            available = np.flatnonzero(valid & (homology == value))[:len(pending)]
+            pending = pending[:len(available)]
+            assigned[pending] = True
+            for name in columns:
+                columns[name][pending] = batch_columns[name][available]
+            for name in sequences:
+                sequences[name][pending] = batch_sequences[name][available]
+
+    breakpoints = pd.DataFrame({
+        'chromosome_1': encoded.chromosomes[columns['chrom_idx_1']],
+        'strand_1': columns['strand_1'].astype(object),
+        'position_1': columns['position_1'],
+        'chromosome_2': encoded.chromosomes[columns['chrom_idx_2']],
+        'strand_2': columns['strand_2'].astype(object),
+        'position_2': columns['position_2'],
+        'homology': columns['homology'],
+    })
+
+    upstream1, downstream1, upstream2, downstream2 = [
+        sequences[name] for name in ('upstream1', 'downstream1', 'upstream2', 'downstream2')]
+
+    breakpoints['inserted'] = _create_distinct_batch(downstream1, downstream2, num_inserted, random_state)
+
+    breakpoints['sequence'] = [
+        upstream1[idx].tostring() + breakpoints['inserted'].iloc[idx] + upstream2[idx].tostring()
+        for idx in xrange(num_breakpoints)]
+
+    # Normalize breakpoints without inserted sequence
+    no_inserted = (breakpoints['inserted'] == '').values
+    if no_inserted.any():
+        norm_pos_1, norm_pos_2, homology_check = destruct.utils.misc.normalize_breakpoints(
+            *[breakpoints.loc[no_inserted, a].values for a in (
+                'chromosome_1', 'strand_1', 'position_1', 'chromosome_2', 'strand_2', 'position_2')],
+            genome=genome)
+
+        mismatched = homology_check != breakpoints.loc[no_inserted, 'homology'].values
+        if mismatched.any():
+            row = breakpoints.loc[no_inserted].loc[mismatched].iloc[0]
+            raise Exception(
+                '''homology {} doesnt match expected homology {} for 
+                breakpoint {} {} {}, {} {} {}'''.format(
+                    homology_check[mismatched][0], row['homology'],
+                    row['chromosome_1'], row['strand_1'], row['position_1'],
+                    row['chromosome_2'], row['strand_2'], row['position_2']))
+
+        breakpoints.loc[no_inserted, 'position_1'] = norm_pos_1
+        breakpoints.loc[no_inserted, 'position_2'] = norm_pos_2
+
+    return breakpoints
+
+
+def simulate_reads(sequences, read_count, fragment_mean, fragment_stddev, read_length,
+                   reads1_filename_callback, reads2_filename_callback, random_state,
+                   reads_per_file=None, error_rate=0.0, read_id_start=0, compress_level=6,
+                   batch_size=100000):
+    """ Simulate paired end reads from fragments of a set of sequences.
+
+    Args:
+        sequences (list): sequences from which to sample fragments
+        read_count (int): number of read pairs
+        fragment_mean (float): mean fragment length
+        fragment_stddev (float): standard deviation of fragment length
+        read_length (int): length of each read
+        reads1_filename_callback (callable): end 1 fastq filename from file number
+        reads2_filename_callback (callable): end 2 fastq filename from file number
+        random_state (numpy.random.RandomState): random number generator
+
+    KwArgs:
+        reads_per_file (int): read pairs per fastq shard, None for a single file
+        error_rate (float): per base substitution error rate
+        read_id_start (int): first read id
+        compress_level (int): gzip compression level, None for uncompressed
+        batch_size (int): number of read pairs simulated at once
+
+    Reads are named with integer ids as for `destruct_bamdiscordantfastq`.  Fragments are sampled proportional to
+    sequence length from either strand.
+
+    """
+
+    lengths = np.array([len(a) for a in sequences])
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    concatenated = np.frombuffer(''.join(sequences), dtype=np.uint8)
+
+    nucleotides = np.frombuffer(b'ACGT', dtype=np.uint8)
+
+    if reads_per_file is None:
+        reads_per_file = read_count
+
+    def read_blocks():
+        for batch_start in xrange(0, read_count, batch_size):
+            batch_end = min(batch_start + batch_size, read_count)
+            num_reads = batch_end - batch_start
+
+            seq_idx = np.searchsorted(np.cumsum(lengths), random_state.random_sample(num_reads) * lengths.sum(), side='right')
+            fragment_length = np.round(random_state.normal(fragment_mean, fragment_stddev, size=num_reads)).astype(int)
+            fragment_length = np.clip(fragment_length, read_length, lengths[seq_idx])
+            fragment_start = offsets[seq_idx] + (random_state.random_sample(num_reads) * (lengths[seq_idx] - fragment_length + 1)).astype(int)
+            fragment_end = fragment_start + fragment_length
+
+            reads = [
+                concatenated[fragment_start[:, np.newaxis] + np.arange(read_length)],
+                destruct.utils.misc._complement[concatenated[fragment_end[:, np.newaxis] - np.arange(1, read_length + 1)]],
+            ]
+
+            # Fragments from the reverse strand
+            flip = random_state.randint(0, 2, size=num_reads) == 1
+            reads[0][flip], reads[1][flip] = reads[1][flip], reads[0][flip].copy()
+
+            for read_end in (0, 1):
+                if error_rate > 0:
+                    errors = random_state.random_sample(reads[read_end].shape) < error_rate
+                    reads[read_end][errors] = nucleotides[random_state.randint(0, 4, size=errors.sum())]
+
+            # Split the batch at file boundaries
+            batch_read_ids = np.arange(batch_start, batch_end)
+            file_numbers = batch_read_ids // reads_per_file
+            for file_number in np.unique(file_numbers):
+                rows = np.flatnonzero(file_numbers == file_number)
+                blocks = list()
+                for read_end in (0, 1):
+                    lines = [None] * (4 * len(rows))
+                    lines[0::4] = ['@{0}/{1}'.format(read_id_start + a, read_end + 1) for a in batch_read_ids[rows]]
+                    lines[1::4] = [a.tostring() for a in reads[read_end][rows]]
+                    lines[2::4] = ['+'] * len(rows)
+                    lines[3::4] = ['I' * read_length] * len(rows)
+                    blocks.append('\n'.join(lines) + '\n')
+                yield file_number, blocks
+
+    # Write each batch as it is simulated, with one open file per end
+    filename_callbacks = (reads1_filename_callback, reads2_filename_callback)
+    out_files = None
+    out_file_number = None
+
+    try:
+        for file_number, blocks in read_blocks():
+            if file_number != out_file_number:
+                if out_files is not None:
+                    for out_file in out_files:
+                        out_file.close()
+                out_files = [open(callback(file_number), 'wb') for callback in filename_callbacks]
+                out_file_number = file_number
+
+            for out_file, data in zip(out_files, blocks):
+                if compress_level is not None:
+                    data = destruct.utils.fastq.compress_gzip_member(data, compress_level=compress_level)
+                out_file.write(data)
+
+    finally:
+        if out_files is not None:
+            for out_file in out_files:
+                out_file.close()
+
+
 def simulate(sim_info, read_count, sequences_fasta, reads1, reads2, random_reads=True):
     """ Simulate reads
     """
@@ -166,40 +481,39 @@ def create_breakpoints(sim_info, genome_fasta, breakpoints_fasta, breakpoints_in
     """ Create a set of simulated breakpoints
     """
 
-    random.seed(int(sim_info['breakpoints_seed']))
+    random_state = np.random.RandomState(int(sim_info['breakpoints_seed']))
     genome = dict(destruct.utils.seq.read_sequences(open(genome_fasta, 'r')))
-    info_table = []
+    num_breakpoints = int(sim_info['num_breakpoints'])
+    adjacent_length = int(sim_info['adjacent_length'])
+    if sim_info['random_break_features']:
+        homology = random_state.randint(0, int(sim_info['homology']) + 1, size=num_breakpoints)
+        num_inserted = np.where(
+            (homology == 0) & (random_state.random_sample(num_breakpoints) < 0.1),
+            random_state.randint(0, int(sim_info['num_inserted']) + 1, size=num_breakpoints), 0)
+    else:
+        num_inserted = np.array([int(sim_info['num_inserted'])] * num_breakpoints)
+        homology = np.array([int(sim_info['homology'])] * num_breakpoints)
+    breakpoints = create_random_breakpoints(genome, adjacent_length, num_inserted, homology, random_state)
+    breakpoints['breakpoint_id'] = np.arange(num_breakpoints)
     with open(breakpoints_fasta, 'w') as fasta:
-        for idx in range(int(sim_info['num_breakpoints'])):
-            adjacent_length = int(sim_info['adjacent_length'])
-            if sim_info['random_break_features']:
-                homology = random.randint(0, int(sim_info['homology']))
-                if homology == 0 and random.random() < 0.1:
-                    num_inserted = random.randint(0, int(sim_info['num_inserted']))
-                else:
-                    num_inserted = 0
-            else:
-                num_inserted = int(sim_info['num_inserted'])
-                homology = int(sim_info['homology'])
-            chr1, str1, pos1, chr2, str2, pos2, inserted, sequence, homology = create_random_breakpoint(
-                genome, adjacent_length, num_inserted, homology)
+        for idx, sequence in zip(breakpoints['breakpoint_id'], breakpoints['sequence']):
             fasta.write('>{0}\n{1}\n'.format(idx, sequence))
-            info_table.append(
-                {
-                    'breakpoint_id': idx,
-                    'chromosome_1': chr1,
-                    'strand_1': str1,
-                    'position_1': pos1,
-                    'chromosome_2': chr2,
-                    'strand_2': str2,
-                    'position_2': pos2,
-                    'inserted': inserted,
-                    'homology': homology,
-                }
-            )
-    info_table = pd.DataFrame(info_table)
+    info_table = breakpoints[['breakpoint_id', 'chromosome_1', 'strand_1', 'position_1',
+                              'chromosome_2', 'strand_2', 'position_2', 'inserted', 'homology']]
     info_table.to_csv(breakpoints_info, sep='\t', index=False)
 
+
+def simulate_internal(sim_info, read_count, sequences_fasta, reads1, reads2, random_state):
+    """ Simulate reads in process, without random reads or sequencing errors
+    """
+
+    sequences = [seq for id, seq in destruct.utils.seq.read_sequences(open(sequences_fasta, 'r'))]
+    simulate_reads(
+        sequences, int(read_count), float(sim_info['fragment_mean']), float(sim_info['fragment_stddev']),
+        int(sim_info['read_length']), lambda file_number: reads1, lambda file_number: reads2,
+        random_state, compress_level=None)
+
+
 def create(sim_info, genome_fasta, breakpoints_fasta, breakpoints_info, concordant1, concordant2, discordant1, discordant2):
     """ Create simulated breakpoints and simulate reads from those breakpoints
     """
@@ -207,5 +521,10 @@ def create(sim_info, genome_fasta, breakpoints_fasta, breakpoints_info, concorda
     create_breakpoints(sim_info, genome_fasta, breakpoints_fasta, breakpoints_info)
     sequences_size = sum([len(seq) for id, seq in destruct.utils.seq.read_sequences(open(breakpoints_fasta, 'r'))])
     read_count = int(float(sim_info['coverage']) * sequences_size / float(sim_info['fragment_mean']))
-    simulate(sim_info, read_count, breakpoints_fasta, discordant1, discordant2, False)
-    simulate(sim_info, sim_info['num_concordant'], genome_fasta, concordant1, concordant2)
+    if sim_info.get('read_simulator', 'dwgsim') == 'internal':
+        random_state = np.random.RandomState(int(sim_info['dwgsim_seed']))
+        simulate_internal(sim_info, read_count, breakpoints_fasta, discordant1, discordant2, random_state)
+        simulate_internal(sim_info, sim_info['num_concordant'], genome_fasta, concordant1, concordant2, random_state)
+    else:
+        simulate(sim_info, read_count, breakpoints_fasta, discordant1, discordant2, False)
+        simulate(sim_info, sim_info['num_concordant'], genome_fasta, concordant1, concordant2)
@@ -0,0 +1,488 @@
+import os
+import sys
+import glob
+import time
+import random
+import argparse
+import resource
+import subprocess
+import traceback
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+import destruct.defaultconfig
+import destruct.predict_breaks
+import destruct.score_stats
+import destruct.tasks
+import destruct.utils.seq
+import destruct.benchmark.create_breakpoint_simulation
+
+
+library_name = 'simulated'
+
+
+def read_io_counters():
+    """ Read syscall level bytes read and written by this process and its
+    waited for children, None where /proc is not available.
+    """
+
+    try:
+        with open('/proc/self/io', 'r') as io_file:
+            counters = dict(line.rstrip().split(': ') for line in io_file)
+    except IOError:
+        return None, None
+
+    return int(counters['rchar']), int(counters['wchar'])
+
+
+def _run_measured(func, args, queue):
+    """ Run a stage function and report its resource usage through a queue.
+    """
+
+    try:
+        start_read, start_written = read_io_counters()
+
+        func(*args)
+
+        end_read, end_written = read_io_counters()
+
+        self_usage = resource.getrusage(resource.RUSAGE_SELF)
+        children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+        # ru_maxrss is in kilobytes on linux and bytes on mac
+        rss_scale = 1 if sys.platform == 'darwin' else 1024
+
+        measurements = {
+            'cpu_time': (self_usage.ru_utime + self_usage.ru_stime +
+                         children_usage.ru_utime + children_usage.ru_stime),
+            'max_rss': max(self_usage.ru_maxrss, children_usage.ru_maxrss) * rss_scale,
+            'bytes_read': None if start_read is None else end_read - start_read,
+            'bytes_written': None if start_written is None else end_written - start_written,
+        }
+
+        queue.put((True, measurements))
+
+    except:
+        queue.put((False, traceback.format_exc()))
+
+
+def measure_stage(func, *args):
+    """ Measure the resources used by a stage function.
+
+    Args:
+        func (callable): stage function
+        args (list): stage function arguments
+
+    Returns:
+        dict: wall_time, cpu_time, max_rss, bytes_read and bytes_written
+
+    The stage is run in a forked process so that cpu time, peak rss and I/O
+    are isolated from other stages.  Cpu time and I/O include commands run by
+    the stage, peak rss is the maximum of the stage process and its largest
+    command, and includes the memory of the forked interpreter.
+
+    """
+
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_run_measured, args=(func, args, queue))
+
+    start_time = time.time()
+    process.start()
+    process.join()
+    wall_time = time.time() - start_time
+
+    if queue.empty():
+        raise Exception('stage exited with code {0}'.format(process.exitcode))
+
+    success, result = queue.get()
+
+    if not success:
+        raise Exception('stage failed\n' + result)
+
+    result['wall_time'] = wall_time
+
+    return result
+
+
+def run_command(*args):
+    """ Run a commandline with pipes and redirects, in the form used by
+    `workflow.commandline`.
+    """
+
+    command = ' '.join(str(a) for a in args)
+    subprocess.check_call(command, shell=True)
+
+
+def write_fasta_and_index(sequences, fasta_filename, line_width=60):
+    """ Write sequences to a fasta file with a samtools faidx index.
+    """
+
+    with open(fasta_filename, 'w') as fasta_file, open(fasta_filename + '.fai', 'w') as fai_file:
+        for chromosome, sequence in sequences:
+            fasta_file.write('>{0}\n'.format(chromosome))
+            fai_file.write('{0}\t{1}\t{2}\t{3}\t{4}\n'.format(chromosome, len(sequence), fasta_file.tell(), line_width, line_width + 1))
+            for idx in xrange(0, len(sequence), line_width):
+                fasta_file.write(sequence[idx:idx+line_width] + '\n')
+
+
+def create_reference(config, chromosome_lengths):
+    """ Create a random reference genome and the annotations required by destruct.
+
+    Args:
+        config (dict): destruct config, reference filenames are created
+        chromosome_lengths (dict): length of each chromosome
+
+    """
+
+    try:
+        os.makedirs(os.path.dirname(config['genome_fasta']))
+    except OSError:
+        pass
+
+    sequences = list()
+    for chromosome, length in sorted(chromosome_lengths.iteritems()):
+        sequences.append((chromosome, ''.join(random.choice('ACGT') for _ in xrange(length))))
+
+    write_fasta_and_index(sequences, config['genome_fasta'])
+
+    run_command('bowtie-build', config['genome_fasta'], config['genome_fasta'], '>', os.devnull)
+
+    # No excluded satellite regions
+    open(config['satellite_regions'], 'w').close()
+
+    # Single gene per chromosome
+    with open(config['gtf_filename'], 'w') as gtf_file:
+        for chromosome, length in sorted(chromosome_lengths.iteritems()):
+            start, end = length // 4, length // 2
+            gene_id = 'G' + chromosome
+            transcript_id = 'T' + chromosome
+            attributes = 'gene_id "{0}"; transcript_id "{1}"; exon_number "1"; gene_name "{0}"; gene_biotype "protein_coding";'.format(gene_id, transcript_id)
+            gtf_file.write('\t'.join([chromosome, 'protein_coding', 'exon', str(start), str(end), '.', '+', '.', attributes]) + '\n')
+
+    # Single variant per chromosome
+    with open(config['dgv_filename'], 'w') as dgv_file:
+        dgv_file.write('variantaccession\tchr\tstart\tend\n')
+        for chromosome, length in sorted(chromosome_lengths.iteritems()):
+            dgv_file.write('V{0}\t{0}\t{1}\t{2}\n'.format(chromosome, length // 8, length // 8 + 1000))
+
+
+def simulate_reads(sim_info, genome_fasta, read_count, num_read_samples, reads_1, reads_2, sample_1, sample_2, temp_dir):
+    """ Simulate discordant reads from random breakpoints and concordant sample reads.
+    """
+
+    breakpoints_fasta = os.path.join(temp_dir, 'breakpoints.fasta')
+    breakpoints_info = os.path.join(temp_dir, 'breakpoints.tsv')
+
+    destruct.benchmark.create_breakpoint_simulation.create_breakpoints(
+        sim_info, genome_fasta, breakpoints_fasta, breakpoints_info)
+
+    random_state = np.random.RandomState(int(sim_info['dwgsim_seed']))
+
+    for num_reads, sequences_fasta, out_1, out_2 in (
+        (read_count, breakpoints_fasta, reads_1, reads_2),
+        (num_read_samples, genome_fasta, sample_1, sample_2)):
+
+        sequences = [seq for id, seq in destruct.utils.seq.read_sequences(open(sequences_fasta, 'r'))]
+
+        destruct.benchmark.create_breakpoint_simulation.simulate_reads(
+            sequences, num_reads, sim_info['fragment_mean'], sim_info['fragment_stddev'],
+            sim_info['read_length'], lambda file_number: out_1, lambda file_number: out_2,
+            random_state)
+
+
+class StageFiles(object):
+    """ Intermediate filenames of a single library destruct run.
+    """
+
+    def __init__(self, work_dir):
+        self.work_dir = work_dir
+
+    def __call__(self, name, *idxs):
+        return os.path.join(self.work_dir, '.'.join([name] + [str(a) for a in idxs]))
+
+    def split_idxs(self):
+        return sorted(int(a.split('.')[-1]) for a in glob.glob(self('reads1', '*')))
+
+    def split_filenames(self, name):
+        return dict((idx, self(name, idx)) for idx in self.split_idxs())
+
+
+def run_split(config, files, lib_stats):
+    for read_end in ('1', '2'):
+        destruct.tasks.split_fastq(
+            files('reads' + read_end + '.fq.gz'),
+            int(config['reads_per_split']),
+            lambda idx, read_end=read_end: files('reads' + read_end, idx))
+
+    for idx in files.split_idxs():
+        destruct.tasks.prepare_seed_fastq(
+            files('reads1', idx), files('reads2', idx), 36, files('reads.seed', idx))
+
+
+def run_score_stats(config, files, lib_stats):
+    destruct.tasks.prepare_seed_fastq(
+        files('sample1.fq.gz'), files('sample2.fq.gz'), 36, files('sample.seed'))
+
+    run_command(
+        'bowtie', config['genome_fasta'], files('sample.seed'),
+        '--chunkmbs', '512', '-k', '1000', '-m', '1000', '--strata', '--best', '-S',
+        '|', 'destruct_aligntrue', '-a', '-',
+        '-1', files('sample1.fq.gz'), '-2', files('sample2.fq.gz'),
+        '-r', config['genome_fasta'],
+        '-g', config['gap_score'], '-x', config['mismatch_score'], '-m', config['match_score'],
+        '--flmin', lib_stats.fragment_length_min, '--flmax', lib_stats.fragment_length_max,
+        '-s', files('samples.align.true'))
+
+    destruct.score_stats.create_score_stats(
+        files('samples.align.true'), config['match_score'], files('score.stats'))
+
+
+def run_realign(config, files, lib_stats):
+    for idx in files.split_idxs():
+        run_command(
+            'bowtie', config['genome_fasta'], files('reads.seed', idx),
+            '--chunkmbs', '512', '-k', '1000', '-m', '1000', '--strata', '--best', '-S',
+            '|', 'destruct_realign2', '-l', 0, '-a', '-',
+            '-1', files('reads1', idx), '-2', files('reads2', idx),
+            '-r', config['genome_fasta'],
+            '-g', config['gap_score'], '-x', config['mismatch_score'], '-m', config['match_score'],
+            '--flmin', lib_stats.fragment_length_min, '--flmax', lib_stats.fragment_length_max,
+            '--tchimer', config['chimeric_threshold'], '--talign', config['alignment_threshold'],
+            '--pchimer', config['chimeric_prior'], '--tvalid', config['readvalid_threshold'],
+            '-z', files('score.stats'),
+            '--span', files('spanning.alignments', idx),
+            '--split', files('split.alignments', idx))
+
+    destruct.tasks.merge_files_by_line(
+        files.split_filenames('spanning.alignments'), files('spanning.alignments_1.lib'))
+
+    run_command(
+        'destruct_filterreads', '-n', '2',
+        '-a', files('spanning.alignments_1.lib'),
+        '-r', config['satellite_regions'],
+        '>', files('spanning.alignments.lib'))
+
+    destruct.tasks.merge_files_by_line(
+        files.split_filenames('split.alignments'), files('split.alignments.lib'))
+
+    for name in ('spanning.alignments', 'split.alignments'):
+        destruct.tasks.merge_alignment_files(
+            {library_name: files(name + '.lib')}, files(name), {library_name: 0})
+
+
+def run_cluster(config, files, lib_stats):
+    destruct.tasks.write_stats_table(
+        {library_name: 0}, {library_name: lib_stats}, files('libstats.tsv'))
+
+    run_command(
+        'destruct_mclustermatepairs',
+        '-a', files('spanning.alignments'),
+        '-s', files('libstats.tsv'),
+        '-c', files('clusters.chrom'),
+        '--clustmin', config['cluster_readcount_threshold'],
+        '--fragmax', config['fragment_length_max'],
+        '--threads', config['cluster_threads'])
+
+
+def run_predict(config, files, lib_stats):
+    destruct.predict_breaks.predict_breaks(
+        files('clusters.chrom'), files('spanning.alignments'), files('split.alignments'),
+        files('breakpoints_2.chrom'),
+        config['predict_breaks_shards'],
+        config['predict_breaks_processes'],
+        files('predict_breaks.tempspace'))
+
+    destruct.tasks.merge_clusters(
+        {0: files('clusters.chrom')}, {0: files('breakpoints_2.chrom')},
+        files('clusters'), files('breakpoints_2'), files('merge_clusters.debug'))
+
+
+def run_likelihoods(config, files, lib_stats):
+    for idx in files.split_idxs():
+        run_command(
+            'destruct_realigntobreaks2',
+            '-r', config['genome_fasta'],
+            '-b', files('breakpoints_2'),
+            '-c', files('clusters'),
+            '-g', config['gap_score'], '-x', config['mismatch_score'], '-m', config['match_score'],
+            '--flmax', lib_stats.fragment_length_max,
+            '--span', files('spanning.alignments', idx),
+            '-1', files('reads1', idx), '-2', files('reads2', idx),
+            '--realignments', files('realignments', idx),
+            '--threads', config['realigntobreaks_threads'])
+
+        destruct.predict_breaks.calculate_realignment_likelihoods(
+            files('breakpoints_2'), files('realignments', idx), files('score.stats'),
+            files('likelihoods_2', idx), config['match_score'],
+            lib_stats.fragment_length_mean, lib_stats.fragment_length_stddev)
+
+    destruct.tasks.merge_sorted_files_by_line(
+        files.split_filenames('likelihoods_2'), files('likelihoods_2.lib'), [0])
+
+    destruct.tasks.merge_sorted_files_by_line(
+        {library_name: files('likelihoods_2.lib')}, files('likelihoods_2'), [0])
+
+
+def run_select(config, files, lib_stats):
+    destruct.predict_breaks.calculate_cluster_weights(
+        files('breakpoints_2'), files('cluster_weights'))
+
+    run_command(
+        'destruct_setcover',
+        '-c', files('clusters'),
+        '-w', files('cluster_weights'),
+        '-a', files('clusters_setcover'))
+
+    destruct.predict_breaks.select_clusters(
+        files('clusters_setcover'),
+        files('breakpoints_2'), files('breakpoints_1'),
+        files('likelihoods_2'), files('likelihoods_1'),
+        config['columnar_intermediates'])
+
+    destruct.predict_breaks.select_predictions(
+        files('breakpoints_1'), files('breakpoints'),
+        files('likelihoods_1'), files('likelihoods'),
+        config['mate_score_threshold'],
+        config['template_length_min_threshold'],
+        config['min_alignment_log_likelihood'],
+        config['columnar_intermediates'],
+        config['select_predictions_processes'])
+
+
+def run_tabulate(config, files, lib_stats):
+    destruct.tasks.tabulate_reads(
+        files('clusters_setcover'), {library_name: 0},
+        {library_name: files('reads1.fq.gz')}, {library_name: files('reads2.fq.gz')},
+        files('breakreads.table.unsorted'))
+
+    destruct.tasks.tabulate_results(
+        files('breakpoints'), files('likelihoods'), {library_name: 0},
+        config['genome_fasta'], config['gtf_filename'], config['dgv_filename'],
+        files('breakpoint_table.tsv'), files('breakpoint_library_table.tsv'))
+
+
+stages = [
+    ('split', run_split),
+    ('score_stats', run_score_stats),
+    ('realign', run_realign),
+    ('cluster', run_cluster),
+    ('predict', run_predict),
+    ('likelihoods', run_likelihoods),
+    ('select', run_select),
+    ('tabulate', run_tabulate),
+]
+
+
+def benchmark_stages(config, sim_info, read_count, work_dir, stage_names=None):
+    """ Simulate reads and measure each destruct stage.
+
+    Args:
+        config (dict): destruct config including reference filenames
+        sim_info (dict): simulation parameters as for `create_breakpoint_simulation`
+        read_count (int): number of discordant read pairs to simulate
+        work_dir (str): directory for simulated reads and intermediate files
+
+    KwArgs:
+        stage_names (list): subset of stages to measure, all stages are run
+
+    Returns:
+        pandas.DataFrame: measurements per stage
+
+    """
+
+    try:
+        os.makedirs(work_dir)
+    except OSError:
+        pass
+
+    files = StageFiles(work_dir)
+
+    simulate_reads(
+        sim_info, config['genome_fasta'], read_count, int(config['num_read_samples']),
+        files('reads1.fq.gz'), files('reads2.fq.gz'),
+        files('sample1.fq.gz'), files('sample2.fq.gz'),
+        work_dir)
+
+    lib_stats = destruct.tasks.ConcordantReadStats(
+        {'fragment_mean': sim_info['fragment_mean'], 'fragment_stddev': sim_info['fragment_stddev']},
+        config['fragment_length_num_stddevs'])
+
+    measurements = list()
+
+    for stage_name, stage_func in stages:
+        stage_measurements = measure_stage(stage_func, config, files, lib_stats)
+
+        if stage_names is not None and stage_name not in stage_names:
+            continue
+
+        stage_measurements['stage'] = stage_name
+        stage_measurements['read_count'] = read_count
+        measurements.append(stage_measurements)
+
+        print stage_name, stage_measurements
+
+    return pd.DataFrame(measurements, columns=[
+        'read_count', 'stage', 'wall_time', 'cpu_time', 'max_rss', 'bytes_read', 'bytes_written'])
+
+
+if __name__ == '__main__':
+
+    argparser = argparse.ArgumentParser()
+
+    argparser.add_argument('work_dir',
+                           help='Directory for reference, reads and intermediate files')
+
+    argparser.add_argument('results_table',
+                           help='Output table of measurements per stage and read count')
+
+    argparser.add_argument('--read_counts', nargs='+', type=int, default=[10000, 100000],
+                           help='Numbers of discordant read pairs to simulate')
+
+    argparser.add_argument('--stages', nargs='+', default=None,
+                           choices=[a[0] for a in stages],
+                           help='Stages to report, all stages are run')
+
+    argparser.add_argument('--num_chromosomes', type=int, default=4,
+                           help='Number of synthetic chromosomes')
+
+    argparser.add_argument('--chromosome_length', type=int, default=2000000,
+                           help='Length of each synthetic chromosome')
+
+    argparser.add_argument('--num_breakpoints', type=int, default=100,
+                           help='Number of simulated breakpoints')
+
+    argparser.add_argument('--seed', type=int, default=2014,
+                           help='Random seed')
+
+    args = vars(argparser.parse_args())
+
+    random.seed(args['seed'])
+
+    chromosomes = [str(a) for a in xrange(1, args['num_chromosomes'] + 1)]
+
+    ref_data_dir = os.path.join(args['work_dir'], 'ref')
+
+    config = destruct.defaultconfig.get_config(ref_data_dir, {'chromosomes': chromosomes})
+
+    create_reference(config, dict((a, args['chromosome_length']) for a in chromosomes))
+
+    sim_info = {
+        'breakpoints_seed': args['seed'],
+        'dwgsim_seed': args['seed'],
+        'num_breakpoints': args['num_breakpoints'],
+        'adjacent_length': 500,
+        'random_break_features': True,
+        'homology': 5,
+        'num_inserted': 10,
+        'fragment_mean': 300,
+        'fragment_stddev': 30,
+        'read_length': 100,
+    }
+
+    results = list()
+    for read_count in args['read_counts']:
+        work_dir = os.path.join(args['work_dir'], 'reads_{0}'.format(read_count))
+        results.append(benchmark_stages(config, sim_info, read_count, work_dir, stage_names=args['stages']))
+
+    pd.concat(results, ignore_index=True).to_csv(args['results_table'], sep='\t', index=False)
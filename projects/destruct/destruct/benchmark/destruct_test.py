@@ -97,20 +97,14 @@ def create_roc_plot(sim_info, tool_defs, genome_fasta, simulated_filename, predi
             results['inserted'] = ''
         results['inserted'] = results['inserted'].fillna('')
 
-        def normalize_breakpoint(row, genome):
-            norm_pos_1, norm_pos_2, homology = destruct.utils.misc.normalize_breakpoint(
-                row['chromosome_1'], row['strand_1'], row['position_1'],
-                row['chromosome_2'], row['strand_2'], row['position_2'], genome)
-
-            row['normalized_position_1'] = norm_pos_1
-            row['normalized_position_2'] = norm_pos_2
-            row['homology'] = homology
-
-            return row
-
-        genome = dict(destruct.utils.seq.read_sequences(open(genome_fasta, 'r')))
-        results = results.apply(normalize_breakpoint, axis=1, args=(genome,))
-        del genome
+        genome = destruct.utils.seq.load_packed_genome(genome_fasta)
+        norm_pos_1, norm_pos_2, homology = destruct.utils.misc.normalize_breakpoints(
+            results['chromosome_1'].values, results['strand_1'].values, results['position_1'].values,
+            results['chromosome_2'].values, results['strand_2'].values, results['position_2'].values, genome)
+        results['normalized_position_1'] = norm_pos_1
+        results['normalized_position_2'] = norm_pos_2
+        results['homology'] = homology
+        genome.close()
 
         min_dist = 200
         def identify_true_positive(row):
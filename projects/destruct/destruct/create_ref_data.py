@@ -4,6 +4,8 @@ import os
 import pypeliner
 
 import destruct.defaultconfig
+import destruct.utils.genes
+import destruct.utils.seq
 
 
 def wget_gunzip(url, filename):
@@ -63,6 +65,10 @@ def create_ref_data(config, ref_data_dir):
         wget_gunzip(config['ensembl_gtf_url'], config['gtf_filename'])
     auto_sentinal.run(wget_gtf)
 
+    def build_gene_table():
+        destruct.utils.genes.write_gene_table(config['gtf_filename'], destruct.utils.genes.gene_table_filename(config['gtf_filename']))
+    auto_sentinal.run(build_gene_table)
+
     def wget_dgv():
         wget(config['dgv_url'], config['dgv_filename'])
     auto_sentinal.run(wget_dgv)
@@ -93,4 +99,8 @@ def create_ref_data(config, ref_data_dir):
         pypeliner.commandline.execute('samtools', 'faidx', config['genome_fasta'])
     auto_sentinal.run(samtools_faidx)
 
+    def pack_genome():
+        destruct.utils.seq.write_packed_genome(config['genome_fasta'], destruct.utils.seq.packed_genome_filename(config['genome_fasta']))
+    auto_sentinal.run(pack_genome)
+
 
@@ -130,12 +130,52 @@ def get_config(ref_data_dir, user_config):
     # Parallelization parameters
     ###
 
+    # Extract discordant reads from bam files in parallel per chromosome, requires bam indices
+    bamdisc_by_chromosome                       = False
+
+    # Read the bam on a separate thread in each discordant read extraction job, using 2 cpus
+    bamdisc_prefetch                            = False
+
     # Number of reads per parallel realignment job
     reads_per_split                             = 1000000
 
+    # Gzip compression level of split reads, None for uncompressed
+    split_reads_compress_level                  = None
+
+    # Number of threads compressing split reads, if compressed
+    split_reads_threads                         = 1
+
     # Number of clusters per parallel 
     clusters_per_split                          = 1000
 
+    # Number of threads clustering chromosome pairs within each clustering job
+    cluster_threads                             = 1
+
+    # Number of threads realigning reads to predicted breakpoints within each realignment job
+    realigntobreaks_threads                     = 1
+
+    # Solve connected components of the cluster read set cover independently
+    setcover_partition                          = False
+
+    # Number of threads solving set cover components, if partitioned
+    setcover_threads                            = 1
+
+    # Number of processes aggregating read likelihoods when selecting predictions
+    select_predictions_processes                = 1
+
+    # Number of shards of clusters for breakpoint prediction within each prediction job
+    predict_breaks_shards                       = 1
+
+    # Number of processes predicting breakpoints for shards of clusters
+    predict_breaks_processes                    = 1
+
+    ###
+    # Intermediate file parameters
+    ###
+
+    # Write intermediate tables read only by python steps in a binary columnar format
+    columnar_intermediates                      = False
+
     config = locals()
     del config['user_config']
 
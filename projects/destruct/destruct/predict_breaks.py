@@ -1,5 +1,6 @@
 
-import collections
+import functools
+import os
 import pandas as pd
 import numpy as np
 import scipy
@@ -7,6 +8,7 @@ import scipy.stats
 
 import destruct.utils.misc
 import destruct.utils.streaming
+import destruct.utils.table
 
 
 cluster_fields = ['cluster_id', 'cluster_end',
@@ -124,38 +126,42 @@ def predict_breaks_split(clusters, split, max_predictions_per_cluster=10):
     # Track which end of the cluster was the seed end for this read
     data['seed_end'] = np.where(data['flip'], 1-data['read_end'], data['read_end'])
 
-    def revcomp_inserted(row):
-        if row['seed_end'] == 0:
-            return row['inserted']
-        else:
-            return destruct.utils.misc.reverse_complement(row['inserted'])
+    is_reversed = data['seed_end'] != 0
+    data.loc[is_reversed, 'inserted'] = [
+        destruct.utils.misc.reverse_complement(a) for a in data.loc[is_reversed, 'inserted'].values]
 
-    data['inserted'] = data.apply(revcomp_inserted, axis=1)
+    data['inslen'] = data['inserted'].str.len()
 
-    data['inslen'] = data['inserted'].apply(len)
+    # Sort by prediction, and identify the segment of rows of each prediction
+    group_cols = ['cluster_id', 'position_1', 'position_2', 'homology', 'inslen']
+    data = data.iloc[np.lexsort([data[a].values for a in group_cols[::-1]])].reset_index(drop=True)
 
-    data.set_index(['cluster_id', 'position_1', 'position_2', 'homology', 'inslen'], inplace=True)
+    is_group_start = np.ones(len(data.index), dtype=bool)
+    is_group_start[1:] = np.any([data[a].values[1:] != data[a].values[:-1] for a in group_cols], axis=0)
+    group_starts = np.flatnonzero(is_group_start)
+    group_idx = np.cumsum(is_group_start) - 1
 
-    def calculate_consensus(dat):
-        inserted = np.array([np.array(list(a)) for a in dat.values])
-        consensus = list()
-        for nt_list in inserted.T:
-            consensus.append(collections.Counter(nt_list).most_common(1)[0][0])
-        consensus = ''.join(consensus)
-        return consensus
+    split_data = data.loc[is_group_start, group_cols].reset_index(drop=True)
+    split_data['score'] = np.add.reduceat(data['score'].values, group_starts)
+    split_data['count'] = np.diff(np.append(group_starts, len(data.index)))
 
-    agg_f = {'score':sum, 'read_id':len,
-             'chromosome_1':max, 'chromosome_2':max,
-             'strand_1':max, 'strand_2':max,
-             'inserted':calculate_consensus}
-    split_data = data.groupby(level=[0, 1, 2, 3, 4])\
-                     .agg(agg_f)\
-                     .rename(columns={'read_id':'count'})\
-                     .reset_index()
+    agg_cols = ['chromosome_1', 'chromosome_2', 'strand_1', 'strand_2']
+    split_data[agg_cols] = data[agg_cols].groupby(group_idx).max().reset_index(drop=True)
 
-    split_data = split_data.sort_values(['cluster_id', 'score'])
+    split_data['inserted'] = calculate_consensus(
+        data['inserted'].values, group_idx, split_data['inslen'].values)
 
-    split_data['breakpoint_id'] = split_data.groupby('cluster_id').cumcount(ascending=False)
+    # Number predictions within each cluster in decreasing order of score,
+    # and select the top predictions
+    split_data = split_data.iloc[np.lexsort([split_data['score'].values, split_data['cluster_id'].values])]
+    split_data.reset_index(drop=True, inplace=True)
+
+    cluster_ids = split_data['cluster_id'].values
+    is_cluster_end = np.ones(len(cluster_ids), dtype=bool)
+    is_cluster_end[:-1] = cluster_ids[1:] != cluster_ids[:-1]
+    cluster_end_idx = np.flatnonzero(is_cluster_end)
+    cluster_end_idx = cluster_end_idx[np.searchsorted(cluster_end_idx, np.arange(len(cluster_ids)))]
+    split_data['breakpoint_id'] = cluster_end_idx - np.arange(len(cluster_ids))
 
     split_data = split_data[split_data['breakpoint_id'] < max_predictions_per_cluster]
 
@@ -164,107 +170,280 @@ def predict_breaks_split(clusters, split, max_predictions_per_cluster=10):
     return split_data
 
 
-def predict_breaks(clusters_filename, spanning_filename, split_filename, breakpoints_filename):
+def calculate_consensus(inserted, group_idx, group_inslen):
+    """ Calculate the consensus inserted sequence of groups of equal length sequences.
 
-    clusters = pd.read_csv(clusters_filename, sep='\t', names=cluster_fields)
+    Args:
+        inserted (numpy.array): inserted sequences
+        group_idx (numpy.array): group index of each sequence, 0..G-1
+        group_inslen (numpy.array): length of the sequences in each group, size G
 
-    if len(clusters.index) == 0:
-        with open(breakpoints_filename, 'w'):
-            pass
-        return
+    Returns:
+        numpy.array: consensus sequence of each group
 
-    merge_columns = ['library_id', 'read_id', 'read_end', 'align_id']
+    The most common nucleotide is selected at each position, with ties
+    resolved to the lowest character.
 
-    clusters_alignments = clusters[merge_columns].drop_duplicates()
+    """
 
-    split_iter = pd.read_csv(split_filename, sep='\t', names=split_fields,
-                             converters={'chromosome_1':str, 'chromosome_2':str, 'inserted':str},
-                             iterator=True, chunksize=1000000)
+    consensus = np.array([''] * len(group_inslen), dtype=object)
 
-    split_merge_columns = {'1':['library_id', 'read_id', 'read_end', 'align_id_1'],
-                           '2':['library_id', 'read_id', 'read_end', 'align_id_2']}
+    for inslen in np.unique(group_inslen):
+        if inslen == 0:
+            continue
 
-    def filter_split(df):
-        filtered = list()
-        for side, left_merge_columns in split_merge_columns.iteritems():
-            df_2 = pd.merge(df, clusters_alignments,
-                            left_on=left_merge_columns,
-                            right_on=merge_columns,
-                            how='inner')
-            df_2 = df_2.drop(['align_id'], axis=1)
-            filtered.append(df_2)
-        return pd.concat(filtered).drop_duplicates()
+        is_length = group_inslen[group_idx] == inslen
+        length_group_idx = group_idx[is_length]
+        length_groups, length_group_idx = np.unique(length_group_idx, return_inverse=True)
 
-    split = pd.concat([filter_split(chunk) for chunk in split_iter])
+        chars = np.frombuffer(''.join(inserted[is_length]), dtype=np.uint8).reshape(-1, inslen)
+        alphabet, codes = np.unique(chars, return_inverse=True)
+        codes = codes.reshape(chars.shape)
+
+        # Count characters by group, position and character code
+        counts_idx = (length_group_idx[:, np.newaxis] * inslen + np.arange(inslen)) * len(alphabet) + codes
+        counts = np.bincount(counts_idx.flatten(), minlength=len(length_groups) * inslen * len(alphabet))
+        counts = counts.reshape(len(length_groups), inslen, len(alphabet))
+
+        consensus_chars = alphabet[np.argmax(counts, axis=2)].astype(np.uint8)
+        consensus[length_groups] = consensus_chars.view('S{}'.format(inslen)).flatten().astype(object)
+
+    return consensus
+
+
+merge_columns = ['library_id', 'read_id', 'read_end', 'align_id']
+
+
+split_merge_columns = {'1':['library_id', 'read_id', 'read_end', 'align_id_1'],
+                       '2':['library_id', 'read_id', 'read_end', 'align_id_2']}
+
+
+def filter_split(df, clusters_alignments):
+    filtered = list()
+    for side, left_merge_columns in split_merge_columns.iteritems():
+        df_2 = pd.merge(df, clusters_alignments,
+                        left_on=left_merge_columns,
+                        right_on=merge_columns,
+                        how='inner')
+        df_2 = df_2.drop(['align_id'], axis=1)
+        filtered.append(df_2)
+    return pd.concat(filtered).drop_duplicates()
 
-    split.loc[split['inserted'] == '.', 'inserted'] = ''
 
-    spanning_iter = pd.read_csv(spanning_filename, sep='\t', names=spanning_fields,
-                                converters={'chromosome':str},
-                                iterator=True, chunksize=1000000)
+def filter_spanning(df, clusters_alignments):
+    return pd.merge(df, clusters_alignments, how='inner')
 
-    def filter_spanning(df):
-        return pd.merge(chunk, clusters_alignments, how='inner')
 
-    spanning = pd.concat([filter_spanning(chunk) for chunk in spanning_iter])
+def read_split(split_filename, chunksize=1000000):
+    return pd.read_csv(split_filename, sep='\t', names=split_fields,
+                       converters={'chromosome_1':str, 'chromosome_2':str, 'inserted':str},
+                       iterator=True, chunksize=chunksize)
+
+
+def read_spanning(spanning_filename, chunksize=1000000):
+    return pd.read_csv(spanning_filename, sep='\t', names=spanning_fields,
+                       converters={'chromosome':str},
+                       iterator=True, chunksize=chunksize)
+
+
+def predict_cluster_breaks(clusters, spanning, split):
+    """ Predict breakpoints of clusters from their spanning and split alignments.
+
+    Args:
+        clusters (pandas.DataFrame): clusters table
+        spanning (pandas.DataFrame): spanning alignments of the clusters
+        split (pandas.DataFrame): split alignments of the clusters
+
+    Returns:
+        pandas.DataFrame: breakpoints table ordered by cluster and breakpoint id
+
+    """
+
+    split.loc[split['inserted'] == '.', 'inserted'] = ''
 
     predictions_0 = predict_breaks_spanning(clusters, spanning)
 
     predictions_1 = predict_breaks_split(clusters, split)
 
     predictions = pd.concat([predictions_0, predictions_1], ignore_index=True)
-    predictions.sort_values('cluster_id', inplace=True)
 
     mate_scores = calculate_mate_score(clusters, spanning)
     predictions = predictions.merge(mate_scores, on='cluster_id')
 
+    predictions = predictions.iloc[np.lexsort([predictions['breakpoint_id'].values, predictions['cluster_id'].values])]
+    predictions.reset_index(drop=True, inplace=True)
+
     predictions.loc[predictions['inserted'] == '', 'inserted'] = '.'
 
-    predictions = predictions[breakpoint_fields]
-    predictions.to_csv(breakpoints_filename, sep='\t', index=False, header=False)
+    return predictions[breakpoint_fields]
 
 
-def calculate_cluster_weights(breakpoints_filename, weights_filename):
+def calculate_cluster_shards(cluster_ids, num_shards):
+    """ Assign clusters to shards by a multiplicative hash of the cluster id.
+    """
+    cluster_ids = np.asarray(cluster_ids).astype(np.uint64)
+    return ((cluster_ids * np.uint64(2654435761)) % np.uint64(1 << 32) % np.uint64(num_shards)).astype(int)
 
-    epsilon = 0.0001
-    itx_distance = 1000000000
 
-    breakpoints = pd.read_csv(breakpoints_filename, sep='\t', names=breakpoint_fields,
-                              converters={'chromosome_1':str, 'chromosome_2':str, 'inserted':str})
+def _write_shards(df_iter, filter_func, shard_alignments, shard_filenames):
+    """ Filter streamed alignments and write the alignments of each shard as columnar tables.
+    """
+    out_files = [open(filename, 'wb') for filename in shard_filenames]
+    try:
+        for chunk in df_iter:
+            chunk = filter_func(chunk, shard_alignments)
+            shard = chunk['shard'].values
+            chunk = chunk.drop(['shard'], axis=1)
+            for shard_idx, out_file in enumerate(out_files):
+                destruct.utils.table.write_table_chunk(out_file, chunk.loc[shard == shard_idx])
+    finally:
+        for out_file in out_files:
+            out_file.close()
+
+
+def _predict_shard_breaks(shard_filenames):
+    """ Predict breakpoints for the clusters of a shard, as written by predict_breaks.
+    """
+    clusters = destruct.utils.table.read_table(shard_filenames['clusters'], cluster_fields)
 
-    breakpoints = breakpoints[breakpoints['breakpoint_id'] == 0]
+    if len(clusters.index) == 0:
+        with open(shard_filenames['breakpoints'], 'w'):
+            pass
+        return
 
-    breakpoints['distance'] = np.absolute(breakpoints['position_1'] - breakpoints['position_2']) + 1.0
-    breakpoints.loc[breakpoints['chromosome_1'] != breakpoints['chromosome_2'], 'distance'] = itx_distance
-    breakpoints['weight'] = 1.0 + epsilon * np.log(breakpoints['distance'])
+    spanning = destruct.utils.table.read_table(shard_filenames['spanning'], spanning_fields)
+    split = destruct.utils.table.read_table(shard_filenames['split'], split_fields)
 
-    breakpoints = breakpoints.sort_values('cluster_id')
-    breakpoints[['cluster_id', 'weight']].to_csv(weights_filename, sep='\t', index=False, header=False)
+    predictions = predict_cluster_breaks(clusters, spanning, split)
+    predictions.to_csv(shard_filenames['breakpoints'], sep='\t', index=False, header=False)
 
 
-def calculate_realignment_likelihoods(breakpoints_filename, realignments_filename, score_stats_filename,
-                                      likelihoods_filename, match_score, fragment_mean, fragment_stddev):
+def predict_breaks(clusters_filename, spanning_filename, split_filename, breakpoints_filename,
+                   num_shards=1, num_processes=1, temp_directory=None):
+    """ Predict breakpoints of clusters from spanning and split alignments.
 
-    match_score = float(match_score)
-    fragment_mean = float(fragment_mean)
-    fragment_stddev = float(fragment_stddev)
+    Args:
+        clusters_filename (str): clusters tsv filename
+        spanning_filename (str): spanning alignments tsv filename
+        split_filename (str): split alignments tsv filename
+        breakpoints_filename (str): output breakpoints tsv filename
+
+    KwArgs:
+        num_shards (int): number of shards of clusters predicted independently
+        num_processes (int): number of processes predicting shards
+        temp_directory (str): directory for shard tables, required if sharded
+
+    Clusters are hashed into shards, and spanning and split alignments are
+    streamed and written to the shards of the clusters they support, so that
+    only a single shard is held in memory by each process.  Shard predictions
+    are merged by cluster id, the output is identical for any number of
+    shards and processes.
 
-    score_stats = pd.read_csv(score_stats_filename, sep='\t', names=score_stats_fields)
+    """
 
-    breakpoints = pd.read_csv(breakpoints_filename, sep='\t', names=breakpoint_fields,
-                              converters={'chromosome_1':str, 'chromosome_2':str, 'inserted':str})
+    clusters = pd.read_csv(clusters_filename, sep='\t', names=cluster_fields)
 
-    breakpoints.loc[breakpoints['inserted'] == '.', 'inserted'] = ''
+    if len(clusters.index) == 0:
+        with open(breakpoints_filename, 'w'):
+            pass
+        return
 
-    breakpoints['inslen'] = breakpoints['inserted'].apply(len)
+    if num_shards <= 1:
+        clusters_alignments = clusters[merge_columns].drop_duplicates()
 
-    data = pd.read_csv(realignments_filename, sep='\t', names=realignment_fields)
+        split = pd.concat([filter_split(chunk, clusters_alignments) for chunk in read_split(split_filename)])
+
+        spanning = pd.concat([filter_spanning(chunk, clusters_alignments) for chunk in read_spanning(spanning_filename)])
+
+        predictions = predict_cluster_breaks(clusters, spanning, split)
+        predictions.to_csv(breakpoints_filename, sep='\t', index=False, header=False)
 
-    if len(data.index) == 0:
-        with open(likelihoods_filename, 'w'):
-            pass
         return
 
+    if temp_directory is None:
+        raise ValueError('temp_directory is required for sharded breakpoint prediction')
+
+    try:
+        os.makedirs(temp_directory)
+    except OSError:
+        pass
+
+    shard_filenames = [
+        dict((table, os.path.join(temp_directory, '{}.{}'.format(table, shard_idx)))
+             for table in ('clusters', 'spanning', 'split', 'breakpoints'))
+        for shard_idx in xrange(num_shards)]
+
+    shard = calculate_cluster_shards(clusters['cluster_id'].values, num_shards)
+
+    for shard_idx, filenames in enumerate(shard_filenames):
+        destruct.utils.table.write_table(clusters.loc[shard == shard_idx], filenames['clusters'], columnar=True)
+
+    clusters['shard'] = shard
+    shard_alignments = clusters[merge_columns + ['shard']].drop_duplicates()
+    del clusters
+
+    _write_shards(read_split(split_filename), filter_split, shard_alignments,
+                  [filenames['split'] for filenames in shard_filenames])
+
+    _write_shards(read_spanning(spanning_filename), filter_spanning, shard_alignments,
+                  [filenames['spanning'] for filenames in shard_filenames])
+
+    for _ in destruct.utils.streaming.bounded_imap(_predict_shard_breaks, shard_filenames, num_processes):
+        pass
+
+    destruct.utils.streaming.merge_sorted_files(
+        [filenames['breakpoints'] for filenames in shard_filenames], breakpoints_filename, [0])
+
+
+def calculate_cluster_weights(breakpoints_filename, weights_filename, chunksize=1000000):
+
+    epsilon = 0.0001
+    itx_distance = 1000000000
+
+    # Breakpoints are ordered by cluster, as are weights required by setcover
+    breakpoints_iter = pd.read_csv(breakpoints_filename, sep='\t', names=breakpoint_fields,
+                                   usecols=['cluster_id', 'breakpoint_id', 'chromosome_1', 'position_1',
+                                            'chromosome_2', 'position_2'],
+                                   converters={'chromosome_1':str, 'chromosome_2':str},
+                                   iterator=True, chunksize=chunksize)
+
+    prev_cluster_id = None
+
+    with open(weights_filename, 'w') as weights_file:
+        for breakpoints in breakpoints_iter:
+            breakpoints = breakpoints[breakpoints['breakpoint_id'] == 0]
+
+            if len(breakpoints.index) == 0:
+                continue
+
+            cluster_ids = breakpoints['cluster_id'].values
+            if np.any(np.diff(cluster_ids) < 0) or (prev_cluster_id is not None and cluster_ids[0] < prev_cluster_id):
+                raise ValueError('breakpoints in {} not ordered by cluster'.format(breakpoints_filename))
+            prev_cluster_id = cluster_ids[-1]
+
+            breakpoints['distance'] = np.absolute(breakpoints['position_1'] - breakpoints['position_2']) + 1.0
+            breakpoints.loc[breakpoints['chromosome_1'] != breakpoints['chromosome_2'], 'distance'] = itx_distance
+            breakpoints['weight'] = 1.0 + epsilon * np.log(breakpoints['distance'])
+
+            breakpoints[['cluster_id', 'weight']].to_csv(weights_file, sep='\t', index=False, header=False)
+
+
+def calculate_read_likelihoods(data, breakpoints, score_stats, match_score, fragment_mean, fragment_stddev):
+    """ Calculate the likelihood of the best realignment of each read.
+
+    Args:
+        data (pandas.DataFrame): realignments table for a set of whole clusters
+        breakpoints (pandas.DataFrame): breakpoint table with 'inslen' column
+        score_stats (pandas.DataFrame): score stats table
+        match_score (float): score of a match
+        fragment_mean (float): mean fragment length
+        fragment_stddev (float): standard deviation of fragment length
+
+    Returns:
+        pandas.DataFrame: likelihoods table sorted by cluster, breakpoint and read
+
+    """
+
     data = data.merge(score_stats, on='aligned_length')
 
     # Alignment score likelihood and CDF
@@ -306,44 +485,113 @@ def calculate_realignment_likelihoods(breakpoints_filename, realignments_filenam
                       data['score_log_cdf_2'] + \
                       data['length_log_cdf']
 
-    index_fields = ['cluster_id', 'breakpoint_id', 'library_id', 'read_id']
-    data = data.sort_values(index_fields + ['log_likelihood'])\
-               .groupby(index_fields)\
-               .last()\
-               .reset_index()
+    if len(data.index) == 0:
+        return data[likelihoods_fields]
+
+    # Select the maximum likelihood alignment of each read, sort by read then
+    # likelihood and take the last row of each segment of equal reads
+    index_values = [data[a].values for a in index_fields]
+    order = np.lexsort([data['log_likelihood'].values] + index_values[::-1])
+    index_values = [a[order] for a in index_values]
+
+    is_last = np.ones(len(order), dtype=bool)
+    is_last[:-1] = np.any([a[1:] != a[:-1] for a in index_values], axis=0)
+
+    data = data.iloc[order[is_last]]
+
+    return data[likelihoods_fields]
+
+
+def calculate_realignment_likelihoods(breakpoints_filename, realignments_filename, score_stats_filename,
+                                      likelihoods_filename, match_score, fragment_mean, fragment_stddev,
+                                      chunksize=1000000):
+
+    match_score = float(match_score)
+    fragment_mean = float(fragment_mean)
+    fragment_stddev = float(fragment_stddev)
+
+    score_stats = pd.read_csv(score_stats_filename, sep='\t', names=score_stats_fields)
+
+    breakpoints = pd.read_csv(breakpoints_filename, sep='\t', names=breakpoint_fields,
+                              usecols=['cluster_id', 'breakpoint_id', 'inserted'],
+                              converters={'inserted':str})
+
+    breakpoints.loc[breakpoints['inserted'] == '.', 'inserted'] = ''
+
+    breakpoints['inslen'] = breakpoints['inserted'].apply(len)
+
+    with open(likelihoods_filename, 'w') as likelihoods_file:
+
+        if os.path.getsize(realignments_filename) == 0:
+            return
 
-    data = data[likelihoods_fields]
+        # Realignments are ordered by cluster, stream whole clusters
+        data_iter = pd.read_csv(realignments_filename, sep='\t', names=realignment_fields,
+                                iterator=True, chunksize=chunksize)
 
-    data.to_csv(likelihoods_filename, sep='\t', index=False, header=False)
+        data_iter = destruct.utils.streaming.group_aware_iter(data_iter, ['cluster_id'])
+
+        for data in data_iter:
+            data = calculate_read_likelihoods(data, breakpoints, score_stats,
+                                              match_score, fragment_mean, fragment_stddev)
+
+            data.to_csv(likelihoods_file, sep='\t', index=False, header=False)
 
 
 def select_clusters(clusters_filename,
                     breakpoints_filename, selected_breakpoints_filename,
-                    likelihoods_filename, selected_likelihoods_filename):
+                    likelihoods_filename, selected_likelihoods_filename,
+                    columnar=False):
 
     clusters = pd.read_csv(clusters_filename, sep='\t', names=cluster_fields,
                            usecols=['cluster_id', 'library_id', 'read_id'])
     clusters = clusters.drop_duplicates()
 
-    breakpoints_iter = pd.read_csv(breakpoints_filename, sep='\t', names=breakpoint_fields,
-                                   converters={'chromosome_1':str, 'chromosome_2':str, 'inserted':str},
-                                   iterator=True, chunksize=1000000)
+    breakpoints_iter = destruct.utils.table.read_table(breakpoints_filename, breakpoint_fields,
+                                                      converters={'chromosome_1':str, 'chromosome_2':str, 'inserted':str},
+                                                      chunksize=1000000)
 
     cluster_ids = clusters[['cluster_id']].drop_duplicates()
 
-    destruct.utils.streaming.read_select_write(breakpoints_iter, cluster_ids, selected_breakpoints_filename)
+    destruct.utils.streaming.read_select_write(breakpoints_iter, cluster_ids, selected_breakpoints_filename,
+                                               columnar=columnar)
+
+    likelihoods_iter = destruct.utils.table.read_table(likelihoods_filename, likelihoods_fields,
+                                                      chunksize=1000000)
+
+    destruct.utils.streaming.read_select_write(likelihoods_iter, clusters, selected_likelihoods_filename,
+                                               columnar=columnar)
+
+
+def aggregate_breakpoint_likelihoods(likelihoods):
+    """ Aggregate read likelihoods per breakpoint prediction.
+
+    Args:
+        likelihoods(pandas.DataFrame): likelihoods table
 
-    likelihoods_iter = pd.read_csv(likelihoods_filename, sep='\t', names=likelihoods_fields,
-                                   iterator=True, chunksize=1000000)
+    Returns:
+        pandas.DataFrame: total log likelihood and max template lengths per
+        cluster and breakpoint
 
-    destruct.utils.streaming.read_select_write(likelihoods_iter, clusters, selected_likelihoods_filename)
+    The aggregation may be applied to its own output, allowing likelihoods of
+    a cluster to be aggregated in parts.
+
+    """
+
+    agg_f = {
+        'log_likelihood':sum,
+        'template_length_1':max,
+        'template_length_2':max,
+    }
+    return likelihoods.groupby(['cluster_id', 'breakpoint_id']).agg(agg_f).reset_index()
 
 
 def select_breakpoint_prediction(likelihoods, template_length_min_threshold):
     """ Select and filter breakpoint predictions.
 
     Args:
-        likelihoods(pandas.DataFrame): likelihoods table
+        likelihoods(pandas.DataFrame): likelihoods table, or likelihoods
+            aggregated with `aggregate_breakpoint_likelihoods`
         template_length_min_threshold (int): min template length filter
 
     Select the maximum likelihoods breakpoint prediction, preferring solutions
@@ -353,12 +601,7 @@ def select_breakpoint_prediction(likelihoods, template_length_min_threshold):
     """
 
     # Calculate total breakpoint likelihood, max template lengths
-    agg_f = {
-        'log_likelihood':sum,
-        'template_length_1':max,
-        'template_length_2':max,
-    }
-    data = likelihoods.groupby(['cluster_id', 'breakpoint_id']).agg(agg_f).reset_index()
+    data = aggregate_breakpoint_likelihoods(likelihoods)
 
     # Select highest likelihood breakpoint predictions
     # Prefer a higher breakpoint id, thus preferring solutions with split reads
@@ -377,19 +620,23 @@ def select_breakpoint_prediction(likelihoods, template_length_min_threshold):
 def select_predictions(breakpoints_filename, selected_breakpoints_filename,
                        likelihoods_filename, selected_likelihoods_filename,
                        mate_score_threshold, template_length_min_threshold,
-                       min_alignment_log_likelihood):
+                       min_alignment_log_likelihood, columnar=False, num_processes=1,
+                       chunksize=int(1e6)):
 
-    read_likelihoods_iter = pd.read_csv(likelihoods_filename, sep='\t', names=likelihoods_fields,
+    read_likelihoods_iter = destruct.utils.table.read_table(likelihoods_filename, likelihoods_fields,
         usecols=['cluster_id', 'breakpoint_id', 'log_likelihood', 'template_length_1', 'template_length_2'],
-        chunksize=int(1e7))
+        chunksize=chunksize)
 
-    read_likelihoods_iter = destruct.utils.streaming.group_aware_iter(read_likelihoods_iter, ['cluster_id'])
+    # Likelihoods are ordered by cluster, aggregate chunks and select from
+    # whole clusters of aggregated likelihoods
+    selected_iter = destruct.utils.streaming.group_aware_reduce(
+        read_likelihoods_iter, ['cluster_id'], aggregate_breakpoint_likelihoods,
+        functools.partial(select_breakpoint_prediction, template_length_min_threshold=template_length_min_threshold),
+        num_processes=num_processes)
 
-    selected = pd.concat([
-        select_breakpoint_prediction(df, template_length_min_threshold)
-        for df in read_likelihoods_iter], ignore_index=True)
+    selected = pd.concat(list(selected_iter), ignore_index=True)
 
-    mate_score = pd.read_csv(breakpoints_filename, sep='\t', names=breakpoint_fields,
+    mate_score = destruct.utils.table.read_table(breakpoints_filename, breakpoint_fields,
         converters={'chromosome_1':str, 'chromosome_2':str, 'inserted':str},
         usecols=['cluster_id', 'breakpoint_id', 'mate_score'])
 
@@ -398,20 +645,22 @@ def select_predictions(breakpoints_filename, selected_breakpoints_filename,
 
     selected = selected[['cluster_id', 'breakpoint_id']].drop_duplicates()
 
-    breakpoints_iter = pd.read_csv(breakpoints_filename, sep='\t', names=breakpoint_fields,
-                                   converters={'chromosome_1':str, 'chromosome_2':str, 'inserted':str},
-                                   iterator=True, chunksize=1000000)
+    breakpoints_iter = destruct.utils.table.read_table(breakpoints_filename, breakpoint_fields,
+                                                      converters={'chromosome_1':str, 'chromosome_2':str, 'inserted':str},
+                                                      chunksize=1000000)
 
-    destruct.utils.streaming.read_select_write(breakpoints_iter, selected, selected_breakpoints_filename)
+    destruct.utils.streaming.read_select_write(breakpoints_iter, selected, selected_breakpoints_filename,
+                                               columnar=columnar)
 
-    likelihoods_iter = pd.read_csv(likelihoods_filename, sep='\t', names=likelihoods_fields,
-                                   iterator=True, chunksize=1000000)
+    likelihoods_iter = destruct.utils.table.read_table(likelihoods_filename, likelihoods_fields,
+                                                      chunksize=1000000)
 
     def likelihoods_filter(chunk):
         chunk = chunk.merge(selected, how='inner')
         chunk = chunk[chunk['log_likelihood'] >= min_alignment_log_likelihood]
         return chunk
 
-    destruct.utils.streaming.read_filter_write(likelihoods_iter, likelihoods_filter, selected_likelihoods_filename)
+    destruct.utils.streaming.read_filter_write(likelihoods_iter, likelihoods_filter, selected_likelihoods_filename,
+                                               columnar=columnar)
 
 
@@ -1,36 +1,33 @@
 import collections
 import csv
-import errno
+import heapq
 import itertools
-import os
+import re
+import shutil
 import tarfile
-import gzip
 import numpy as np
 import pandas as pd
-import pypeliner
-import pygenes
 
+import destruct.utils.fastq
+import destruct.utils.genes
 import destruct.utils.plots
 import destruct.utils.seq
+import destruct.utils.streaming
+import destruct.utils.table
 import destruct.predict_breaks
 
 
 def prepare_seed_fastq(reads_1_fastq, reads_2_fastq, seed_length, seed_fastq):
-    opener_1 = (open, gzip.open)[reads_1_fastq.endswith('.gz')]
-    opener_2 = (open, gzip.open)[reads_2_fastq.endswith('.gz')]
-    with opener_1(reads_1_fastq, 'r') as reads_1, opener_2(reads_2_fastq, 'r') as reads_2, open(seed_fastq, 'w') as seed:
-        fastq_lines = [[], []]
-        for fastq_1_line, fastq_2_line in zip(reads_1, reads_2):
-            fastq_lines[0].append(fastq_1_line.rstrip())
-            fastq_lines[1].append(fastq_2_line.rstrip())
-            if len(fastq_lines[0]) == 4:
-                for read_end in (0, 1):
-                    if fastq_lines[read_end][1] > seed_length:
-                        fastq_lines[read_end][1] = fastq_lines[read_end][1][0:seed_length]
-                        fastq_lines[read_end][3] = fastq_lines[read_end][3][0:seed_length]
-                    for line in fastq_lines[read_end]:
-                        seed.write(line + '\n')
-                fastq_lines = [[], []]
+    with open(seed_fastq, 'w') as seed:
+        for lines_1, lines_2 in destruct.utils.fastq.read_paired_record_lines(reads_1_fastq, reads_2_fastq):
+            seed_lines = [None] * (2 * len(lines_1))
+            for read_end, lines in enumerate((lines_1, lines_2)):
+                offset = 4 * read_end
+                seed_lines[offset+0::8] = lines[0::4]
+                seed_lines[offset+1::8] = [a[0:seed_length] for a in lines[1::4]]
+                seed_lines[offset+2::8] = lines[2::4]
+                seed_lines[offset+3::8] = [a[0:seed_length] for a in lines[3::4]]
+            seed.write('\n'.join(seed_lines) + '\n')
 
 
 class ConcordantReadStats(object):
@@ -75,54 +72,19 @@ def write_stats_table(library_ids, lib_stats, stats_table_filename):
 
 
 def split_file_byline(in_filename, lines_per_file, out_filename_callback):
-    with open(in_filename, 'r') as in_file:
-        file_number = 0
-        out_file = None
-        out_file_lines = None
-        try:
-            for line in in_file:
-                if out_file is None or out_file_lines == lines_per_file:
-                    if out_file is not None:
-                        out_file.close()
-                    out_file = open(out_filename_callback(file_number), 'w')
-                    out_file_lines = 0
-                    file_number += 1
-                out_file.write(line)
-                out_file_lines += 1
-        finally:
-            if out_file is not None:
-                out_file.close()
-
-
-def split_fastq(in_filename, num_reads_per_file, out_filename_callback):
-    with gzip.open(in_filename, 'r') as in_file:
-        file_number = 0
-        out_file = None
-        out_file_read_count = None
-        try:
-            for name, seq, comment, qual in itertools.izip_longest(*[in_file]*4):
-                if out_file is None or out_file_read_count == num_reads_per_file:
-                    if out_file is not None:
-                        out_file.close()
-                    out_file = open(out_filename_callback(file_number), 'w')
-                    out_file_read_count = 0
-                    file_number += 1
-                out_file.write(name)
-                out_file.write(seq)
-                out_file.write(comment)
-                out_file.write(qual)
-                out_file_read_count += 1
-        finally:
-            if out_file is not None:
-                out_file.close()
+    destruct.utils.fastq.split_records(in_filename, lines_per_file, out_filename_callback, lines_per_record=1)
+
+
+def split_fastq(in_filename, num_reads_per_file, out_filename_callback, compress_level=None, num_threads=1):
+    destruct.utils.fastq.split_records(in_filename, num_reads_per_file, out_filename_callback,
+        compress_level=compress_level, num_threads=num_threads)
 
 
 def merge_files_by_line(in_filenames, out_filename):
-    with open(out_filename, 'w') as out_file:
+    with open(out_filename, 'wb') as out_file:
         for id, in_filename in sorted(in_filenames.items()):
-            with open(in_filename, 'r') as in_file:
-                for line in in_file:
-                    out_file.write(line)
+            with open(in_filename, 'rb') as in_file:
+                shutil.copyfileobj(in_file, out_file, destruct.utils.fastq.default_block_size)
 
 
 def create_library_ids(library_names):
@@ -130,22 +92,21 @@ def create_library_ids(library_names):
 
 
 def merge_alignment_files(in_filenames, out_filename, library_idxs):
-    with open(out_filename, 'w') as out_file:
+    first_field = re.compile(b'^[^\t\n]*(?=\t)', re.MULTILINE)
+    with open(out_filename, 'wb') as out_file:
         for lib_id, in_filename in in_filenames.items():
-            idx = library_idxs[lib_id]
-            with open(in_filename, 'r') as in_file:
-                for line in in_file:
-                    line = str(idx) + line[line.index('\t'):]
-                    out_file.write(line)
+            idx = str(library_idxs[lib_id])
+            for block, line_ends in destruct.utils.fastq.read_record_blocks(in_filename, lines_per_record=1):
+                block, num_lines = first_field.subn(idx, block)
+                if num_lines != len(line_ends):
+                    raise ValueError('line without tab separated fields in {}'.format(in_filename))
+                out_file.write(block)
 
 
-def merge_sorted_files_by_line(in_filenames, out_filename, temp_space, sort_fields):
-    try:
-        os.makedirs(temp_space)
-    except OSError as e:
-        if e.errno != errno.EEXIST:
-            raise
-    pypeliner.commandline.execute(*['sort', '-T', temp_space, '-m', '-n', '-k', sort_fields] + in_filenames.values() + ['>', out_filename])
+def merge_sorted_files_by_line(in_filenames, out_filename, sort_fields):
+    destruct.utils.streaming.merge_sorted_files(
+        [in_filenames[a] for a in sorted(in_filenames.keys())],
+        out_filename, sort_fields)
 
 
 def generate_chromosome_args(chromosomes):
@@ -156,6 +117,192 @@ def generate_chromosome_args(chromosomes):
     return dict(enumerate(args))
 
 
+def generate_bam_region_args(chromosomes):
+    args = ['--inclrefs ' + chromosome for chromosome in chromosomes]
+    args.append('--exclrefs ' + ','.join(chromosomes))
+    return dict(enumerate(args))
+
+
+bam_orphan_fields = ['name', 'read_end', 'failed_qc', 'sequence', 'qualities']
+
+
+def _read_bam_orphans(orphans_filename, region_idx):
+    with open(orphans_filename, 'r') as orphans_file:
+        for line_idx, line in enumerate(orphans_file):
+            name, read_end, failed_qc, sequence, qualities = line.rstrip('\n').split('\t')
+            yield (name, int(read_end), region_idx, line_idx), failed_qc != '0', sequence, qualities
+
+
+def iter_bam_orphan_pairs(orphans_filenames):
+    """ Pair reads written as orphans by region specific bam extraction.
+
+    Args:
+        orphans_filenames (dict): orphan tables sorted by name, keyed by region
+
+    Yields:
+        tuple: name, end 1 sequence, end 1 qualities, end 2 sequence, end 2
+        qualities for pairs passing qc, ordered by name
+
+    Orphan tables are merged by name, so only the reads of a single name are
+    held in memory.  The first read of each end in region order is used.
+
+    """
+
+    orphan_iters = [
+        _read_bam_orphans(orphans_filename, region_idx)
+        for region_idx, (region, orphans_filename) in enumerate(sorted(orphans_filenames.items()))]
+
+    for name, reads in itertools.groupby(heapq.merge(*orphan_iters), lambda read: read[0][0]):
+        ends = dict()
+        for (_, read_end, _, _), failed_qc, sequence, qualities in reads:
+            ends.setdefault(read_end, (failed_qc, sequence, qualities))
+
+        if 1 not in ends or 2 not in ends or ends[1][0] or ends[2][0]:
+            continue
+
+        yield name, ends[1][1], ends[1][2], ends[2][1], ends[2][2]
+
+
+def _write_fastq_pairs(fastq_files, names, sequences, qualities, start_id):
+    for read_end, fastq_file in enumerate(fastq_files):
+        lines = [None] * (4 * len(names))
+        lines[0::4] = ['@{0}/{1}'.format(start_id + idx, read_end + 1) for idx in xrange(len(names))]
+        lines[1::4] = sequences[read_end]
+        lines[2::4] = ['+' + a for a in names]
+        lines[3::4] = qualities[read_end]
+        fastq_file.write(destruct.utils.fastq.compress_gzip_member('\n'.join(lines) + '\n'))
+
+
+def merge_bam_region_reads(stats_filenames, reads1_filenames, reads2_filenames,
+                           sample1_filenames, sample2_filenames, orphans_filenames,
+                           num_samples, stats_filename, reads1_filename, reads2_filename,
+                           sample1_filename, sample2_filename, seed=2014, orphan_batch_size=100000):
+    """ Merge discordant reads, stats and samples extracted per bam region.
+
+    Args:
+        stats_filenames (dict): region stats filenames
+        reads1_filenames (dict): region end 1 discordant fastq filenames
+        reads2_filenames (dict): region end 2 discordant fastq filenames
+        sample1_filenames (dict): region end 1 sampled fastq filenames
+        sample2_filenames (dict): region end 2 sampled fastq filenames
+        orphans_filenames (dict): region tables of reads with mates in other regions
+        num_samples (int): number of sampled read pairs
+        stats_filename (str): merged stats filename
+        reads1_filename (str): merged end 1 discordant fastq filename
+        reads2_filename (str): merged end 2 discordant fastq filename
+        sample1_filename (str): merged end 1 sampled fastq filename
+        sample2_filename (str): merged end 2 sampled fastq filename
+
+    KwArgs:
+        seed (int): seed for merging samples
+        orphan_batch_size (int): number of orphan pairs written at a time
+
+    Regions are merged in order of their keys, followed by pairs of orphan
+    reads ordered by name, and reads renamed with integer ids.  Samples are
+    merged by drawing from each region's sample in proportion to the number
+    of read pairs of each region remaining.
+
+    """
+
+    regions = sorted(stats_filenames.keys())
+
+    # Merge discordant reads, renaming with integer ids
+    num_reads = 0
+    num_orphans = 0
+    orphan_read_lengths = collections.Counter()
+    with open(reads1_filename, 'wb') as reads1_file, open(reads2_filename, 'wb') as reads2_file:
+        for region in regions:
+            for lines_1, lines_2 in destruct.utils.fastq.read_paired_record_lines(reads1_filenames[region], reads2_filenames[region]):
+                _write_fastq_pairs(
+                    (reads1_file, reads2_file), [a[1:] for a in lines_1[2::4]],
+                    (lines_1[1::4], lines_2[1::4]), (lines_1[3::4], lines_2[3::4]), num_reads)
+                num_reads += len(lines_1) // 4
+
+        orphan_pairs = iter_bam_orphan_pairs(orphans_filenames)
+        while True:
+            batch = list(itertools.islice(orphan_pairs, orphan_batch_size))
+            if len(batch) == 0:
+                break
+            names, sequences_1, qualities_1, sequences_2, qualities_2 = zip(*batch)
+            _write_fastq_pairs(
+                (reads1_file, reads2_file), names,
+                (sequences_1, sequences_2), (qualities_1, qualities_2), num_reads)
+            num_reads += len(batch)
+            num_orphans += len(batch)
+            orphan_read_lengths.update(len(a) for a in sequences_1 + sequences_2)
+
+    # Merge stats, orphan pairs are discordant
+    region_stats = [pd.read_csv(stats_filenames[region], sep='\t', dtype={'key':str}) for region in regions]
+
+    region_read_counts = [
+        stats.loc[(stats['type'] == 'read_count') & (stats['key'] == 'total'), 'value'].sum()
+        for stats in region_stats]
+
+    if num_orphans > 0:
+        read_lengths = pd.Series(orphan_read_lengths).sort_values(ascending=False)
+        region_stats.append(pd.DataFrame({'type': 'read_count', 'key': ['total', 'discordant'], 'value': num_orphans}))
+        region_stats.append(pd.DataFrame({'type': 'read_length', 'key': read_lengths.index.astype(str), 'value': read_lengths.values}))
+
+    stats = pd.concat(region_stats, ignore_index=True)
+    stats = stats.groupby(['type', 'key'], sort=False)['value'].sum().reset_index()
+
+    read_counts = stats[stats['type'] == 'read_count'].set_index('key')['value']
+    if read_counts.get('total', 0) == 0:
+        raise Exception('No reads')
+    if read_counts.get('concordant', 0) == 0:
+        raise Exception('No concordant reads')
+    if read_counts.get('discordant', 0) == 0:
+        raise Exception('No discordant reads')
+
+    stats[['type', 'key', 'value']].to_csv(stats_filename, sep='\t', index=False)
+
+    # Merge samples from region samples and orphan pairs
+    random_state = np.random.RandomState(seed)
+
+    samples = list()
+    for region in regions:
+        lines_1 = list()
+        lines_2 = list()
+        for block_1, block_2 in destruct.utils.fastq.read_paired_record_lines(sample1_filenames[region], sample2_filenames[region]):
+            lines_1.extend(block_1)
+            lines_2.extend(block_2)
+        region_samples = pd.DataFrame({
+            'name': [a[1:] for a in lines_1[2::4]],
+            'sequence_1': lines_1[1::4], 'qualities_1': lines_1[3::4],
+            'sequence_2': lines_2[1::4], 'qualities_2': lines_2[3::4],
+        })
+        samples.append(region_samples.iloc[random_state.permutation(len(region_samples.index))])
+    orphan_order = random_state.permutation(num_orphans)
+
+    remaining = np.array(region_read_counts + [num_orphans], dtype=float)
+    taken = np.zeros(len(samples) + 1, dtype=int)
+    for idx in xrange(int(min(num_samples, remaining.sum()))):
+        population = random_state.choice(len(remaining), p=remaining / remaining.sum())
+        remaining[population] -= 1
+        taken[population] += 1
+
+    # Sampled orphan pairs are retrieved with a second pass over the orphans
+    orphan_sample_idxs = orphan_order[:taken[-1]]
+    orphan_samples = dict()
+    if len(orphan_sample_idxs) > 0:
+        is_sampled = np.zeros(num_orphans, dtype=bool)
+        is_sampled[orphan_sample_idxs] = True
+        for idx, pair in enumerate(iter_bam_orphan_pairs(orphans_filenames)):
+            if is_sampled[idx]:
+                orphan_samples[idx] = pair
+    samples.append(pd.DataFrame(
+        [orphan_samples[idx] for idx in orphan_sample_idxs],
+        columns=['name', 'sequence_1', 'qualities_1', 'sequence_2', 'qualities_2']))
+
+    samples = pd.concat([a.iloc[:n] for a, n in zip(samples, taken)], ignore_index=True)
+
+    with open(sample1_filename, 'wb') as sample1_file, open(sample2_filename, 'wb') as sample2_file:
+        _write_fastq_pairs(
+            (sample1_file, sample2_file), list(samples['name']),
+            (list(samples['sequence_1']), list(samples['sequence_2'])),
+            (list(samples['qualities_1']), list(samples['qualities_2'])), 0)
+
+
 def read_clusters_breakpoints(clusters_filename, breakpoints_filename):
     with open(clusters_filename, 'r') as clusters_file, open(breakpoints_filename, 'r') as breakpoints_file:
         clusters_reader = csv.reader(clusters_file, delimiter='\t')
@@ -190,52 +337,50 @@ def merge_clusters(in_clusters_filenames, in_breakpoints_filenames,
 def tabulate_reads(clusters_filename, library_ids, reads1_filenames, reads2_filenames, reads_table_filename):
     fields = ['cluster_id', 'cluster_end', 'lib_id', 'read_id', 'read_end', 'align_id']
     clusters = pd.read_csv(clusters_filename, sep='\t', names=fields, usecols=['cluster_id', 'lib_id', 'read_id'])
-    clusters = clusters.drop_duplicates().set_index(['lib_id', 'read_id']).sort_index()['cluster_id']
+    clusters = clusters.drop_duplicates().sort_values(['lib_id', 'read_id'])
+    assert not clusters.duplicated(['lib_id', 'read_id']).any()
     with open(reads_table_filename, 'w') as reads_table_file:
         for lib_name in set(reads1_filenames.keys()).union(set(reads2_filenames.keys())):
             lib_id = library_ids[lib_name]
+            lib_clusters = clusters[clusters['lib_id'] == lib_id]
+            selected_read_ids = lib_clusters['read_id'].values
+            selected_cluster_ids = lib_clusters['cluster_id'].values
+            if len(selected_read_ids) == 0:
+                continue
             for reads_filename in [reads1_filenames[lib_name], reads2_filenames[lib_name]]:
-                with gzip.open(reads_filename, 'r') as reads_file:
-                    for name, seq, comment, qual in itertools.izip_longest(*[(a.rstrip() for a in reads_file)]*4):
+                for lines in destruct.utils.fastq.read_record_lines(reads_filename):
+                    names = lines[0::4]
+                    fragment_ids = np.array([int(a[1:-2]) for a in names], dtype=selected_read_ids.dtype)
+                    idxs = np.minimum(np.searchsorted(selected_read_ids, fragment_ids), len(selected_read_ids) - 1)
+                    for record_idx in np.flatnonzero(selected_read_ids[idxs] == fragment_ids):
+                        name, seq, comment, qual = lines[4*record_idx:4*record_idx+4]
                         assert name[0] == '@'
                         assert name[-1] == '1' or name[-1] == '2'
                         assert name[-2] == '/'
-                        fragment_id = int(name[1:-2])
+                        fragment_id = fragment_ids[record_idx]
                         read_end = name[-1]
-                        if (lib_id, fragment_id) in clusters.index:
-                            cluster_id = clusters.loc[(lib_id, fragment_id)]
-                            assert np.issubdtype(type(cluster_id), np.integer)
-                            reads_table_file.write('\t'.join([str(cluster_id), str(lib_id), str(fragment_id), read_end, seq, qual, comment]) + '\n')
+                        cluster_id = selected_cluster_ids[idxs[record_idx]]
+                        reads_table_file.write('\t'.join([str(cluster_id), str(lib_id), str(fragment_id), read_end, seq, qual, comment]) + '\n')
 
 
 class DGVDatabase(object):
     def __init__(self, dgv_filename):
-        self.variations = list()
-        chrvars = collections.defaultdict(list)
-        with open(dgv_filename, 'r') as dgv_file:
-            dgv_reader = csv.reader(dgv_file, delimiter='\t')
-            dgv_header = next(dgv_reader)
-            for row in dgv_reader:
-                id = row[0]
-                chr = row[1]
-                start = int(row[2])
-                end = int(row[3])
-                idx = len(self.variations)
-                chrvars[chr].append((idx, start, end))
-                self.variations.append((id, start, end))
-        self.intervals = dict()
-        for chr, vars in chrvars.iteritems():
-            self.intervals[chr] = pygenes.IntervalTree(vars)
+        dgv = pd.read_csv(dgv_filename, sep='\t', usecols=[0, 1, 2, 3], converters={0: str, 1: str})
+        dgv.columns = ['id', 'chromosome', 'start', 'end']
+        dgv = dgv.sort_values(['chromosome', 'start'], kind='mergesort')
+        self.variations = dict()
+        for chr, vars in dgv.groupby('chromosome'):
+            self.variations[chr] = (vars['id'].values, vars['start'].values, vars['end'].values)
 
     def query(self, chromosome, start, end):
-        if chromosome not in self.intervals:
+        if chromosome not in self.variations:
             return
-        idxs = self.intervals[chromosome].find_overlapping(start, end)
-        for idx in [idxs[a] for a in range(0, len(idxs))]:
-            startdiff = abs(start - self.variations[idx][1])
-            enddiff = abs(end - self.variations[idx][2])
-            if startdiff < 500 and enddiff < 500:
-                yield self.variations[idx][0]
+        ids, starts, ends = self.variations[chromosome]
+        first, last = np.searchsorted(starts, [start - 499, start + 500])
+        for idx in xrange(first, last):
+            overlapping = starts[idx] <= end and ends[idx] >= start
+            if overlapping and abs(end - ends[idx]) < 500:
+                yield ids[idx]
 
 
 def merge_tars(output_filename, *input_filename_sets):
@@ -253,50 +398,38 @@ converters = {'chromosome': str,
               'inserted': str}
 
 
-def create_sequence(row, reference_sequences):
-    breakend_sequences = ['', '']
+def create_sequences(breakpoints, genome):
+    """ Create the sequence across each breakpoint, fetching breakend sequences with a single query per side.
+    """
     expected_strands = ('+', '-')
-    inserted = ''
-    if inserted != '.':
-        inserted = row['inserted']
+    breakend_sequences = list()
     for side in (0, 1):
-        chromosome = row['chromosome_{0}'.format(side+1)]
-        strand = row['strand_{0}'.format(side+1)]
-        position = row['position_{0}'.format(side+1)]
-        length = row['template_length_{0}'.format(side+1)]
-        if strand == '+':
-            start = position - length + 1
-            end = position
-        else:
-            start = position
-            end = position + length - 1
-        breakend_sequences[side] = reference_sequences[chromosome][start-1:end]
-        if strand != expected_strands[side]:
-            breakend_sequences[side] = destruct.utils.misc.reverse_complement(breakend_sequences[side])
-    return breakend_sequences[0] + '[' + inserted + ']' + breakend_sequences[1]
-
-
-def annotate_genes(row, gene_models):
+        strand = breakpoints['strand_{0}'.format(side+1)].values
+        position = breakpoints['position_{0}'.format(side+1)].values
+        length = breakpoints['template_length_{0}'.format(side+1)].values
+        start = np.where(strand == '+', position - length + 1, position)
+        end = np.where(strand == '+', position, position + length - 1)
+        sequences = genome.fetch_batch(breakpoints['chromosome_{0}'.format(side+1)].values, start - 1, end)
+        breakend_sequences.append([
+            destruct.utils.misc.reverse_complement(sequence) if s != expected_strands[side] else sequence
+            for sequence, s in zip(sequences, strand)])
+    return [a + '[' + inserted + ']' + b for a, inserted, b in zip(
+        breakend_sequences[0], breakpoints['inserted'].values, breakend_sequences[1])]
 
-    for side in (0, 1):
 
-        chromosome = row['chromosome_{0}'.format(side+1)]
-        position = row['position_{0}'.format(side+1)]
+def annotate_genes(breakpoints, genes):
+
+    for side in (0, 1):
 
-        nearest_gene_ids = gene_models.find_nearest_genes(chromosome, position)
-        gene_id = 'NA'
-        gene_name = 'NA'
-        gene_location = 'NA'
-        if len(nearest_gene_ids) > 0:
-            gene_id = nearest_gene_ids[0]
-            gene_name = gene_models.get_gene(gene_id).name
-            gene_location = gene_models.calculate_gene_location(gene_id, position)
+        annotation = genes.annotate(
+            breakpoints['chromosome_{0}'.format(side+1)].values,
+            breakpoints['position_{0}'.format(side+1)].values)
 
-        row['gene_id_{0}'.format(side+1)] = gene_id
-        row['gene_name_{0}'.format(side+1)] = gene_name
-        row['gene_location_{0}'.format(side+1)] = gene_location
+        breakpoints['gene_id_{0}'.format(side+1)] = annotation['gene_id'].values
+        breakpoints['gene_name_{0}'.format(side+1)] = annotation['gene_name'].values
+        breakpoints['gene_location_{0}'.format(side+1)] = annotation['gene_location'].values
 
-    return row
+    return breakpoints
 
 
 def query_dgv(row, dgv):
@@ -315,22 +448,43 @@ def query_dgv(row, dgv):
     return ', '.join(variants)
 
 
+def calculate_breakpoint_type(breakpoints):
+    """ Classify breakpoints as translocation, inversion, deletion or duplication.
+    """
+
+    # Strand of the breakend with the lesser position, ties broken by strand
+    is_first_lesser = (
+        (breakpoints['position_1'] < breakpoints['position_2']) |
+        ((breakpoints['position_1'] == breakpoints['position_2']) &
+         (breakpoints['strand_1'] <= breakpoints['strand_2'])))
+    lesser_strand = np.where(is_first_lesser, breakpoints['strand_1'], breakpoints['strand_2'])
+
+    return np.select(
+        [
+            breakpoints['chromosome_1'] != breakpoints['chromosome_2'],
+            breakpoints['strand_1'] == breakpoints['strand_2'],
+            lesser_strand == '+',
+        ],
+        ['translocation', 'inversion', 'deletion'],
+        default='duplication')
+
+
 def tabulate_results(breakpoints_filename, likelihoods_filename, library_ids,
                      genome_fasta, gtf_filename, dgv_filename,
                      breakpoint_table, breakpoint_library_table):
 
     lib_names = pd.DataFrame(library_ids.items(), columns=['library', 'library_id'])
 
-    breakpoints = pd.read_csv(breakpoints_filename, sep='\t',
-                              names=destruct.predict_breaks.breakpoint_fields,
-                              converters=converters)
+    breakpoints = destruct.utils.table.read_table(breakpoints_filename,
+                                                  destruct.predict_breaks.breakpoint_fields,
+                                                  converters=converters)
     breakpoints = breakpoints.drop(['breakpoint_id'], axis=1)
     breakpoints = breakpoints.rename(columns={'count':'num_split'})
     breakpoints.loc[breakpoints['inserted'] == '.', 'inserted'] = ''
 
-    likelihoods = pd.read_csv(likelihoods_filename, sep='\t',
-                              names=destruct.predict_breaks.likelihoods_fields,
-                              converters=converters)
+    likelihoods = destruct.utils.table.read_table(likelihoods_filename,
+                                                  destruct.predict_breaks.likelihoods_fields,
+                                                  converters=converters)
     likelihoods = likelihoods.drop(['breakpoint_id'], axis=1)
 
     breakpoint_reads = (
@@ -389,45 +543,27 @@ def tabulate_results(breakpoints_filename, likelihoods_filename, library_ids,
     breakpoints = breakpoints.merge(breakpoint_unique_counts, on='cluster_id', how='inner')
 
     # Calculate breakpoint type
-    def breakpoint_type(row):
-        if row['chromosome_1'] != row['chromosome_2']:
-            return 'translocation'
-        if row['strand_1'] == row['strand_2']:
-            return 'inversion'
-        positions = sorted([(row['position_{0}'.format(side)], row['strand_{0}'.format(side)]) for side in (1, 2)])
-        if positions[0][1] == '+':
-            return 'deletion'
-        else:
-            return 'duplication'
-
-    breakpoints['type'] = breakpoints.apply(breakpoint_type, axis=1)
+    breakpoints['type'] = calculate_breakpoint_type(breakpoints)
 
     # Calculate number inserted at the breakpoint
-    def calculate_num_inserted(row):
-        if row['inserted'] == '.':
-            return 0
-        else:
-            return len(row['inserted'])
+    breakpoints['num_inserted'] = np.where(breakpoints['inserted'] == '.', 0, breakpoints['inserted'].str.len())
 
-    breakpoints['num_inserted'] = breakpoints.apply(calculate_num_inserted, axis=1)
+    # Annotate sequence from the packed or indexed reference
+    genome = destruct.utils.seq.open_genome(genome_fasta)
 
-    # Annotate sequence
-    reference_sequences = dict()
-    for id, seq in destruct.utils.seq.read_sequences(open(genome_fasta, 'r')):
-        reference_sequences[id] = seq
+    breakpoints['sequence'] = create_sequences(breakpoints, genome)
 
-    breakpoints['sequence'] = breakpoints.apply(lambda row: create_sequence(row, reference_sequences), axis=1)
+    genome.close()
 
-    # Annotate gene information
-    gene_models = pygenes.GeneModels()
-    gene_models.load_ensembl_gtf(gtf_filename)
+    # Annotate gene information from the prebuilt gene table if available
+    genes = destruct.utils.genes.load_gene_table(gtf_filename)
 
-    breakpoints = breakpoints.apply(lambda row: annotate_genes(row, gene_models), axis=1)
+    breakpoints = annotate_genes(breakpoints, genes)
 
     # Annotate database of genomic variants
     dgv = DGVDatabase(dgv_filename)
 
-    breakpoints['dgv_ids'] = breakpoints.apply(lambda row: query_dgv(row, dgv), axis=1)
+    breakpoints['dgv_ids'] = [query_dgv(row, dgv) for idx, row in breakpoints.iterrows()]
 
     breakpoints = breakpoints.rename(columns={'cluster_id':'prediction_id'})
 
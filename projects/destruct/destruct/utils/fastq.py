@@ -0,0 +1,282 @@
+import itertools
+import zlib
+import multiprocessing.pool
+import numpy as np
+
+
+default_block_size = 16 * 1024 * 1024
+
+gzip_magic = b'\x1f\x8b'
+gzip_wbits = 16 + zlib.MAX_WBITS
+
+
+def read_blocks(filename, block_size=default_block_size):
+    """ Read large blocks of a plain or gzip compressed file.
+
+    Args:
+        filename (str): input filename, gzip compression detected from content
+
+    KwArgs:
+        block_size (int): size of each read from the file
+
+    Yields:
+        str: uncompressed data
+
+    Concatenated gzip members, as written by `compress_gzip_member`, are
+    supported.
+
+    """
+
+    with open(filename, 'rb') as in_file:
+        data = in_file.read(block_size)
+
+        if not data.startswith(gzip_magic):
+            while data:
+                yield data
+                data = in_file.read(block_size)
+            return
+
+        decompressor = zlib.decompressobj(gzip_wbits)
+        while data:
+            block = decompressor.decompress(data)
+            if block:
+                yield block
+            if decompressor.unused_data:
+                data = decompressor.unused_data
+                decompressor = zlib.decompressobj(gzip_wbits)
+            else:
+                data = in_file.read(block_size)
+
+        block = decompressor.flush()
+        if block:
+            yield block
+
+
+def read_record_blocks(filename, lines_per_record=4, block_size=default_block_size):
+    """ Read blocks of whole multi-line records.
+
+    Args:
+        filename (str): input filename, plain or gzip compressed
+
+    KwArgs:
+        lines_per_record (int): number of lines per record, 4 for fastq
+        block_size (int): size of each read from the file
+
+    Yields:
+        str: block of whole records
+        numpy.array: offset of the end of each record in the block
+
+    """
+
+    remainder = b''
+
+    for block in read_blocks(filename, block_size=block_size):
+        block = remainder + block
+
+        line_ends = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == ord('\n')) + 1
+        record_ends = line_ends[lines_per_record-1::lines_per_record]
+
+        if len(record_ends) == 0:
+            remainder = block
+            continue
+
+        yield block[:record_ends[-1]], record_ends
+
+        remainder = block[record_ends[-1]:]
+
+    if remainder:
+        line_ends = np.flatnonzero(np.frombuffer(remainder, dtype=np.uint8) == ord('\n')) + 1
+        record_ends = line_ends[lines_per_record-1::lines_per_record]
+
+        # Truncated final record
+        if len(record_ends) == 0 or record_ends[-1] != len(remainder):
+            record_ends = np.append(record_ends, len(remainder))
+
+        yield remainder, record_ends
+
+
+def read_record_lines(filename, lines_per_record=4, block_size=default_block_size):
+    """ Read blocks of whole multi-line records as lists of lines.
+
+    Args:
+        filename (str): input filename, plain or gzip compressed
+
+    KwArgs:
+        lines_per_record (int): number of lines per record, 4 for fastq
+        block_size (int): size of each read from the file
+
+    Yields:
+        list of str: lines without newlines, a multiple of lines_per_record
+
+    A truncated final record is dropped.
+
+    """
+
+    for block, record_ends in read_record_blocks(filename, lines_per_record=lines_per_record, block_size=block_size):
+        lines = block.split(b'\n')
+        if block.endswith(b'\n'):
+            lines.pop()
+
+        del lines[len(lines) - len(lines) % lines_per_record:]
+
+        if len(lines) > 0:
+            yield lines
+
+
+def read_paired_record_lines(filename_1, filename_2, lines_per_record=4, block_size=default_block_size):
+    """ Read blocks of lines for the same records from a pair of files.
+
+    Args:
+        filename_1 (str): end 1 filename, plain or gzip compressed
+        filename_2 (str): end 2 filename, plain or gzip compressed
+
+    KwArgs:
+        lines_per_record (int): number of lines per record, 4 for fastq
+        block_size (int): size of each read from the file
+
+    Yields:
+        list of str: end 1 lines without newlines
+        list of str: end 2 lines without newlines, same length as end 1 lines
+
+    Reading stops at the end of the shorter file.
+
+    """
+
+    line_iters = [
+        read_record_lines(filename, lines_per_record=lines_per_record, block_size=block_size)
+        for filename in (filename_1, filename_2)
+    ]
+
+    lines = [[], []]
+
+    while True:
+        for read_end in (0, 1):
+            while len(lines[read_end]) == 0:
+                lines[read_end] = next(line_iters[read_end], None)
+                if lines[read_end] is None:
+                    return
+
+        num_lines = min(len(lines[0]), len(lines[1]))
+
+        yield lines[0][:num_lines], lines[1][:num_lines]
+
+        lines = [lines[0][num_lines:], lines[1][num_lines:]]
+
+
+def compress_gzip_member(data, compress_level=6):
+    """ Compress data as a standalone gzip member.
+
+    Args:
+        data (str): data to compress
+
+    KwArgs:
+        compress_level (int): zlib compression level
+
+    Returns:
+        str: gzip compressed data
+
+    Concatenated members form a valid gzip file, allowing blocks to be
+    compressed independently.
+
+    """
+
+    compressor = zlib.compressobj(compress_level, zlib.DEFLATED, gzip_wbits)
+    return compressor.compress(data) + compressor.flush()
+
+
+def write_blocks(blocks, out_filename_callback, compress_level=None, num_threads=1):
+    """ Write numbered blocks to a set of output files.
+
+    Args:
+        blocks (iter of tuple): file number and data, file numbers in order
+        out_filename_callback (callable): filename from file number
+
+    KwArgs:
+        compress_level (int): gzip compression level, None for uncompressed
+        num_threads (int): number of threads for compression
+
+    Blocks are compressed in batches on a thread pool, zlib releases the GIL
+    during compression.
+
+    """
+
+    blocks = iter(blocks)
+
+    pool = None
+    if compress_level is not None and num_threads > 1:
+        pool = multiprocessing.pool.ThreadPool(num_threads)
+
+    def compress(data):
+        return compress_gzip_member(data, compress_level=compress_level)
+
+    out_file = None
+    out_file_number = None
+
+    try:
+        while True:
+            batch = list(itertools.islice(blocks, max(num_threads, 1)))
+            if len(batch) == 0:
+                break
+
+            batch_data = [data for file_number, data in batch]
+            if compress_level is not None and pool is not None:
+                batch_data = pool.map(compress, batch_data)
+            elif compress_level is not None:
+                batch_data = [compress(data) for data in batch_data]
+
+            for (file_number, _), data in zip(batch, batch_data):
+                if file_number != out_file_number:
+                    if out_file is not None:
+                        out_file.close()
+                    out_file = open(out_filename_callback(file_number), 'wb')
+                    out_file_number = file_number
+                out_file.write(data)
+
+    finally:
+        if out_file is not None:
+            out_file.close()
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def split_records(in_filename, records_per_file, out_filename_callback, lines_per_record=4,
+                  compress_level=None, num_threads=1, block_size=default_block_size):
+    """ Split a file of multi-line records into files of a fixed number of records.
+
+    Args:
+        in_filename (str): input filename, plain or gzip compressed
+        records_per_file (int): number of records per output file
+        out_filename_callback (callable): filename from file number
+
+    KwArgs:
+        lines_per_record (int): number of lines per record, 4 for fastq
+        compress_level (int): gzip compression level, None for uncompressed
+        num_threads (int): number of threads for compression
+        block_size (int): size of each read from the file
+
+    """
+
+    def split_blocks():
+        file_number = 0
+        file_records = 0
+
+        for block, record_ends in read_record_blocks(in_filename, lines_per_record=lines_per_record, block_size=block_size):
+            start_record = 0
+
+            while start_record < len(record_ends):
+                num_records = min(len(record_ends) - start_record, records_per_file - file_records)
+
+                start = record_ends[start_record - 1] if start_record > 0 else 0
+                end = record_ends[start_record + num_records - 1]
+
+                yield file_number, block[start:end]
+
+                start_record += num_records
+                file_records += num_records
+
+                if file_records == records_per_file:
+                    file_number += 1
+                    file_records = 0
+
+    write_blocks(split_blocks(), out_filename_callback, compress_level=compress_level, num_threads=num_threads)
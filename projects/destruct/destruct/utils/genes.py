@@ -0,0 +1,276 @@
+import csv
+import os
+import pickle
+import numpy as np
+import pandas as pd
+
+
+gene_table_version = 1
+
+
+def gene_table_filename(gtf_filename):
+    """ Default filename of the gene table for a gtf.
+    """
+    return gtf_filename + '.genes'
+
+
+def _file_signature(filename):
+    return (os.path.getsize(filename), os.path.getmtime(filename))
+
+
+def read_gtf_tables(gtf_filename):
+    """ Read gene, exon, cds and codon tables from an ensembl gtf.
+
+    Args:
+        gtf_filename (str): ensembl gtf filename
+
+    Returns:
+        dict: tables keyed by 'genes', 'exons', 'cds', 'codons'
+
+    Genes span all features with the same gene id.  Transcripts are ranked by
+    id within each gene, and start and stop codons are taken from the last
+    feature for each transcript, as for pygenes.
+
+    """
+
+    gtf = pd.read_csv(
+        gtf_filename, sep='\t', header=None, usecols=[0, 2, 3, 4, 6, 8],
+        names=['chromosome', 'source', 'feature', 'start', 'end', 'score', 'strand', 'frame', 'attributes'],
+        dtype={'chromosome': str}, quoting=csv.QUOTE_NONE)
+
+    gtf = gtf[gtf['feature'].notnull()]
+    gtf['start'] = gtf['start'].astype(int)
+    gtf['end'] = gtf['end'].astype(int)
+
+    for key in ('gene_id', 'transcript_id', 'gene_name'):
+        gtf[key] = gtf['attributes'].str.extract(key + ' "([^"]*)"', expand=False).fillna('')
+
+    genes = gtf.groupby('gene_id').agg({'start': 'min', 'end': 'max'})
+    genes = genes.join(gtf.groupby('gene_id')[['gene_name', 'chromosome', 'strand']].last())
+    genes = genes.reset_index()
+    genes = genes.sort_values(['chromosome', 'start', 'gene_id'], kind='mergesort').reset_index(drop=True)
+
+    transcripts = gtf[['gene_id', 'transcript_id']].drop_duplicates()
+    transcripts = transcripts.sort_values(['gene_id', 'transcript_id'], kind='mergesort')
+    transcripts['transcript_rank'] = transcripts.groupby('gene_id').cumcount()
+
+    def feature_table(feature):
+        features = gtf.loc[gtf['feature'] == feature, ['gene_id', 'transcript_id', 'start', 'end']]
+        return features.merge(transcripts)[['gene_id', 'transcript_rank', 'start', 'end']]
+
+    codons = list()
+    for feature in ('start_codon', 'stop_codon'):
+        features = gtf.loc[gtf['feature'] == feature, ['gene_id', 'transcript_id', 'start', 'end']]
+        features = features.drop_duplicates(['gene_id', 'transcript_id'], keep='last')
+        codons.append(features.rename(columns={'start': feature + '_start', 'end': feature + '_end'}))
+    codons = codons[0].merge(codons[1]).merge(transcripts)
+    codons = codons[['gene_id', 'transcript_rank', 'start_codon_start', 'start_codon_end', 'stop_codon_start', 'stop_codon_end']]
+
+    return {
+        'genes': genes[['gene_id', 'gene_name', 'chromosome', 'strand', 'start', 'end']],
+        'exons': feature_table('exon'),
+        'cds': feature_table('CDS'),
+        'codons': codons,
+    }
+
+
+def write_gene_table(gtf_filename, table_filename):
+    """ Write gene tables for fast gene annotation.
+
+    Args:
+        gtf_filename (str): ensembl gtf filename
+        table_filename (str): output gene table filename
+
+    The size and modification time of the gtf are stored with the tables,
+    and a table no longer matching the gtf is ignored by `load_gene_table`.
+
+    """
+
+    tables = read_gtf_tables(gtf_filename)
+
+    temp_filename = table_filename + '.tmp.{}'.format(os.getpid())
+
+    with open(temp_filename, 'wb') as table_file:
+        pickle.dump((gene_table_version, _file_signature(gtf_filename), tables), table_file, pickle.HIGHEST_PROTOCOL)
+
+    os.rename(temp_filename, table_filename)
+
+
+def load_gene_table(gtf_filename, table_filename=None):
+    """ Load gene tables, reading the gtf if no matching gene table exists.
+
+    Args:
+        gtf_filename (str): ensembl gtf filename
+
+    KwArgs:
+        table_filename (str): gene table filename, defaults to `gene_table_filename`
+
+    Returns:
+        GeneTable: gene table
+
+    """
+
+    if table_filename is None:
+        table_filename = gene_table_filename(gtf_filename)
+
+    if os.path.exists(table_filename):
+        with open(table_filename, 'rb') as table_file:
+            version, signature, tables = pickle.load(table_file)
+        if version == gene_table_version and signature == _file_signature(gtf_filename):
+            return GeneTable(tables)
+
+    return GeneTable(read_gtf_tables(gtf_filename))
+
+
+class GeneTable(object):
+    """ Nearest gene and gene location annotation of genomic positions.
+
+    Args:
+        tables (dict): tables as returned by `read_gtf_tables`
+
+    Genes of each chromosome are sorted by start, with the running maximum of
+    gene ends, such that the nearest gene is found with a searchsorted window
+    either side of each position.
+
+    """
+
+    def __init__(self, tables):
+        self.genes = tables['genes']
+        self.exons = tables['exons']
+        self.cds = tables['cds']
+        self.codons = tables['codons']
+
+        self.chromosome_genes = dict()
+        for chromosome, genes in self.genes.groupby('chromosome'):
+            starts = genes['start'].values
+            ends = genes['end'].values
+            self.chromosome_genes[chromosome] = (genes['gene_id'].values, starts, ends, np.maximum.accumulate(ends))
+
+    def _find_nearest_chromosome_genes(self, chromosome, positions):
+        gene_ids, starts, ends, max_ends = self.chromosome_genes[chromosome]
+
+        # Nearest gene starting after each position
+        right_idx = np.searchsorted(starts, positions, side='right')
+        right_distance = np.where(
+            right_idx < len(starts),
+            starts[np.minimum(right_idx, len(starts) - 1)] - positions,
+            np.iinfo(np.int64).max)
+
+        # Nearest gene starting at or before each position, the first gene
+        # attaining the maximum end, or the first overlapping gene
+        left_max_end = max_ends[np.maximum(right_idx - 1, 0)]
+        left_idx = np.searchsorted(max_ends, np.minimum(left_max_end, positions), side='left')
+        left_distance = np.where(
+            right_idx > 0,
+            np.maximum(positions - left_max_end, 0),
+            np.iinfo(np.int64).max)
+
+        nearest_idx = np.where(left_distance <= right_distance, left_idx, right_idx)
+
+        return gene_ids[nearest_idx]
+
+    def find_nearest_genes(self, chromosomes, positions):
+        """ Find the nearest gene to each position.
+
+        Args:
+            chromosomes (numpy.array): chromosome of each position
+            positions (numpy.array): 1-based positions
+
+        Returns:
+            numpy.array: nearest gene ids, 'NA' for chromosomes without genes
+
+        Ties are resolved by lowest gene start, then by gene id.
+
+        """
+
+        chromosomes = np.asarray(chromosomes)
+        positions = np.asarray(positions, dtype=np.int64)
+
+        nearest = np.array(['NA'] * len(positions), dtype=object)
+
+        for chromosome in np.unique(chromosomes):
+            if chromosome not in self.chromosome_genes:
+                continue
+            idxs = np.flatnonzero(chromosomes == chromosome)
+            nearest[idxs] = self._find_nearest_chromosome_genes(chromosome, positions[idxs])
+
+        return nearest
+
+    def calculate_gene_locations(self, gene_ids, positions):
+        """ Calculate the location of each position relative to a gene.
+
+        Args:
+            gene_ids (numpy.array): gene ids
+            positions (numpy.array): 1-based positions
+
+        Returns:
+            numpy.array: one of 'upstream', 'downstream', 'coding', 'utr5p',
+            'utr3p', 'utr' or 'intron'
+
+        Exon, cds and utr features of all transcripts of the gene are
+        considered, matching the locations calculated by pygenes.
+
+        """
+
+        queries = pd.DataFrame({'gene_id': gene_ids, 'position': positions})
+        queries['query_idx'] = xrange(len(queries.index))
+        queries = queries.merge(self.genes[['gene_id', 'strand', 'start', 'end']], how='left')
+        queries = queries.sort_values('query_idx').set_index('query_idx')
+
+        is_forward = queries['strand'] == '+'
+        is_upstream = np.where(is_forward, queries['position'] < queries['start'], queries['position'] > queries['end'])
+        is_downstream = np.where(is_forward, queries['position'] > queries['end'], queries['position'] < queries['start'])
+
+        def overlapping(features):
+            overlaps = queries[['gene_id', 'position']].reset_index().merge(features)
+            overlaps = overlaps[(overlaps['position'] >= overlaps['start']) & (overlaps['position'] <= overlaps['end'])]
+            return overlaps
+
+        exons = overlapping(self.exons)
+        is_exon = queries.index.isin(exons['query_idx'])
+        is_cds = queries.index.isin(overlapping(self.cds)['query_idx'])
+
+        # UTRs of transcripts with start and stop codons, for which the
+        # position is in an exon of that or an earlier ranked transcript
+        first_exon_rank = exons.groupby('query_idx')['transcript_rank'].min().rename('first_exon_rank').reset_index()
+        utrs = queries[['gene_id', 'position', 'strand']].reset_index().merge(first_exon_rank).merge(self.codons)
+        utrs = utrs[utrs['transcript_rank'] >= utrs['first_exon_rank']]
+        utr_forward = utrs['strand'] == '+'
+        utrs['utr5p'] = np.where(
+            utr_forward,
+            utrs['position'] < utrs['start_codon_start'],
+            utrs['position'] > utrs['start_codon_end'])
+        utrs['utr3p'] = ~utrs['utr5p'] & np.where(
+            utr_forward,
+            utrs['position'] > utrs['stop_codon_end'],
+            utrs['position'] < utrs['stop_codon_start'])
+        is_utr5p = queries.index.isin(utrs.loc[utrs['utr5p'], 'query_idx'])
+        is_utr3p = queries.index.isin(utrs.loc[utrs['utr3p'], 'query_idx'])
+
+        return np.select(
+            [is_upstream, is_downstream, is_cds, is_utr5p, is_utr3p, is_exon],
+            ['upstream', 'downstream', 'coding', 'utr5p', 'utr3p', 'utr'],
+            default='intron')
+
+    def annotate(self, chromosomes, positions):
+        """ Annotate positions with the nearest gene and location in that gene.
+
+        Args:
+            chromosomes (numpy.array): chromosome of each position
+            positions (numpy.array): 1-based positions
+
+        Returns:
+            pandas.DataFrame: columns 'gene_id', 'gene_name', 'gene_location',
+            'NA' for positions without a nearest gene
+
+        """
+
+        annotation = pd.DataFrame({'gene_id': self.find_nearest_genes(chromosomes, positions)})
+        annotation['gene_name'] = annotation['gene_id'].map(self.genes.set_index('gene_id')['gene_name']).fillna('NA')
+        annotation['gene_location'] = 'NA'
+
+        has_gene = (annotation['gene_id'] != 'NA').values
+        annotation.loc[has_gene, 'gene_location'] = self.calculate_gene_locations(
+            annotation.loc[has_gene, 'gene_id'].values, np.asarray(positions)[has_gene])
+
+        return annotation[['gene_id', 'gene_name', 'gene_location']]
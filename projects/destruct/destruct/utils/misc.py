@@ -84,3 +84,92 @@ def normalize_breakpoint(chr1, str1, pos1, chr2, str2, pos2, genome, max_offset=
 
     return position[0], position[1], homology
 
+
+_complement = np.arange(256, dtype=np.uint8)
+_complement[np.frombuffer(b'ACTGactg', dtype=np.uint8)] = np.frombuffer(b'TGACtgac', dtype=np.uint8)
+
+
+def _gather_nucleotides(genome, chromosome, position):
+    """ Gather nucleotides at 1-based positions, -1 for positions outside the chromosome.
+    """
+    if hasattr(genome, 'gather'):
+        return genome.gather(chromosome, position - 1)
+    nucleotides = np.full(position.shape, -1, dtype=np.int16)
+    for chrom in np.unique(chromosome):
+        rows = np.flatnonzero(chromosome == chrom)
+        sequence = np.frombuffer(genome[chrom], dtype=np.uint8)
+        chrom_position = position[rows]
+        valid = (chrom_position >= 1) & (chrom_position <= len(sequence))
+        chrom_nucleotides = np.full(chrom_position.shape, -1, dtype=np.int16)
+        chrom_nucleotides[valid] = sequence[chrom_position[valid] - 1]
+        nucleotides[rows] = chrom_nucleotides
+    return nucleotides
+
+
+def calculate_forward_homologies(chromosome_1, strand_1, position_1, chromosome_2, strand_2, position_2, genome, max_offset):
+    """ Batched calculate_forward_homology, arrays of breakends with side 1 as the first breakend.
+    """
+    offsets = np.arange(1, max_offset + 1)
+    direction_1 = np.where(strand_1 == '+', 1, -1)[:, np.newaxis]
+    direction_2 = np.where(strand_2 == '+', 1, -1)[:, np.newaxis]
+
+    nt_1 = _gather_nucleotides(genome, chromosome_1, position_1[:, np.newaxis] + direction_1 * offsets)
+    nt_2 = _gather_nucleotides(genome, chromosome_2, position_2[:, np.newaxis] + direction_2 * (1 - offsets))
+
+    nt_1 = np.where((strand_1 != '+')[:, np.newaxis] & (nt_1 >= 0), _complement[np.maximum(nt_1, 0)], nt_1)
+    nt_2 = np.where((strand_2 != '-')[:, np.newaxis] & (nt_2 >= 0), _complement[np.maximum(nt_2, 0)], nt_2)
+
+    matches = (nt_1 == nt_2) & (nt_1 >= 0)
+
+    return np.cumprod(matches, axis=1).sum(axis=1)
+
+
+def normalize_breakpoints(chromosome_1, strand_1, position_1, chromosome_2, strand_2, position_2, genome, max_offset=100):
+    """ Normalize an array of breakpoints with respect to breakpoint homology.
+
+    Args:
+        chromosome_1, strand_1, position_1 (numpy.array): first breakends
+        chromosome_2, strand_2, position_2 (numpy.array): second breakends
+        genome (dict or PackedGenome): reference sequences keyed by chromosome
+
+    KwArgs:
+        max_offset (int): maximum homology considered
+
+    Returns:
+        numpy.array: normalized position 1
+        numpy.array: normalized position 2
+        numpy.array: homology
+
+    Vectorised equivalent of normalize_breakpoint.
+
+    """
+
+    chromosome_1 = np.asarray(chromosome_1)
+    chromosome_2 = np.asarray(chromosome_2)
+    strand_1 = np.asarray(strand_1)
+    strand_2 = np.asarray(strand_2)
+    position_1 = np.asarray(position_1, dtype=np.int64)
+    position_2 = np.asarray(position_2, dtype=np.int64)
+
+    max_offset_a = calculate_forward_homologies(
+        chromosome_1, strand_1, position_1, chromosome_2, strand_2, position_2, genome, max_offset)
+    max_offset_b = calculate_forward_homologies(
+        chromosome_2, strand_2, position_2, chromosome_1, strand_1, position_1, genome, max_offset)
+
+    direction_1 = np.where(strand_1 == '+', 1, -1)
+    direction_2 = np.where(strand_2 == '+', 1, -1)
+
+    position_a_1 = position_1 + direction_1 * max_offset_a
+    position_a_2 = position_2 - direction_2 * max_offset_a
+
+    position_b_1 = position_1 - direction_1 * max_offset_b
+    position_b_2 = position_2 + direction_2 * max_offset_b
+
+    # Select the breakpoint for which the minimum of the two breakend positions is minimal
+    select_a = np.minimum(position_a_1, position_a_2) < np.minimum(position_b_1, position_b_2)
+
+    norm_position_1 = np.where(select_a, position_a_1, position_b_1)
+    norm_position_2 = np.where(select_a, position_a_2, position_b_2)
+
+    return norm_position_1, norm_position_2, max_offset_a + max_offset_b
+
@@ -1,3 +1,10 @@
+import mmap
+import os
+import pickle
+import struct
+import numpy as np
+
+
 
 
 def read_sequences(fasta):
@@ -17,3 +24,423 @@ def read_sequences(fasta):
     if id is not None:
         yield (id, ''.join(sequences))
 
+
+class FastaIndex(object):
+    """ Random access to sequences of a samtools faidx indexed fasta.
+
+    Args:
+        fasta_filename (str): fasta filename
+
+    KwArgs:
+        fai_filename (str): index filename, defaults to fasta filename with .fai
+
+    """
+
+    def __init__(self, fasta_filename, fai_filename=None):
+        if fai_filename is None:
+            fai_filename = fasta_filename + '.fai'
+        self.fasta_file = open(fasta_filename, 'rb')
+        self.index = dict()
+        with open(fai_filename, 'r') as fai_file:
+            for line in fai_file:
+                fields = line.rstrip().split('\t')
+                self.index[fields[0]] = tuple(int(a) for a in fields[1:5])
+
+    def __contains__(self, chromosome):
+        return chromosome in self.index
+
+    def close(self):
+        self.fasta_file.close()
+
+    def fetch(self, chromosome, start, end):
+        """ Fetch a subsequence, 0-based half open coordinates clipped to the sequence.
+        """
+        length, offset, line_bases, line_width = self.index[chromosome]
+        start = min(max(start, 0), length)
+        end = min(max(end, start), length)
+        if start == end:
+            return ''
+        file_start = offset + (start // line_bases) * line_width + start % line_bases
+        file_end = offset + ((end - 1) // line_bases) * line_width + (end - 1) % line_bases + 1
+        self.fasta_file.seek(file_start)
+        data = self.fasta_file.read(file_end - file_start)
+        return data.replace('\n', '').replace('\r', '')
+
+
+    def fetch_batch(self, chromosomes, starts, ends):
+        """ Fetch a list of subsequences, 0-based half open coordinates clipped to the sequence.
+        """
+        return [self.fetch(chromosome, start, end) for chromosome, start, end in zip(chromosomes, starts, ends)]
+
+
+packed_genome_magic = b'DESTRUCTGENOME2'
+
+_packed_genome_header = struct.Struct('<Qd')
+
+_nucleotide_codes = np.full(256, -1, dtype=np.int8)
+for _code, _nucleotide in enumerate('ACGT'):
+    _nucleotide_codes[ord(_nucleotide)] = _code
+    _nucleotide_codes[ord(_nucleotide.lower())] = _code
+
+_code_nucleotides = np.frombuffer(b'ACGT', dtype=np.uint8)
+
+
+def packed_genome_filename(fasta_filename):
+    """ Default filename of the packed genome for a fasta.
+    """
+    return fasta_filename + '.packed'
+
+
+def _file_signature(filename):
+    return (os.path.getsize(filename), os.path.getmtime(filename))
+
+
+def _iter_sequence_chunks(fasta_filename, fai_filename, chunk_size):
+    """ Iterate chunks of each sequence of a fasta, using the index if it exists.
+    """
+    if os.path.exists(fai_filename):
+        fasta_index = FastaIndex(fasta_filename, fai_filename=fai_filename)
+        try:
+            with open(fai_filename, 'r') as fai_file:
+                chromosomes = [line.split('\t')[0] for line in fai_file]
+            for chromosome in chromosomes:
+                length = fasta_index.index[chromosome][0]
+                chunks = (fasta_index.fetch(chromosome, start, start + chunk_size) for start in xrange(0, length, chunk_size))
+                yield chromosome, chunks
+        finally:
+            fasta_index.close()
+    else:
+        with open(fasta_filename, 'r') as fasta_file:
+            for chromosome, sequence in read_sequences(fasta_file):
+                chunks = (sequence[start:start + chunk_size] for start in xrange(0, len(sequence), chunk_size))
+                yield chromosome, chunks
+
+
+def _runs(mask):
+    """ Start and end of each run of true values in a boolean array.
+    """
+    changes = np.flatnonzero(np.diff(np.concatenate([[False], mask, [False]]).astype(np.int8)))
+    return changes[0::2], changes[1::2]
+
+
+def _append_runs(run_starts, run_ends, starts, ends):
+    """ Append runs, extending a run continuing from the previous chunk.
+    """
+    for run_start, run_end in zip(starts, ends):
+        if len(run_ends) > 0 and run_ends[-1] == run_start:
+            run_ends[-1] = run_end
+        else:
+            run_starts.append(run_start)
+            run_ends.append(run_end)
+
+
+def _pack_chunk(chunk):
+    """ Pack a chunk of sequence at 2 bits per nucleotide.
+
+    Returns:
+        numpy.array: packed nucleotides, 4 per byte
+        numpy.array: uppercase sequence
+        numpy.array: positions of nucleotides other than ACGT
+        numpy.array: mask of lowercase characters
+
+    """
+    upper = chunk.upper()
+    is_lower = np.frombuffer(chunk, dtype=np.uint8) != np.frombuffer(upper, dtype=np.uint8)
+    sequence = np.frombuffer(upper, dtype=np.uint8)
+    codes = _nucleotide_codes[sequence]
+    other = np.flatnonzero(codes < 0)
+    codes[other] = 0
+    codes = np.concatenate([codes, np.zeros(-len(codes) % 4, dtype=np.int8)]).astype(np.uint8).reshape(-1, 4)
+    packed = codes[:, 0] | (codes[:, 1] << 2) | (codes[:, 2] << 4) | (codes[:, 3] << 6)
+    return packed, sequence, other, is_lower
+
+
+def write_packed_genome(fasta_filename, packed_filename, fai_filename=None, chunk_size=1 << 24):
+    """ Write a 2-bit packed genome for fast shared random access.
+
+    Args:
+        fasta_filename (str): fasta filename
+        packed_filename (str): output packed genome filename
+
+    KwArgs:
+        fai_filename (str): index filename, defaults to fasta filename with .fai
+        chunk_size (int): number of nucleotides packed at a time
+
+    ACGT nucleotides are packed 4 per byte, other characters are stored as
+    runs of identical characters, and the case of soft masked sequence is
+    stored as runs of lowercase characters.  The size and modification time
+    of the fasta are stored in the header, and a packed genome no longer
+    matching the fasta is ignored by `open_genome`.  If the fasta is indexed,
+    sequences are read in chunks rather than in full.
+
+    """
+
+    if fai_filename is None:
+        fai_filename = fasta_filename + '.fai'
+
+    chunk_size -= chunk_size % 4
+
+    fasta_size, fasta_mtime = _file_signature(fasta_filename)
+
+    temp_filename = packed_filename + '.tmp.{}'.format(os.getpid())
+
+    with open(temp_filename, 'wb') as packed_file:
+        packed_file.write(packed_genome_magic)
+        packed_file.write(_packed_genome_header.pack(fasta_size, fasta_mtime))
+        data_offset = packed_file.tell()
+
+        index = list()
+
+        for chromosome, chunks in _iter_sequence_chunks(fasta_filename, fai_filename, chunk_size):
+            offset = packed_file.tell() - data_offset
+            length = 0
+            run_starts = list()
+            run_ends = list()
+            run_values = list()
+            lower_starts = list()
+            lower_ends = list()
+
+            for chunk in chunks:
+                packed, sequence, other, is_lower = _pack_chunk(chunk)
+                packed_file.write(packed.tobytes())
+
+                if is_lower.any():
+                    starts, ends = _runs(is_lower)
+                    _append_runs(lower_starts, lower_ends, length + starts, length + ends)
+
+                if len(other) > 0:
+                    values = sequence[other]
+                    breaks = np.flatnonzero((np.diff(other) != 1) | (np.diff(values) != 0)) + 1
+                    starts = np.concatenate([[0], breaks])
+                    ends = np.concatenate([breaks, [len(other)]])
+
+                    for start, end in zip(starts, ends):
+                        run_start = length + other[start]
+                        run_end = length + other[end - 1] + 1
+                        run_value = values[start]
+
+                        # Extend a run continuing from the previous chunk
+                        if len(run_ends) > 0 and run_ends[-1] == run_start and run_values[-1] == run_value:
+                            run_ends[-1] = run_end
+                        else:
+                            run_starts.append(run_start)
+                            run_ends.append(run_end)
+                            run_values.append(run_value)
+
+                length += len(sequence)
+
+            index.append((
+                chromosome, length, offset,
+                np.array(run_starts, dtype=np.int64),
+                np.array(run_ends, dtype=np.int64),
+                np.array(run_values, dtype=np.uint8),
+                np.array(lower_starts, dtype=np.int64),
+                np.array(lower_ends, dtype=np.int64),
+            ))
+
+        index_offset = packed_file.tell()
+        packed_file.write(pickle.dumps(index, protocol=2))
+        packed_file.write(struct.pack('<Q', index_offset))
+
+    os.rename(temp_filename, packed_filename)
+
+
+def _read_packed_genome_signature(packed_file):
+    """ Read the fasta size and modification time from a packed genome header,
+    None if not a packed genome of the current format.
+    """
+    if packed_file.read(len(packed_genome_magic)) != packed_genome_magic:
+        return None
+    header = packed_file.read(_packed_genome_header.size)
+    if len(header) != _packed_genome_header.size:
+        return None
+    return _packed_genome_header.unpack(header)
+
+
+def _find_runs(run_starts, run_ends, positions):
+    """ Find the run containing each position.
+    """
+    run = np.searchsorted(run_starts, positions, side='right') - 1
+    in_run = (run >= 0) & (positions < run_ends[np.maximum(run, 0)])
+    return in_run, run
+
+
+def is_packed_genome_current(fasta_filename, packed_filename):
+    """ Check a packed genome exists and was packed from the fasta as it is now.
+    """
+    if not os.path.exists(packed_filename):
+        return False
+    with open(packed_filename, 'rb') as packed_file:
+        return _read_packed_genome_signature(packed_file) == _file_signature(fasta_filename)
+
+
+class PackedGenome(object):
+    """ Read only random access to a 2-bit packed genome.
+
+    Args:
+        packed_filename (str): packed genome filename, see `write_packed_genome`
+
+    The packed genome is memory mapped read only, all processes on a node
+    using the same packed genome share a single copy in the page cache.
+    Pickling reopens the packed genome by filename, allowing the object to be
+    passed to worker processes.
+
+    Attributes:
+        fasta_signature (tuple): size and modification time of the packed fasta
+
+    """
+
+    def __init__(self, packed_filename):
+        self.packed_filename = packed_filename
+
+        with open(packed_filename, 'rb') as packed_file:
+            self.fasta_signature = _read_packed_genome_signature(packed_file)
+            if self.fasta_signature is None:
+                raise ValueError('{} is not a packed genome'.format(packed_filename))
+            self._mmap = mmap.mmap(packed_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        data_offset = len(packed_genome_magic) + _packed_genome_header.size
+
+        index_offset = struct.unpack('<Q', self._mmap[-8:])[0]
+        index = pickle.loads(self._mmap[index_offset:-8])
+
+        self._data = np.frombuffer(self._mmap, dtype=np.uint8, count=index_offset - data_offset, offset=data_offset)
+
+        self.chromosomes = [a[0] for a in index]
+        self.index = dict((a[0], a[1:]) for a in index)
+
+    def __getstate__(self):
+        return self.packed_filename
+
+    def __setstate__(self, packed_filename):
+        self.__init__(packed_filename)
+
+    def __contains__(self, chromosome):
+        return chromosome in self.index
+
+    def close(self):
+        self._data = None
+        self._mmap.close()
+
+    def length(self, chromosome):
+        """ Length of a sequence.
+        """
+        return self.index[chromosome][0]
+
+    def _gather_chromosome(self, chromosome, positions):
+        length, offset, run_starts, run_ends, run_values, lower_starts, lower_ends = self.index[chromosome]
+        packed = self._data[offset + (positions >> 2)]
+        nucleotides = _code_nucleotides[(packed >> ((positions & 3) << 1).astype(np.uint8)) & 3]
+        if len(run_starts) > 0:
+            in_run, run = _find_runs(run_starts, run_ends, positions)
+            nucleotides[in_run] = run_values[run[in_run]]
+        if len(lower_starts) > 0:
+            in_lower, _ = _find_runs(lower_starts, lower_ends, positions)
+            nucleotides[in_lower] = np.frombuffer(nucleotides[in_lower].tobytes().lower(), dtype=np.uint8)
+        return nucleotides
+
+    def gather(self, chromosomes, positions):
+        """ Gather nucleotides at 0-based positions.
+
+        Args:
+            chromosomes (numpy.array): chromosome of each position, broadcast
+                along the trailing dimensions of positions
+            positions (numpy.array): 0-based positions
+
+        Returns:
+            numpy.array: nucleotide characters as int16, -1 for positions outside
+            the sequence
+
+        """
+        chromosomes = np.asarray(chromosomes)
+        positions = np.asarray(positions, dtype=np.int64)
+        chromosomes = chromosomes.reshape(chromosomes.shape + (1,) * (positions.ndim - chromosomes.ndim))
+        chromosomes = np.broadcast_to(chromosomes, positions.shape)
+
+        nucleotides = np.full(positions.shape, -1, dtype=np.int16)
+        for chromosome in np.unique(chromosomes):
+            rows = chromosomes == chromosome
+            chromosome_positions = positions[rows]
+            valid = (chromosome_positions >= 0) & (chromosome_positions < self.length(chromosome))
+            chromosome_nucleotides = np.full(chromosome_positions.shape, -1, dtype=np.int16)
+            chromosome_nucleotides[valid] = self._gather_chromosome(chromosome, chromosome_positions[valid])
+            nucleotides[rows] = chromosome_nucleotides
+        return nucleotides
+
+    def fetch(self, chromosome, start, end):
+        """ Fetch a subsequence, 0-based half open coordinates clipped to the sequence.
+        """
+        return self.fetch_batch([chromosome], [start], [end])[0]
+
+    def fetch_batch(self, chromosomes, starts, ends):
+        """ Fetch a list of subsequences, 0-based half open coordinates clipped to the sequence.
+
+        Args:
+            chromosomes (list of str): chromosome of each subsequence
+            starts (list of int): 0-based start of each subsequence
+            ends (list of int): 0-based end of each subsequence
+
+        Returns:
+            list of str: subsequences
+
+        """
+        chromosomes = np.asarray(chromosomes)
+        lengths = np.array([self.length(chromosome) for chromosome in chromosomes], dtype=np.int64)
+        starts = np.minimum(np.maximum(np.asarray(starts, dtype=np.int64), 0), lengths)
+        ends = np.minimum(np.maximum(np.asarray(ends, dtype=np.int64), starts), lengths)
+
+        sizes = ends - starts
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+        positions = np.arange(offsets[-1]) - np.repeat(offsets[:-1] - starts, sizes)
+
+        nucleotides = self.gather(np.repeat(chromosomes, sizes), positions).astype(np.uint8).tobytes()
+
+        return [nucleotides[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+
+
+def open_genome(fasta_filename, packed_filename=None):
+    """ Open a genome for random access, packed if available and current.
+
+    Args:
+        fasta_filename (str): fasta filename, indexed with samtools faidx
+
+    KwArgs:
+        packed_filename (str): packed genome filename, defaults to
+            `packed_genome_filename`
+
+    Returns:
+        PackedGenome or FastaIndex: genome with `fetch` and `fetch_batch`
+
+    """
+
+    if packed_filename is None:
+        packed_filename = packed_genome_filename(fasta_filename)
+
+    if is_packed_genome_current(fasta_filename, packed_filename):
+        return PackedGenome(packed_filename)
+
+    return FastaIndex(fasta_filename)
+
+
+def load_packed_genome(fasta_filename, packed_filename=None):
+    """ Load a packed genome, packing the fasta if missing or out of date.
+
+    Args:
+        fasta_filename (str): fasta filename
+
+    KwArgs:
+        packed_filename (str): packed genome filename, defaults to
+            `packed_genome_filename`
+
+    Returns:
+        PackedGenome: packed genome
+
+    """
+
+    if packed_filename is None:
+        packed_filename = packed_genome_filename(fasta_filename)
+
+    if not is_packed_genome_current(fasta_filename, packed_filename):
+        write_packed_genome(fasta_filename, packed_filename)
+
+    return PackedGenome(packed_filename)
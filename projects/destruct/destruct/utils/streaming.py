@@ -1,6 +1,15 @@
+import csv
+import io
+import collections
+import itertools
+import multiprocessing
+import numpy as np
 import pandas as pd
 
-def read_select_write(df_iter, select, out_filename):
+import destruct.utils.fastq
+import destruct.utils.table
+
+def read_select_write(df_iter, select, out_filename, columnar=False):
     """ Write subset of streamed data.
 
     Args:
@@ -8,15 +17,15 @@ def read_select_write(df_iter, select, out_filename):
         select (pandas.DataFrame): subset for filtering
         out_filename (str): output tsv filename
 
+    KwArgs:
+        columnar (bool): write a columnar table instead of tsv
+
     """
 
-    with open(out_filename, 'w') as out_file:
-        for chunk in df_iter:
-            chunk = chunk.merge(select, how='inner')
-            chunk.to_csv(out_file, sep='\t', header=False, index=False)
+    read_filter_write(df_iter, lambda chunk: chunk.merge(select, how='inner'), out_filename, columnar=columnar)
 
 
-def read_filter_write(df_iter, f_filter, out_filename):
+def read_filter_write(df_iter, f_filter, out_filename, columnar=False):
     """ Write filtered set of streamed data.
 
     Args:
@@ -24,12 +33,18 @@ def read_filter_write(df_iter, f_filter, out_filename):
         f_filter (callable): filtering function
         out_filename (str): output tsv filename
 
+    KwArgs:
+        columnar (bool): write a columnar table instead of tsv
+
     """
 
-    with open(out_filename, 'w') as out_file:
+    with open(out_filename, 'wb' if columnar else 'w') as out_file:
         for chunk in df_iter:
             chunk = f_filter(chunk)
-            chunk.to_csv(out_file, sep='\t', header=False, index=False)
+            if columnar:
+                destruct.utils.table.write_table_chunk(out_file, chunk)
+            else:
+                chunk.to_csv(out_file, sep='\t', header=False, index=False)
 
 
 def group_aware_iter(df_iter, group_cols):
@@ -42,6 +57,10 @@ def group_aware_iter(df_iter, group_cols):
     Yields:
         pandas.DataFrame: group aware data
 
+    Groups must be contiguous in the streamed data.  The last group of each
+    chunk is held back and prepended to the next chunk, so that each yielded
+    chunk contains only whole groups.
+
     """
 
     prev_data = None
@@ -49,22 +68,185 @@ def group_aware_iter(df_iter, group_cols):
     for df in df_iter:
 
         if len(df.index) == 0:
-            return
-
-        last_group = df.loc[df.index[-1], group_cols].values
-
-        # Remove last group
-        next_data = df.loc[(df[group_cols] != last_group).all(axis=1)]
+            continue
 
         # Add previous last group to beginning of data
         if prev_data is not None:
-            next_data = pd.concat([prev_data, next_data], ignore_index=True)
+            df = pd.concat([prev_data, df], ignore_index=True)
+
+        last_group = df.loc[df.index[-1], group_cols].values
 
-        yield next_data
+        is_last_group = (df[group_cols] == last_group).all(axis=1)
 
         # Save last group for next yield
-        prev_data = df.loc[(df[group_cols] == last_group).all(axis=1)]
+        prev_data = df.loc[is_last_group]
+
+        next_data = df.loc[~is_last_group]
+
+        if len(next_data.index) > 0:
+            yield next_data
+
+    if prev_data is not None:
+        yield prev_data
+
+
+def bounded_imap(func, iterable, num_processes, max_pending=None):
+    """ Ordered map over a process pool with a bounded number of pending items.
+    """
+
+    if num_processes <= 1:
+        for result in itertools.imap(func, iterable):
+            yield result
+        return
+
+    if max_pending is None:
+        max_pending = 2 * num_processes
+
+    pool = multiprocessing.Pool(num_processes)
+
+    try:
+        pending = collections.deque()
+
+        for item in iterable:
+            pending.append(pool.apply_async(func, (item,)))
+
+            if len(pending) >= max_pending:
+                yield pending.popleft().get()
+
+        while pending:
+            yield pending.popleft().get()
+
+        pool.close()
+
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def group_aware_reduce(df_iter, group_cols, map_func, reduce_func, num_processes=1):
+    """ Map reduce streamed data with complete groups in each reduced chunk.
+
+    Args:
+        df_iter (iter of pandas.DataFrame): streamed data
+        group_cols (list of str): columns defining group
+        map_func (callable): partial result for any chunk
+        reduce_func (callable): result for whole groups from partial results
+
+    KwArgs:
+        num_processes (int): number of processes for mapping chunks
+
+    Yields:
+        pandas.DataFrame: reduced data
+
+    Groups must be contiguous in the streamed data.  Chunks need not respect
+    group boundaries, thus memory is bounded by the chunk size rather than by
+    the size of the largest group.  Partial results must include the group
+    columns and reduce_func must accept its own input, partial results of a
+    group spanning several chunks are reduced together, for instance sum and
+    max aggregations.  Functions must be picklable for num_processes > 1.
+
+    """
+
+    partial_iter = bounded_imap(map_func, df_iter, num_processes)
+
+    for partial in group_aware_iter(partial_iter, group_cols):
+        yield reduce_func(partial)
+
+
+def _read_keyed_lines(filename, key_cols, block_size):
+    """ Read blocks of lines and their numeric sort keys.
+    """
+
+    for block, line_ends in destruct.utils.fastq.read_record_blocks(filename, lines_per_record=1, block_size=block_size):
+        lines = block.split(b'\n')
+        if block.endswith(b'\n'):
+            lines.pop()
+
+        keys = pd.read_csv(io.BytesIO(block), sep='\t', header=None, usecols=key_cols,
+                           quoting=csv.QUOTE_NONE, skip_blank_lines=False)
+        keys = [keys[col].values for col in key_cols]
+
+        yield np.array(lines, dtype=object), keys
+
+
+def _keys_less(keys, bound, or_equal):
+    """ Lexicographic comparison of key columns with a bound.
+    """
+
+    less = np.zeros(len(keys[0]), dtype=bool)
+    equal = np.ones(len(keys[0]), dtype=bool)
+
+    for key, value in zip(keys, bound):
+        less |= equal & (key < value)
+        equal &= (key == value)
+
+    if or_equal:
+        return less | equal
+
+    return less
+
+
+def merge_sorted_files(in_filenames, out_filename, key_cols, block_size=destruct.utils.fastq.default_block_size):
+    """ Merge tsv files sorted by numeric key columns.
+
+    Args:
+        in_filenames (list of str): sorted input tsv filenames
+        out_filename (str): merged output tsv filename
+        key_cols (list of int): zero based indices of numeric key columns
+
+    KwArgs:
+        block_size (int): size of blocks read from each input file
+
+    Blocks of lines are read from each file and keys parsed per block.  At
+    each step all buffered lines with keys less than the smallest last key
+    among the buffers are sorted and written, together with lines equal to
+    that key from the first buffer ending with it and from earlier files,
+    which consumes that buffer entirely.  Lines with equal keys are thus
+    written in input file order, and in line order within each file, unlike
+    `sort -m` which compares entire lines as a last resort.
+
+    """
+
+    block_iters = [_read_keyed_lines(filename, key_cols, block_size) for filename in in_filenames]
+    buffers = [None] * len(block_iters)
+
+    with open(out_filename, 'wb', block_size) as out_file:
+        while True:
+            for idx, block_iter in enumerate(block_iters):
+                if block_iter is not None and buffers[idx] is None:
+                    buffers[idx] = next(block_iter, None)
+                    if buffers[idx] is None:
+                        block_iters[idx] = None
+
+            active = [idx for idx, buffer in enumerate(buffers) if buffer is not None]
+
+            if len(active) == 0:
+                break
+
+            bound, bound_idx = min((tuple(key[-1] for key in buffers[idx][1]), idx) for idx in active)
+
+            merge_lines = list()
+            merge_keys = [list() for col in key_cols]
+
+            for idx in active:
+                lines, keys = buffers[idx]
+
+                # Later files may only follow lines equal to the bound once
+                # all of those lines from the bound file have been written
+                num_merge = _keys_less(keys, bound, idx <= bound_idx).sum()
+
+                merge_lines.append(lines[:num_merge])
+                for merge_key, key in zip(merge_keys, keys):
+                    merge_key.append(key[:num_merge])
+
+                if num_merge == len(lines):
+                    buffers[idx] = None
+                else:
+                    buffers[idx] = (lines[num_merge:], [key[num_merge:] for key in keys])
 
-    yield prev_data
+            merge_lines = np.concatenate(merge_lines)
+            merge_keys = [np.concatenate(merge_key) for merge_key in merge_keys]
 
+            order = np.lexsort(merge_keys[::-1])
 
+            out_file.write(b'\n'.join(merge_lines[order]) + b'\n')
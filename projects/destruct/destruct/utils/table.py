@@ -0,0 +1,153 @@
+import pickle
+import struct
+import numpy as np
+import pandas as pd
+
+
+table_magic = b'DESTRUCTTBL1'
+
+
+def _column_array(values):
+    """ Convert column values to an array with a fixed size dtype
+    """
+    values = np.asarray(values)
+    if values.dtype == object:
+        values = values.astype(str)
+    return np.ascontiguousarray(values)
+
+
+def write_table_chunk(out_file, data):
+    """ Append a chunk of a table to a columnar table file.
+
+    Args:
+        out_file (file): binary output file
+        data (pandas.DataFrame): table chunk
+
+    Each chunk is a pickled header of column names, dtypes and lengths
+    followed by the raw column arrays.  String columns are stored as fixed
+    width strings.  The file magic is written before the first chunk.
+
+    """
+
+    if out_file.tell() == 0:
+        out_file.write(table_magic)
+
+    arrays = [(column, _column_array(data[column].values)) for column in data.columns]
+    header = pickle.dumps([(column, array.dtype.str, len(array)) for column, array in arrays], protocol=2)
+
+    out_file.write(struct.pack('<Q', len(header)))
+    out_file.write(header)
+    for column, array in arrays:
+        out_file.write(array.tobytes())
+
+
+def is_columnar_table(filename):
+    """ Check if a file is a columnar table file.
+    """
+    with open(filename, 'rb') as in_file:
+        return in_file.read(len(table_magic)) == table_magic
+
+
+def read_table_chunks(filename, usecols=None):
+    """ Read the chunks of a columnar table file.
+
+    Args:
+        filename (str): columnar table filename
+
+    KwArgs:
+        usecols (list of str): subset of columns to read
+
+    Yields:
+        pandas.DataFrame: table chunks as written
+
+    """
+
+    with open(filename, 'rb') as in_file:
+        if in_file.read(len(table_magic)) != table_magic:
+            raise ValueError('{} is not a columnar table'.format(filename))
+
+        while True:
+            header_length = in_file.read(8)
+            if len(header_length) == 0:
+                break
+
+            header_length = struct.unpack('<Q', header_length)[0]
+            header = pickle.loads(in_file.read(header_length))
+
+            columns = list()
+            data = dict()
+            for column, dtype, length in header:
+                dtype = np.dtype(dtype)
+                nbytes = dtype.itemsize * length
+
+                if usecols is not None and column not in usecols:
+                    in_file.seek(nbytes, 1)
+                    continue
+
+                array = np.frombuffer(in_file.read(nbytes), dtype=dtype)
+                if dtype.kind == 'S':
+                    array = array.astype(object)
+
+                columns.append(column)
+                data[column] = array
+
+            yield pd.DataFrame(data, columns=columns)
+
+
+def read_table(filename, names, converters=None, usecols=None, chunksize=None):
+    """ Read a headerless tsv or columnar table.
+
+    Args:
+        filename (str): tsv or columnar table filename
+        names (list of str): column names of a tsv table
+
+    KwArgs:
+        converters (dict): converters for tsv columns
+        usecols (list of str): subset of columns to read
+        chunksize (int): stream chunks of a tsv table
+
+    Returns:
+        pandas.DataFrame or iter of pandas.DataFrame: table, or chunks of the
+        table if chunksize is given
+
+    Columnar tables are streamed in the chunks they were written in.
+
+    """
+
+    if not is_columnar_table(filename):
+        if chunksize is not None:
+            return pd.read_csv(filename, sep='\t', names=names, converters=converters,
+                               usecols=usecols, iterator=True, chunksize=chunksize)
+        return pd.read_csv(filename, sep='\t', names=names, converters=converters, usecols=usecols)
+
+    chunks = read_table_chunks(filename, usecols=usecols)
+
+    if chunksize is not None:
+        return chunks
+
+    chunks = list(chunks)
+
+    if len(chunks) == 0:
+        columns = [a for a in names if usecols is None or a in usecols]
+        return pd.DataFrame(columns=columns)
+
+    return pd.concat(chunks, ignore_index=True)
+
+
+def write_table(data, filename, columnar=False):
+    """ Write a headerless tsv or columnar table.
+
+    Args:
+        data (pandas.DataFrame): table
+        filename (str): output filename
+
+    KwArgs:
+        columnar (bool): write a columnar table
+
+    """
+
+    if columnar:
+        with open(filename, 'wb') as out_file:
+            write_table_chunk(out_file, data)
+    else:
+        data.to_csv(filename, sep='\t', index=False, header=False)
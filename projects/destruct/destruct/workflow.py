@@ -54,27 +54,86 @@ def create_destruct_workflow(
         value=destruct.tasks.create_library_ids(bam_filenames.keys()),
     )
 
-    # Retrieve discordant reads and stats from bam files
+    # Retrieve discordant reads and stats from bam files, optionally reading
+    # the bam on a separate thread
+
+    bamdisc_prefetch_args = []
+    if config['bamdisc_prefetch']:
+        bamdisc_prefetch_args = ['--prefetch']
+
+    bamdisc_ctx = {'io': 1, 'mem': 8, 'ncpus': 2 if config['bamdisc_prefetch'] else 1}
+
+    if not config['bamdisc_by_chromosome']:
+        workflow.commandline(
+            name='bamdisc',
+            axes=('bylibrary',),
+            ctx=bamdisc_ctx,
+            args=(
+                'destruct_bamdiscordantfastq',
+                '-r',
+                '-c', config['bam_max_soft_clipped'],
+                '-f', config['bam_max_fragment_length'],
+                '-b', mgd.InputFile('bam', 'bylibrary', fnames=bam_filenames),
+                '-s', mgd_stats.as_output(),
+                '--fastq1', mgd_reads_1.as_output(),
+                '--fastq2', mgd_reads_2.as_output(),
+                '-t', mgd.TempSpace('bamdisc.tempspace', 'bylibrary'),
+                '-n', config['num_read_samples'],
+                '--sample1', mgd_sample_1.as_output(),
+                '--sample2', mgd_sample_2.as_output(),
+            ) + tuple(bamdisc_prefetch_args),
+        )
 
-    workflow.commandline(
-        name='bamdisc',
-        axes=('bylibrary',),
-        ctx={'io': 1, 'mem': 8},
-        args=(
-            'destruct_bamdiscordantfastq',
-            '-r',
-            '-c', config['bam_max_soft_clipped'],
-            '-f', config['bam_max_fragment_length'],
-            '-b', mgd.InputFile('bam', 'bylibrary', fnames=bam_filenames),
-            '-s', mgd_stats.as_output(),
-            '--fastq1', mgd_reads_1.as_output(),
-            '--fastq2', mgd_reads_2.as_output(),
-            '-t', mgd.TempSpace('bamdisc.tempspace', 'bylibrary'),
-            '-n', config['num_read_samples'],
-            '--sample1', mgd_sample_1.as_output(),
-            '--sample2', mgd_sample_2.as_output(),
-        ),
-    )
+    else:
+        workflow.setobj(
+            obj=mgd.TempOutputObj('bam.region.args', 'bylibrary', 'bybamregion'),
+            value=destruct.tasks.generate_bam_region_args(config['chromosomes']),
+            axes=('bylibrary',),
+        )
+
+        workflow.commandline(
+            name='bamdisc',
+            axes=('bylibrary', 'bybamregion'),
+            ctx=bamdisc_ctx,
+            args=(
+                'destruct_bamdiscordantfastq',
+                '-r',
+                '-c', config['bam_max_soft_clipped'],
+                '-f', config['bam_max_fragment_length'],
+                '-b', mgd.InputFile('bam', 'bylibrary', fnames=bam_filenames),
+                '-s', mgd.TempOutputFile('stats.txt', 'bylibrary', 'bybamregion'),
+                '--fastq1', mgd.TempOutputFile('reads1.fq.gz', 'bylibrary', 'bybamregion'),
+                '--fastq2', mgd.TempOutputFile('reads2.fq.gz', 'bylibrary', 'bybamregion'),
+                '-t', mgd.TempSpace('bamdisc.tempspace', 'bylibrary', 'bybamregion'),
+                '-n', config['num_read_samples'],
+                '--sample1', mgd.TempOutputFile('sample1.fq.gz', 'bylibrary', 'bybamregion'),
+                '--sample2', mgd.TempOutputFile('sample2.fq.gz', 'bylibrary', 'bybamregion'),
+                '--orphans', mgd.TempOutputFile('orphans.tsv', 'bylibrary', 'bybamregion'),
+            ) + tuple(bamdisc_prefetch_args) + (
+                mgd.TempInputObj('bam.region.args', 'bylibrary', 'bybamregion'),
+            ),
+        )
+
+        workflow.transform(
+            name='bamdisc_merge',
+            axes=('bylibrary',),
+            ctx=medmem,
+            func=destruct.tasks.merge_bam_region_reads,
+            args=(
+                mgd.TempInputFile('stats.txt', 'bylibrary', 'bybamregion'),
+                mgd.TempInputFile('reads1.fq.gz', 'bylibrary', 'bybamregion'),
+                mgd.TempInputFile('reads2.fq.gz', 'bylibrary', 'bybamregion'),
+                mgd.TempInputFile('sample1.fq.gz', 'bylibrary', 'bybamregion'),
+                mgd.TempInputFile('sample2.fq.gz', 'bylibrary', 'bybamregion'),
+                mgd.TempInputFile('orphans.tsv', 'bylibrary', 'bybamregion'),
+                config['num_read_samples'],
+                mgd_stats.as_output(),
+                mgd_reads_1.as_output(),
+                mgd_reads_2.as_output(),
+                mgd_sample_1.as_output(),
+                mgd_sample_2.as_output(),
+            ),
+        )
 
     workflow.transform(
         name='readstats',
@@ -144,30 +203,43 @@ def create_destruct_workflow(
         ),
     )
 
-    # Split discordant fastqs and align
+    # Split discordant fastqs and align, split fastqs named with a .gz suffix
+    # if compressed as the realignment tools detect compression by extension
+    if config['split_reads_compress_level'] is None:
+        split_reads_1, split_reads_2 = 'reads1', 'reads2'
+    else:
+        split_reads_1, split_reads_2 = 'reads1.split.fq.gz', 'reads2.split.fq.gz'
 
     workflow.transform(
         name='splitfastq1',
         axes=('bylibrary',),
-        ctx=lowmem,
+        ctx=dict(lowmem, ncpus=config['split_reads_threads']),
         func=destruct.tasks.split_fastq,
         args=(
             mgd_reads_1.as_input(),
             int(config['reads_per_split']),
-            mgd.TempOutputFile('reads1', 'bylibrary', 'byread'),
+            mgd.TempOutputFile(split_reads_1, 'bylibrary', 'byread'),
         ),
+        kwargs={
+            'compress_level': config['split_reads_compress_level'],
+            'num_threads': config['split_reads_threads'],
+        },
     )
 
     workflow.transform(
         name='splitfastq2',
         axes=('bylibrary',),
-        ctx=lowmem,
+        ctx=dict(lowmem, ncpus=config['split_reads_threads']),
         func=destruct.tasks.split_fastq,
         args=(
             mgd_reads_2.as_input(),
             int(config['reads_per_split']),
-            mgd.TempOutputFile('reads2', 'bylibrary', 'byread', axes_origin=[]),
+            mgd.TempOutputFile(split_reads_2, 'bylibrary', 'byread', axes_origin=[]),
         ),
+        kwargs={
+            'compress_level': config['split_reads_compress_level'],
+            'num_threads': config['split_reads_threads'],
+        },
     )
 
     workflow.transform(
@@ -176,8 +248,8 @@ def create_destruct_workflow(
         ctx=medmem,
         func=destruct.tasks.prepare_seed_fastq,
         args=(
-            mgd.TempInputFile('reads1', 'bylibrary', 'byread'),
-            mgd.TempInputFile('reads2', 'bylibrary', 'byread'),
+            mgd.TempInputFile(split_reads_1, 'bylibrary', 'byread'),
+            mgd.TempInputFile(split_reads_2, 'bylibrary', 'byread'),
             36,
             mgd.TempOutputFile('reads.seed', 'bylibrary', 'byread'),
         ),
@@ -201,8 +273,8 @@ def create_destruct_workflow(
             'destruct_realign2',
             '-l', mgd.TempInputObj('library_id', 'bylibrary'),
             '-a', '-',
-            '-1', mgd.TempInputFile('reads1', 'bylibrary', 'byread'),
-            '-2', mgd.TempInputFile('reads2', 'bylibrary', 'byread'),
+            '-1', mgd.TempInputFile(split_reads_1, 'bylibrary', 'byread'),
+            '-2', mgd.TempInputFile(split_reads_2, 'bylibrary', 'byread'),
             '-r', config['genome_fasta'],
             '-g', config['gap_score'],
             '-x', config['mismatch_score'],
@@ -297,7 +369,7 @@ def create_destruct_workflow(
     workflow.commandline(
         name='cluster',
         axes=('bychromarg',),
-        ctx=medmem,
+        ctx=dict(medmem, ncpus=config['cluster_threads']),
         args=(
             'destruct_mclustermatepairs',
             '-a', mgd.TempInputFile('spanning.alignments'),
@@ -306,6 +378,7 @@ def create_destruct_workflow(
             mgd.TempInputObj('chrom.args', 'bychromarg'),
             '--clustmin', config['cluster_readcount_threshold'],
             '--fragmax', config['fragment_length_max'],
+            '--threads', config['cluster_threads'],
         ),
     )
     
@@ -314,13 +387,16 @@ def create_destruct_workflow(
     workflow.transform(
         name='predict_breaks',
         axes=('bychromarg',),
-        ctx=medmem,
+        ctx=dict(medmem, ncpus=config['predict_breaks_processes']),
         func=destruct.predict_breaks.predict_breaks,
         args=(
             mgd.TempInputFile('clusters', 'bychromarg'),
             mgd.TempInputFile('spanning.alignments'),
             mgd.TempInputFile('split.alignments'),
             mgd.TempOutputFile('breakpoints_2', 'bychromarg'),
+            config['predict_breaks_shards'],
+            config['predict_breaks_processes'],
+            mgd.TempSpace('predict_breaks.tempspace', 'bychromarg'),
         ),
     )
 
@@ -342,7 +418,7 @@ def create_destruct_workflow(
     workflow.commandline(
         name='realigntobreaks',
         axes=('bylibrary', 'byread'),
-        ctx=medmem,
+        ctx=dict(medmem, ncpus=config['realigntobreaks_threads']),
         args=(
             'destruct_realigntobreaks2',
             '-r', config['genome_fasta'],
@@ -353,9 +429,10 @@ def create_destruct_workflow(
             '-m', config['match_score'],
             '--flmax', mgd.TempInputObj('stats', 'bylibrary').prop('fragment_length_max'),
             '--span', mgd.TempInputFile('spanning.alignments', 'bylibrary', 'byread'),
-            '-1', mgd.TempInputFile('reads1', 'bylibrary', 'byread'),
-            '-2', mgd.TempInputFile('reads2', 'bylibrary', 'byread'),
+            '-1', mgd.TempInputFile(split_reads_1, 'bylibrary', 'byread'),
+            '-2', mgd.TempInputFile(split_reads_2, 'bylibrary', 'byread'),
             '--realignments', mgd.TempOutputFile('realignments', 'bylibrary', 'byread'),
+            '--threads', config['realigntobreaks_threads'],
         ),
     )
 
@@ -385,8 +462,7 @@ def create_destruct_workflow(
         args=(
             mgd.TempInputFile('likelihoods_2', 'bylibrary', 'byread'),
             mgd.TempOutputFile('likelihoods_2', 'bylibrary'),
-            mgd.TempSpace('merge_likelihoods_1_temp', 'bylibrary'),
-            '1',
+            [0],
         ),
     )
 
@@ -397,8 +473,7 @@ def create_destruct_workflow(
         args=(
             mgd.TempInputFile('likelihoods_2', 'bylibrary'),
             mgd.TempOutputFile('likelihoods_2'),
-            mgd.TempSpace('merge_likelihoods_2_temp'),
-            '1',
+            [0],
         ),
     )
 
@@ -414,15 +489,20 @@ def create_destruct_workflow(
         ),
     )
 
+    setcover_args = [
+        'destruct_setcover',
+        '-c', mgd.TempInputFile('clusters'),
+        '-w', mgd.TempInputFile('cluster_weights'),
+        '-a', mgd.TempOutputFile('clusters_setcover'),
+    ]
+
+    if config['setcover_partition']:
+        setcover_args += ['--partition', '--threads', config['setcover_threads']]
+
     workflow.commandline(
         name='setcover',
-        ctx=medmem,
-        args=(
-            'destruct_setcover',
-            '-c', mgd.TempInputFile('clusters'),
-            '-w', mgd.TempInputFile('cluster_weights'),
-            '-a', mgd.TempOutputFile('clusters_setcover'),
-        ),
+        ctx=dict(medmem, ncpus=config['setcover_threads'] if config['setcover_partition'] else 1),
+        args=tuple(setcover_args),
     )
 
     # Select cluster based on setcover
@@ -437,6 +517,7 @@ def create_destruct_workflow(
             mgd.TempOutputFile('breakpoints_1'),
             mgd.TempInputFile('likelihoods_2'),
             mgd.TempOutputFile('likelihoods_1'),
+            config['columnar_intermediates'],
         ),
     )
 
@@ -444,7 +525,7 @@ def create_destruct_workflow(
 
     workflow.transform(
         name='select_predictions',
-        ctx=himem,
+        ctx=dict(himem, ncpus=config['select_predictions_processes']),
         func=destruct.predict_breaks.select_predictions,
         args=(
             mgd.TempInputFile('breakpoints_1'),
@@ -454,6 +535,8 @@ def create_destruct_workflow(
             config['mate_score_threshold'],
             config['template_length_min_threshold'],
             config['min_alignment_log_likelihood'],
+            config['columnar_intermediates'],
+            config['select_predictions_processes'],
         ),
     )
 
@@ -11,6 +11,9 @@
 #include "BinaryMinHeap.h"
 
 #include <vector>
+#include <queue>
+#include <functional>
+#include <algorithm>
 #include <boost/unordered_map.hpp>
 #include <boost/unordered_set.hpp>
 
@@ -81,6 +84,145 @@ void SetCover(const vector<unordered_set<TElemType> >& sets, const vector<double
 	}
 }
 
+template<typename TElemType>
+void SetComponents(const vector<unordered_set<TElemType> >& sets, vector<vector<int> >& components)
+{
+	// Union find over sets sharing elements
+	vector<int> parents(sets.size());
+	for (int setIdx = 0; setIdx < (int)sets.size(); setIdx++)
+	{
+		parents[setIdx] = setIdx;
+	}
+
+	unordered_map<TElemType,int> elementFirstSet;
+
+	for (int setIdx = 0; setIdx < (int)sets.size(); setIdx++)
+	{
+		const unordered_set<TElemType>& set = sets[setIdx];
+
+		for (typename unordered_set<TElemType>::const_iterator elementIter = set.begin(); elementIter != set.end(); elementIter++)
+		{
+			pair<typename unordered_map<TElemType,int>::iterator,bool> firstSet = elementFirstSet.insert(make_pair(*elementIter, setIdx));
+
+			if (firstSet.second)
+			{
+				continue;
+			}
+
+			int root1 = setIdx;
+			while (parents[root1] != root1)
+			{
+				parents[root1] = parents[parents[root1]];
+				root1 = parents[root1];
+			}
+
+			int root2 = firstSet.first->second;
+			while (parents[root2] != root2)
+			{
+				parents[root2] = parents[parents[root2]];
+				root2 = parents[root2];
+			}
+
+			// Root is the smallest set index in the component
+			parents[max(root1, root2)] = min(root1, root2);
+		}
+	}
+
+	// Components ordered by smallest set index, sets in increasing order
+	components.clear();
+	vector<int> componentIndices(sets.size(), -1);
+	for (int setIdx = 0; setIdx < (int)sets.size(); setIdx++)
+	{
+		int root = setIdx;
+		while (parents[root] != root)
+		{
+			root = parents[root];
+		}
+
+		if (componentIndices[root] < 0)
+		{
+			componentIndices[root] = (int)components.size();
+			components.push_back(vector<int>());
+		}
+
+		components[componentIndices[root]].push_back(setIdx);
+	}
+}
+
+template<typename TElemType>
+void LazySetCover(const vector<unordered_set<TElemType> >& sets, const vector<double>& weights, const vector<int>& setIndices, vector<int>& solution)
+{
+	// Greedy set cover of a subset of sets using a priority queue with lazy
+	// updates, valid because set priorities only increase as elements are
+	// covered.  Ties are broken by smallest set index.
+	typedef pair<double,int> PriorityPair;
+	priority_queue<PriorityPair,vector<PriorityPair>,greater<PriorityPair> > minQueue;
+
+	unordered_map<TElemType,vector<int> > elementSets;
+
+	unordered_map<int,int> setSizes;
+
+	for (vector<int>::const_iterator setIdxIter = setIndices.begin(); setIdxIter != setIndices.end(); setIdxIter++)
+	{
+		const unordered_set<TElemType>& set = sets[*setIdxIter];
+
+		if (set.empty())
+		{
+			continue;
+		}
+
+		setSizes[*setIdxIter] = (int)set.size();
+
+		for (typename unordered_set<TElemType>::const_iterator elementIter = set.begin(); elementIter != set.end(); elementIter++)
+		{
+			elementSets[*elementIter].push_back(*setIdxIter);
+		}
+
+		minQueue.push(PriorityPair(weights[*setIdxIter] / (double)set.size(), *setIdxIter));
+	}
+
+	unordered_set<TElemType> assigned;
+	while (!minQueue.empty())
+	{
+		PriorityPair top = minQueue.top();
+		minQueue.pop();
+
+		int setIdx = top.second;
+		int setSize = setSizes[setIdx];
+
+		if (setSize == 0)
+		{
+			continue;
+		}
+
+		// Reinsert stale entries with their current priority
+		double priority = weights[setIdx] / (double)setSize;
+		if (priority != top.first)
+		{
+			minQueue.push(PriorityPair(priority, setIdx));
+			continue;
+		}
+
+		solution.push_back(setIdx);
+
+		const unordered_set<TElemType>& set = sets[setIdx];
+
+		for (typename unordered_set<TElemType>::const_iterator elementIter = set.begin(); elementIter != set.end(); elementIter++)
+		{
+			if (assigned.insert(*elementIter).second)
+			{
+				const vector<int>& elementSetIndices = elementSets[*elementIter];
+
+				for (vector<int>::const_iterator setIter = elementSetIndices.begin(); setIter != elementSetIndices.end(); setIter++)
+				{
+					setSizes[*setIter]--;
+					DebugCheck(setSizes[*setIter] >= 0);
+				}
+			}
+		}
+	}
+}
+
 template<typename TElemType>
 void AssignInOrder(const vector<unordered_set<TElemType> >& sets, const vector<int>& order, vector<unordered_set<TElemType> >& result)
 {
@@ -56,32 +56,32 @@ public:
 	{
 		for (int readEnd = 0; readEnd <= 1; readEnd++)
 		{
-			ReadID readID;
-			readID.fragmentIndex = fragmentIndex;
-			readID.readEnd = readEnd;
-			
-			unordered_map<ReadID,ReadSeqInfo>::const_iterator infoIter = mReadSeqInfo.find(readID);
-			
-			if (infoIter == mReadSeqInfo.end())
-			{
-				cerr << "Error: Could not find sequence for read " << readID.fragmentIndex << " end " << readID.readEnd << endl;
-				exit(1);
-			}	
+			const ReadSeqInfo& readSeqInfo = FindReadSeqInfo(fragmentIndex, readEnd);
 			
 			for (int strand = 0; strand <= 1; strand++)
 			{
-				mCurrentSeqStartPtr[strand][readEnd] = &mReadSequences[infoIter->second.start[strand]];
-				mCurrentSeqEndPtr[strand][readEnd] = &mReadSequences[infoIter->second.end[strand]];
+				mCurrentSeqStartPtr[strand][readEnd] = &mReadSequences[readSeqInfo.start[strand]];
+				mCurrentSeqEndPtr[strand][readEnd] = &mReadSequences[readSeqInfo.end[strand]];
 			}
 			
-			mCurrentSeq5PrimeSeed16Ptr[PlusStrand][readEnd] = &mReadSequences[infoIter->second.end[PlusStrand] - 16];
-			mCurrentSeq5PrimeSeed16Ptr[MinusStrand][readEnd] = &mReadSequences[infoIter->second.start[MinusStrand]];
+			mCurrentSeq5PrimeSeed16Ptr[PlusStrand][readEnd] = &mReadSequences[readSeqInfo.end[PlusStrand] - 16];
+			mCurrentSeq5PrimeSeed16Ptr[MinusStrand][readEnd] = &mReadSequences[readSeqInfo.start[MinusStrand]];
 			
-			mCurrentSeq3PrimeSeed16Ptr[PlusStrand][readEnd] = &mReadSequences[infoIter->second.start[PlusStrand]];
-			mCurrentSeq3PrimeSeed16Ptr[MinusStrand][readEnd] = &mReadSequences[infoIter->second.end[MinusStrand] - 16];
+			mCurrentSeq3PrimeSeed16Ptr[PlusStrand][readEnd] = &mReadSequences[readSeqInfo.start[PlusStrand]];
+			mCurrentSeq3PrimeSeed16Ptr[MinusStrand][readEnd] = &mReadSequences[readSeqInfo.end[MinusStrand] - 16];
 		}
 	}
 	
+	// Read sequence without setting the current read, safe to call
+	// concurrently once all reads are prepped
+	void GetReadPtrs(int fragmentIndex, int readEnd, int strand, const char*& startPtr, const char*& endPtr) const
+	{
+		const ReadSeqInfo& readSeqInfo = FindReadSeqInfo(fragmentIndex, readEnd);
+		
+		startPtr = &mReadSequences[readSeqInfo.start[strand]];
+		endPtr = &mReadSequences[readSeqInfo.end[strand]];
+	}
+	
 	const char* StartPtr(int readEnd, int strand) const
 	{
 		return mCurrentSeqStartPtr[strand][readEnd];
@@ -129,6 +129,23 @@ private:
 		size_t end[2];
 	};
 	
+	const ReadSeqInfo& FindReadSeqInfo(int fragmentIndex, int readEnd) const
+	{
+		ReadID readID;
+		readID.fragmentIndex = fragmentIndex;
+		readID.readEnd = readEnd;
+		
+		unordered_map<ReadID,ReadSeqInfo>::const_iterator infoIter = mReadSeqInfo.find(readID);
+		
+		if (infoIter == mReadSeqInfo.end())
+		{
+			cerr << "Error: Could not find sequence for read " << readID.fragmentIndex << " end " << readID.readEnd << endl;
+			exit(1);
+		}
+		
+		return infoIter->second;
+	}
+	
 	string mReadSequences;
 	unordered_map<ReadID,ReadSeqInfo> mReadSeqInfo;
 	const char* mCurrentSeqStartPtr[2][2];
@@ -107,7 +107,10 @@ struct DiskPriorityQueue
 
 	void Finalize()
 	{
-		Flush();
+		if (!mBuffer.empty())
+		{
+			Flush();
+		}
 
 		for (vector<string>::const_iterator iter = mFilenames.begin(); iter != mFilenames.end(); iter++)
 		{
@@ -12,6 +12,7 @@
 #include <map>
 #include <iostream>
 #include <boost/unordered_map.hpp>
+#include <boost/thread/mutex.hpp>
 
 extern "C" {
 #include "../external/Triangle/triangle.h"
@@ -141,6 +142,12 @@ private:
 		return pair<double,double>(remap1,remap2);
 	}
 	
+	static boost::mutex& TriangleMutex()
+	{
+		static boost::mutex triangleMutex;
+		return triangleMutex;
+	}
+	
 	void Triangulate(const vector<double>& points, vector<int>& edges) const
 	{
 		if (points.size() == 0)
@@ -184,7 +191,11 @@ private:
 		triangulateOut.edgemarkerlist = NULL;
 		
 		const char* options = "pczeQ";
-		triangulate(const_cast<char*>(options), &triangulateIn, &triangulateOut, NULL);
+		{
+			// Triangle keeps global state, serialize calls from clustering threads
+			boost::mutex::scoped_lock lock(TriangleMutex());
+			triangulate(const_cast<char*>(options), &triangulateIn, &triangulateOut, NULL);
+		}
 		
 		edges.resize(triangulateOut.numberofedges * 2);
 		copy(triangulateOut.edgelist, triangulateOut.edgelist + 2 * triangulateOut.numberofedges, edges.begin());
@@ -94,10 +94,24 @@ double phi(double x)
     return 0.5*(1.0 + sign*y);
 }
 
-MatePairGibbs::MatePairGibbs()
+MatePairGibbs::MatePairGibbs(unsigned int seed) : mRandomGenerator(seed)
 {
 }
 
+double MatePairGibbs::RandomUniform()
+{
+	return (double)(mRandomGenerator() - mRandomGenerator.min()) / (double)(mRandomGenerator.max() - mRandomGenerator.min());
+}
+
+void MatePairGibbs::RandomShuffle(IntegerVec& values)
+{
+	for (int index = (int)values.size() - 1; index > 0; index--)
+	{
+		int swapIndex = (int)(mRandomGenerator() % (uint32_t)(index + 1));
+		swap(values[index], values[swapIndex]);
+	}
+}
+
 class MatePairGrid
 {
 public:
@@ -330,25 +344,10 @@ double dpprior(const IntegerVec& memberships)
 	return dpprior;
 }
 
-double calclogf(double x)
+class LogFTable
 {
-	double step = 0.2;
-	double minx = -30.0;
-	double maxx = 30.0;
-	
-	if (x < minx)
-	{
-		return -2.0*log(-x);
-	}
-	else if (x > maxx)
-	{
-		return log(x) + log(sqrt(2.0*M_PI)) + 0.5*x*x;
-	}
-	
-	static DoubleVec xs;
-	static DoubleVec fs;
-	
-	if (xs.empty())
+public:
+	LogFTable() : step(0.2), minx(-30.0), maxx(30.0)
 	{
 		for (long double x = minx; x < maxx + 2.0*step; x+= step)
 		{
@@ -366,6 +365,34 @@ double calclogf(double x)
 		}
 	}
 	
+	double step;
+	double minx;
+	double maxx;
+	DoubleVec xs;
+	DoubleVec fs;
+};
+
+// Table built during static initialization, read only thereafter and
+// safe to share between clustering threads
+static const LogFTable logFTable;
+
+double calclogf(double x)
+{
+	const double step = logFTable.step;
+	const double minx = logFTable.minx;
+	const double maxx = logFTable.maxx;
+	
+	if (x < minx)
+	{
+		return -2.0*log(-x);
+	}
+	else if (x > maxx)
+	{
+		return log(x) + log(sqrt(2.0*M_PI)) + 0.5*x*x;
+	}
+	
+	const DoubleVec& fs = logFTable.fs;
+	
 	int lookup = (int)((x - minx) / step);
 	double remainder = (x - minx) - (double)lookup * step;
 	
@@ -528,7 +555,7 @@ void MatePairGibbs::DoClustering(const MatePairVec& matePairs, IntegerTable& clu
 	int stableCount = 0;
 	for (int iteration = 0; iteration < numIterations; iteration++)
 	{
-		random_shuffle(shuffledIndices.begin(), shuffledIndices.end());
+		RandomShuffle(shuffledIndices);
 		
 		for (IntegerVecConstIter shuffleIter = shuffledIndices.begin(); shuffleIter != shuffledIndices.end(); shuffleIter++)
 		{
@@ -589,7 +616,7 @@ void MatePairGibbs::DoClustering(const MatePairVec& matePairs, IntegerTable& clu
 			
 			// Randomly select cluster 
 			double probAccum = 0.0;
-			double randProb = (double)rand() / (double)RAND_MAX;
+			double randProb = RandomUniform();
 			int sampleIndex = 0;
 			for (int probIndex = 0; probIndex < logClusterProb.size(); probIndex++)
 			{
@@ -11,17 +11,22 @@
 #include "Common.h"
 
 #include <vector>
+#include <boost/random/mersenne_twister.hpp>
 
 using namespace std;
 
 class MatePairGibbs
 {
 public:
-	MatePairGibbs();
+	MatePairGibbs(unsigned int seed = 5489u);
 	
 	void DoClustering(const MatePairVec& matePairs, IntegerTable& clusters);
 	
 private:
+	double RandomUniform();
+	void RandomShuffle(IntegerVec& values);
+	
+	boost::mt19937 mRandomGenerator;
 };
 
 #endif
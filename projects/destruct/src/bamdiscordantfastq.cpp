@@ -12,6 +12,7 @@
 #include "api/BamReader.h"
 #include "DiskPriorityQueue.h"
 
+#include <cstring>
 #include <fstream>
 #include <iostream>
 #include <string>
@@ -30,6 +31,8 @@
 #include <boost/iostreams/filtering_stream.hpp>
 #include <boost/iostreams/filtering_streambuf.hpp>
 #include <boost/iostreams/filter/gzip.hpp>
+#include <boost/thread.hpp>
+#include <deque>
 
 using namespace boost;
 using namespace std;
@@ -115,14 +118,517 @@ struct ReadInfo
     }
 };
 
-class PairedBamReader
+// Set of references from which alignments are read, optionally including unmapped reads
+class ReferenceSet
+{
+public:
+	explicit ReferenceSet(const BamReader& bamReader)
+		: mBamReader(bamReader),
+		  mIncluded(bamReader.GetReferenceCount(), true),
+		  mUnmapped(true)
+	{
+	}
+
+	void Include(const vector<string>& names)
+	{
+		mIncluded = vector<bool>(mIncluded.size(), false);
+		mUnmapped = false;
+
+		for (vector<string>::const_iterator nameIter = names.begin(); nameIter != names.end(); nameIter++)
+		{
+			int refID = GetReferenceID(*nameIter);
+			if (refID >= 0)
+			{
+				mIncluded[refID] = true;
+			}
+		}
+	}
+
+	void Exclude(const vector<string>& names)
+	{
+		for (vector<string>::const_iterator nameIter = names.begin(); nameIter != names.end(); nameIter++)
+		{
+			int refID = GetReferenceID(*nameIter);
+			if (refID >= 0)
+			{
+				mIncluded[refID] = false;
+			}
+		}
+	}
+
+	bool Contains(int refID) const
+	{
+		if (refID < 0)
+		{
+			return mUnmapped;
+		}
+
+		return mIncluded[refID];
+	}
+
+	bool ContainsAll() const
+	{
+		return mUnmapped && find(mIncluded.begin(), mIncluded.end(), false) == mIncluded.end();
+	}
+
+private:
+	int GetReferenceID(const string& name) const
+	{
+		int refID = mBamReader.GetReferenceID(name);
+		if (refID < 0)
+		{
+			cerr << "Warning: reference " << name << " not found in bam header" << endl;
+		}
+		return refID;
+	}
+
+	const BamReader& mBamReader;
+	vector<bool> mIncluded;
+	bool mUnmapped;
+};
+
+// Interface for sequential retrieval of alignments
+class AlignmentSource
+{
+public:
+	virtual ~AlignmentSource() {}
+
+	virtual bool GetNextAlignment(BamAlignment& alignment) = 0;
+};
+
+// Read a little endian value from a stream
+template<typename TValue>
+inline TValue ReadValue(istream& stream)
+{
+	TValue value = 0;
+	stream.read((char*)&value, sizeof(TValue));
+	return value;
+}
+
+// Unpack a little endian value from a buffer
+template<typename TValue>
+inline TValue UnpackValue(const char* data)
+{
+	TValue value;
+	memcpy(&value, data, sizeof(TValue));
+	return value;
+}
+
+// Find the index of a bam file, named as for samtools or bamtools
+inline string FindIndexFilename(const string& bamFilename)
+{
+	vector<string> candidates;
+	candidates.push_back(bamFilename + ".bai");
+	if (bamFilename.size() > 4 && bamFilename.substr(bamFilename.size() - 4) == ".bam")
+	{
+		candidates.push_back(bamFilename.substr(0, bamFilename.size() - 4) + ".bai");
+	}
+
+	for (vector<string>::const_iterator candidateIter = candidates.begin(); candidateIter != candidates.end(); candidateIter++)
+	{
+		if (ifstream(candidateIter->c_str()).good())
+		{
+			return *candidateIter;
+		}
+	}
+
+	cerr << "Error: Unable to find index for bam file " << bamFilename << endl;
+	exit(1);
+}
+
+// Retrieve unplaced unmapped reads, which follow all placed alignments at
+// the end of a coordinate sorted bam file.  The virtual offset of the end
+// of the placed alignments is read from the bam index, and reading starts
+// there, without decompressing the placed alignments.  Bamtools treats
+// unplaced reads as beyond any region, hence the separate reader.
+class UnmappedAlignmentSource : public AlignmentSource
+{
+public:
+	UnmappedAlignmentSource(const string& bamFilename, const string& indexFilename)
+	{
+		uint64_t virtualOffset = ReadUnmappedOffset(indexFilename);
+
+		mBamFile.open(bamFilename.c_str(), ios::in | ios::binary);
+		if (!mBamFile.good())
+		{
+			cerr << "Error: Unable to open bam file " << bamFilename << endl;
+			exit(1);
+		}
+
+		// Bgzf blocks are gzip members, decompressed as a single stream
+		mBamFile.seekg(virtualOffset >> 16);
+		mBamStream.push(iostreams::gzip_decompressor());
+		mBamStream.push(mBamFile);
+
+		if (virtualOffset == 0)
+		{
+			// No placed alignments, unmapped reads follow the header
+			SkipHeader();
+		}
+		else
+		{
+			mBamStream.ignore(virtualOffset & 0xffff);
+		}
+	}
+
+	bool GetNextAlignment(BamAlignment& alignment)
+	{
+		while (ReadAlignment(alignment))
+		{
+			if (alignment.RefID < 0)
+			{
+				return true;
+			}
+		}
+
+		return false;
+	}
+
+private:
+	static uint64_t ReadUnmappedOffset(const string& indexFilename)
+	{
+		ifstream indexFile(indexFilename.c_str(), ios::in | ios::binary);
+
+		char magic[4];
+		indexFile.read(magic, 4);
+		if (!indexFile.good() || string(magic, 4) != string("BAI\1", 4))
+		{
+			cerr << "Error: Unable to read bam index " << indexFilename << endl;
+			exit(1);
+		}
+
+		// Placed alignments end at the maximum chunk end over all references
+		uint64_t unmappedOffset = 0;
+
+		int32_t numReferences = ReadValue<int32_t>(indexFile);
+		for (int32_t refIdx = 0; refIdx < numReferences; refIdx++)
+		{
+			int32_t numBins = ReadValue<int32_t>(indexFile);
+			for (int32_t binIdx = 0; binIdx < numBins; binIdx++)
+			{
+				uint32_t bin = ReadValue<uint32_t>(indexFile);
+				int32_t numChunks = ReadValue<int32_t>(indexFile);
+				for (int32_t chunkIdx = 0; chunkIdx < numChunks; chunkIdx++)
+				{
+					ReadValue<uint64_t>(indexFile);
+					uint64_t chunkEnd = ReadValue<uint64_t>(indexFile);
+
+					// Second chunk of the pseudo bin stores read counts
+					if (bin == 37450 && chunkIdx == 1)
+					{
+						continue;
+					}
+
+					unmappedOffset = max(unmappedOffset, chunkEnd);
+				}
+			}
+
+			int32_t numIntervals = ReadValue<int32_t>(indexFile);
+			indexFile.ignore(numIntervals * sizeof(uint64_t));
+		}
+
+		if (!indexFile.good())
+		{
+			cerr << "Error: Unable to read bam index " << indexFilename << endl;
+			exit(1);
+		}
+
+		return unmappedOffset;
+	}
+
+	void SkipHeader()
+	{
+		char magic[4];
+		mBamStream.read(magic, 4);
+		if (!mBamStream.good() || string(magic, 4) != string("BAM\1", 4))
+		{
+			cerr << "Error: Unable to read bam header" << endl;
+			exit(1);
+		}
+
+		int32_t textLength = ReadValue<int32_t>(mBamStream);
+		mBamStream.ignore(textLength);
+
+		int32_t numReferences = ReadValue<int32_t>(mBamStream);
+		for (int32_t refIdx = 0; refIdx < numReferences; refIdx++)
+		{
+			int32_t nameLength = ReadValue<int32_t>(mBamStream);
+			mBamStream.ignore(nameLength + sizeof(int32_t));
+		}
+	}
+
+	bool ReadAlignment(BamAlignment& alignment)
+	{
+		int32_t blockLength = ReadValue<int32_t>(mBamStream);
+		if (!mBamStream.good() || blockLength == 0)
+		{
+			return false;
+		}
+
+		mBlock.resize(blockLength);
+		mBamStream.read(&mBlock[0], blockLength);
+		if (mBamStream.gcount() != blockLength)
+		{
+			cerr << "Error: Truncated bam record" << endl;
+			exit(1);
+		}
+
+		const char* data = &mBlock[0];
+
+		uint32_t binMapQualNameLength = UnpackValue<uint32_t>(data + 8);
+		uint32_t flagNumCigar = UnpackValue<uint32_t>(data + 12);
+		int32_t sequenceLength = UnpackValue<int32_t>(data + 16);
+
+		alignment.RefID = UnpackValue<int32_t>(data);
+		alignment.Position = UnpackValue<int32_t>(data + 4);
+		alignment.Bin = binMapQualNameLength >> 16;
+		alignment.MapQuality = (binMapQualNameLength >> 8) & 0xff;
+		alignment.AlignmentFlag = flagNumCigar >> 16;
+		alignment.Length = sequenceLength;
+		alignment.MateRefID = UnpackValue<int32_t>(data + 20);
+		alignment.MatePosition = UnpackValue<int32_t>(data + 24);
+		alignment.InsertSize = UnpackValue<int32_t>(data + 28);
+
+		int nameLength = binMapQualNameLength & 0xff;
+		int numCigarOperations = flagNumCigar & 0xffff;
+
+		const char* name = data + 32;
+		alignment.Name.assign(name, nameLength - 1);
+
+		const char* cigar = name + nameLength;
+		alignment.CigarData.clear();
+		for (int cigarIdx = 0; cigarIdx < numCigarOperations; cigarIdx++)
+		{
+			uint32_t cigarOp = UnpackValue<uint32_t>(cigar + 4 * cigarIdx);
+			alignment.CigarData.push_back(CigarOp("MIDNSHP=X"[cigarOp & 0xf], cigarOp >> 4));
+		}
+
+		const char* sequence = cigar + 4 * numCigarOperations;
+		alignment.QueryBases.resize(sequenceLength);
+		for (int seqIdx = 0; seqIdx < sequenceLength; seqIdx++)
+		{
+			alignment.QueryBases[seqIdx] = "=ACMGRSVTWYHKDBN"[(sequence[seqIdx / 2] >> (4 * (1 - seqIdx % 2))) & 0xf];
+		}
+
+		const char* qualities = sequence + (sequenceLength + 1) / 2;
+		alignment.Qualities.resize(sequenceLength);
+		for (int seqIdx = 0; seqIdx < sequenceLength; seqIdx++)
+		{
+			alignment.Qualities[seqIdx] = (qualities[0] == (char)0xff) ? (char)0xff : qualities[seqIdx] + 33;
+		}
+
+		return true;
+	}
+
+	ifstream mBamFile;
+	iostreams::filtering_istream mBamStream;
+	vector<char> mBlock;
+};
+
+// Retrieve alignments of a set of references through the index, followed
+// by unplaced unmapped reads if included
+class ReferenceAlignmentSource : public AlignmentSource
 {
 public:
-	PairedBamReader(BamReader& bamReader, const string& tempsPrefix)
+	ReferenceAlignmentSource(BamReader& bamReader, const ReferenceSet& references)
 		: mBamReader(bamReader),
+		  mReferences(references),
+		  mRefID(-1)
+	{
+		// Sequential read of all alignments
+		if (mReferences.ContainsAll())
+		{
+			return;
+		}
+
+		if (!mBamReader.LocateIndex())
+		{
+			cerr << "Error: Unable to find index for bam file " << mBamReader.GetFilename() << endl;
+			exit(1);
+		}
+	}
+
+	bool GetNextAlignment(BamAlignment& alignment)
+	{
+		if (mReferences.ContainsAll())
+		{
+			return mBamReader.GetNextAlignment(alignment);
+		}
+
+		while (mRefID < mBamReader.GetReferenceCount())
+		{
+			if (mRefID >= 0 && mBamReader.GetNextAlignment(alignment))
+			{
+				return true;
+			}
+
+			// Jump to the next included reference
+			do
+			{
+				mRefID++;
+			}
+			while (mRefID < mBamReader.GetReferenceCount() && !mReferences.Contains(mRefID));
+
+			if (mRefID < mBamReader.GetReferenceCount())
+			{
+				int refLength = mBamReader.GetReferenceData()[mRefID].RefLength;
+				if (!mBamReader.SetRegion(mRefID, 0, mRefID, refLength))
+				{
+					cerr << "Error: Unable to set region for reference " << mBamReader.GetReferenceData()[mRefID].RefName << endl;
+					exit(1);
+				}
+			}
+		}
+
+		if (!mReferences.Contains(-1))
+		{
+			return false;
+		}
+
+		if (!mUnmappedSource)
+		{
+			string bamFilename = mBamReader.GetFilename();
+			mUnmappedSource.reset(new UnmappedAlignmentSource(bamFilename, FindIndexFilename(bamFilename)));
+		}
+
+		return mUnmappedSource->GetNextAlignment(alignment);
+	}
+
+private:
+	BamReader& mBamReader;
+	const ReferenceSet& mReferences;
+	int mRefID;
+	scoped_ptr<UnmappedAlignmentSource> mUnmappedSource;
+};
+
+// Retrieve alignments from another source on a separate thread, overlapping
+// decompression and parsing with processing of alignments
+class PrefetchAlignmentSource : public AlignmentSource
+{
+public:
+	PrefetchAlignmentSource(AlignmentSource& source, int batchSize = 4096, int maxBatches = 16)
+		: mSource(source),
+		  mBatchSize(batchSize),
+		  mMaxBatches(maxBatches),
+		  mFinished(false),
+		  mStopped(false),
+		  mBatchPosition(0)
+	{
+		mThread = boost::thread(boost::bind(&PrefetchAlignmentSource::Producer, this));
+	}
+
+	~PrefetchAlignmentSource()
+	{
+		{
+			boost::mutex::scoped_lock lock(mMutex);
+			mStopped = true;
+		}
+		mBatchRemoved.notify_all();
+		mThread.join();
+	}
+
+	bool GetNextAlignment(BamAlignment& alignment)
+	{
+		if (mBatchPosition >= mBatch.size())
+		{
+			boost::mutex::scoped_lock lock(mMutex);
+
+			while (mBatches.empty() && !mFinished)
+			{
+				mBatchAdded.wait(lock);
+			}
+
+			if (mBatches.empty())
+			{
+				return false;
+			}
+
+			mBatch.swap(mBatches.front());
+			mBatches.pop_front();
+			mBatchPosition = 0;
+
+			mBatchRemoved.notify_one();
+		}
+
+		alignment = mBatch[mBatchPosition++];
+
+		return true;
+	}
+
+private:
+	void Producer()
+	{
+		while (true)
+		{
+			vector<BamAlignment> batch(mBatchSize);
+
+			int batchLength = 0;
+			while (batchLength < mBatchSize && mSource.GetNextAlignment(batch[batchLength]))
+			{
+				batchLength++;
+			}
+			batch.resize(batchLength);
+
+			boost::mutex::scoped_lock lock(mMutex);
+
+			while ((int)mBatches.size() >= mMaxBatches && !mStopped)
+			{
+				mBatchRemoved.wait(lock);
+			}
+
+			if (mStopped)
+			{
+				return;
+			}
+
+			if (!batch.empty())
+			{
+				mBatches.push_back(vector<BamAlignment>());
+				mBatches.back().swap(batch);
+			}
+
+			if (batchLength < mBatchSize)
+			{
+				mFinished = true;
+			}
+
+			mBatchAdded.notify_one();
+
+			if (mFinished)
+			{
+				return;
+			}
+		}
+	}
+
+	AlignmentSource& mSource;
+	int mBatchSize;
+	int mMaxBatches;
+
+	boost::thread mThread;
+	boost::mutex mMutex;
+	boost::condition_variable mBatchAdded;
+	boost::condition_variable mBatchRemoved;
+	deque<vector<BamAlignment> > mBatches;
+	bool mFinished;
+	bool mStopped;
+
+	vector<BamAlignment> mBatch;
+	size_t mBatchPosition;
+};
+
+class PairedBamReader
+{
+public:
+	PairedBamReader(AlignmentSource& alignmentSource, const string& tempsPrefix, const ReferenceSet& references, ostream* orphanStream)
+		: mAlignmentSource(alignmentSource),
+		  mReferences(references),
+		  mOrphanStream(orphanStream),
 		  mBamReadFinished(false),
 		  mDiscordantReadQueue1(tempsPrefix + "_1_", 1024*1024),
-		  mDiscordantReadQueue2(tempsPrefix + "_2_", 1024*1024)
+		  mDiscordantReadQueue2(tempsPrefix + "_2_", 1024*1024),
+		  mOrphanReadQueue1(tempsPrefix + "_orphan_1_", 1024*1024),
+		  mOrphanReadQueue2(tempsPrefix + "_orphan_2_", 1024*1024)
 	{
 	}
 	
@@ -131,8 +637,26 @@ public:
 		if (!mBamReadFinished)
 		{
 			BamAlignment alignment;
-			while (mBamReader.GetNextAlignment(alignment))
+			while (mAlignmentSource.GetNextAlignment(alignment))
 			{
+				// Mates retrieved by another region specific run are written
+				// as orphans to be paired after all regions are processed
+				if (!mReferences.Contains(alignment.MateRefID))
+				{
+					DebugCheck(mOrphanStream != 0);
+
+					if (alignment.IsFirstMate())
+					{
+						mOrphanReadQueue1.Push(ReadInfo(alignment));
+					}
+					else
+					{
+						mOrphanReadQueue2.Push(ReadInfo(alignment));
+					}
+
+					continue;
+				}
+
 				if (alignment.IsProperPair())
 				{
 					// Proper pairs should be close to each other in the bam file
@@ -190,6 +714,11 @@ public:
 			mDiscordantReadQueue1.Finalize();
 			mDiscordantReadQueue2.Finalize();
 
+			if (mOrphanStream != 0)
+			{
+				WriteOrphans();
+			}
+
 			mBamReadFinished = true;
 		}
 
@@ -229,13 +758,46 @@ public:
 	}
 	
 private:
-	BamReader& mBamReader;
+	// Write orphans sorted by name, end 1 before end 2, for merging with
+	// the orphans of other region specific runs
+	void WriteOrphans()
+	{
+		mOrphanReadQueue1.Finalize();
+		mOrphanReadQueue2.Finalize();
+
+		while (!mOrphanReadQueue1.Empty() || !mOrphanReadQueue2.Empty())
+		{
+			int readEnd = 1;
+			if (mOrphanReadQueue1.Empty() || (!mOrphanReadQueue2.Empty() && mOrphanReadQueue2.Top().Name < mOrphanReadQueue1.Top().Name))
+			{
+				readEnd = 2;
+			}
+
+			DiskPriorityQueue<ReadInfo>& orphanReadQueue = (readEnd == 1) ? mOrphanReadQueue1 : mOrphanReadQueue2;
+			const ReadInfo& read = orphanReadQueue.Top();
+
+			*mOrphanStream << read.Name << "\t";
+			*mOrphanStream << readEnd << "\t";
+			*mOrphanStream << (read.IsFailedQC ? 1 : 0) << "\t";
+			*mOrphanStream << read.Sequence << "\t";
+			*mOrphanStream << read.Qualities << "\n";
+
+			orphanReadQueue.Pop();
+		}
+	}
+
+	AlignmentSource& mAlignmentSource;
+	const ReferenceSet& mReferences;
+	ostream* mOrphanStream;
 	bool mBamReadFinished;
 
 	unordered_map<string,BamAlignment> mConcordantReadBuffer[2];
 
 	DiskPriorityQueue<ReadInfo> mDiscordantReadQueue1;
 	DiskPriorityQueue<ReadInfo> mDiscordantReadQueue2;
+
+	DiskPriorityQueue<ReadInfo> mOrphanReadQueue1;
+	DiskPriorityQueue<ReadInfo> mOrphanReadQueue2;
 };
 
 template<typename T>
@@ -280,6 +842,10 @@ int main(int argc, char* argv[])
 	string sample2Filename;
 	int numSamples;
 	bool renameReads;
+	string inclRefs;
+	string exclRefs;
+	string orphansFilename;
+	bool prefetch;
 	
 	try
 	{
@@ -295,6 +861,10 @@ int main(int argc, char* argv[])
 		TCLAP::ValueArg<string> sample2FilenameArg("","sample2","Sample Fastq End 2 Filename",true,"","string",cmd);
 		TCLAP::ValueArg<int> numSamplesArg("n","num","Number of Samples",true,0,"integer",cmd);
 		TCLAP::SwitchArg renameReadsArg("r","rename","Rename With Integer IDs",cmd);
+		TCLAP::ValueArg<string> inclRefsArg("","inclrefs","Include Alignments to References (comma separated)",false,"","string",cmd);
+		TCLAP::ValueArg<string> exclRefsArg("","exclrefs","Exclude Alignments to References (comma separated), Unmapped Included",false,"","string",cmd);
+		TCLAP::ValueArg<string> orphansFilenameArg("","orphans","Reads with Mates in Other References Filename",false,"","string",cmd);
+		TCLAP::SwitchArg prefetchArg("","prefetch","Read Bam on a Separate Thread",cmd);
 		cmd.parse(argc,argv);
 		
 		bamFilename = bamFilenameArg.getValue();
@@ -308,6 +878,10 @@ int main(int argc, char* argv[])
 		sample2Filename = sample2FilenameArg.getValue();
 		numSamples = numSamplesArg.getValue();
 		renameReads = renameReadsArg.getValue();
+		inclRefs = inclRefsArg.getValue();
+		exclRefs = exclRefsArg.getValue();
+		orphansFilename = orphansFilenameArg.getValue();
+		prefetch = prefetchArg.getValue();
 	}
 	catch (TCLAP::ArgException &e)
 	{
@@ -327,7 +901,55 @@ int main(int argc, char* argv[])
 		exit(1);
 	}
 
-	PairedBamReader pairedReader(bamReader, tempsPrefix);
+	ReferenceSet references(bamReader);
+
+	if (!inclRefs.empty() && !exclRefs.empty())
+	{
+		cerr << "Error: Specify only one of inclrefs and exclrefs" << endl;
+		exit(1);
+	}
+
+	if (!inclRefs.empty())
+	{
+		vector<string> inclRefsFields;
+		split(inclRefsFields, inclRefs, is_any_of(","));
+
+		references.Include(inclRefsFields);
+	}
+
+	if (!exclRefs.empty())
+	{
+		vector<string> exclRefsFields;
+		split(exclRefsFields, exclRefs, is_any_of(","));
+
+		references.Exclude(exclRefsFields);
+	}
+
+	ofstream orphansFile;
+
+	if (!references.ContainsAll())
+	{
+		if (orphansFilename.empty())
+		{
+			cerr << "Error: Orphans filename required for a subset of references" << endl;
+			exit(1);
+		}
+
+		orphansFile.open(orphansFilename.c_str(), std::ios_base::out | std::ios_base::binary);
+		CheckFile(orphansFile, orphansFilename);
+	}
+
+	ReferenceAlignmentSource referenceSource(bamReader, references);
+
+	scoped_ptr<PrefetchAlignmentSource> prefetchSource;
+	if (prefetch)
+	{
+		prefetchSource.reset(new PrefetchAlignmentSource(referenceSource));
+	}
+
+	AlignmentSource& alignmentSource = prefetchSource ? (AlignmentSource&)*prefetchSource : (AlignmentSource&)referenceSource;
+
+	PairedBamReader pairedReader(alignmentSource, tempsPrefix, references, orphansFile.is_open() ? &orphansFile : 0);
 
 	ofstream fastq1File(fastq1Filename.c_str(), std::ios_base::out | std::ios_base::binary);
 	ofstream fastq2File(fastq2Filename.c_str(), std::ios_base::out | std::ios_base::binary);
@@ -413,8 +1035,8 @@ int main(int argc, char* argv[])
 		sampledReads.AddSample(make_pair(discordantRead1, discordantRead2));
 
 		// Update read length histogram for all reads
-		readLengthHist.insert(make_pair(alignment1.Length, 0)).first->second++;
-		readLengthHist.insert(make_pair(alignment2.Length, 0)).first->second++;
+		readLengthHist.insert(make_pair((int)discordantRead1.Sequence.size(), 0)).first->second++;
+		readLengthHist.insert(make_pair((int)discordantRead2.Sequence.size(), 0)).first->second++;
 
 		// Optionally change the fragment name
 		string fragment = discordantRead1.Name;
@@ -440,22 +1062,25 @@ int main(int argc, char* argv[])
 		fragmentIndex++;
 	}
 
+	// Checks are deferred to merging of outputs for a subset of references
+	bool checkCounts = references.ContainsAll();
+
 	// Check for an empty bam file (fail, somethings wrong)
-	if (concordantReadCount + discordantReadCount == 0)
+	if (checkCounts && concordantReadCount + discordantReadCount == 0)
 	{
 		cerr << "Error: No reads" << endl;
 		exit(1);
 	}
 	
 	// Check for a bam file with no concordant reads (fail, somethings wrong)
-	if (concordantReadCount == 0)
+	if (checkCounts && concordantReadCount == 0)
 	{
 		cerr << "Error: No concordant reads" << endl;
 		exit(1);
 	}
 	
 	// Check for a bam file with no discordant reads (usually somethings wrong)
-	if (discordantReadCount == 0)
+	if (checkCounts && discordantReadCount == 0)
 	{
 		cerr << "Error: No discordant reads" << endl;
 		exit(1);
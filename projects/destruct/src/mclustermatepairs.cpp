@@ -17,6 +17,8 @@
 #include <set>
 #include <tclap/CmdLine.h>
 #include <boost/algorithm/string.hpp>
+#include <boost/functional/hash.hpp>
+#include <boost/thread.hpp>
 
 using namespace boost;
 using namespace std;
@@ -60,6 +62,166 @@ void OutputClusterMember(ostream& out, int clusterID, int clusterEnd, const Read
 	out << record;
 }
 
+typedef vector<pair<ReadInfo,ReadInfo> > ClusterReadInfos;
+typedef vector<ClusterReadInfos> PartitionClusters;
+
+void ClusterPartition(const DiscordantAlignments& discordantAlignments, const pair<uint32_t,uint32_t>& chrStrIdxPair, int minClusterSize, PartitionClusters& clusters)
+{
+	vector<MatePair> matePairs = discordantAlignments.CreateMatePairs(chrStrIdxPair);
+	vector<pair<ReadInfo,ReadInfo> > readInfos = discordantAlignments.CreateReadInfos(chrStrIdxPair);
+
+	if (matePairs.size() < minClusterSize)
+	{
+		return;
+	}
+	
+	if (matePairs.size() == 1)
+	{
+		clusters.push_back(ClusterReadInfos(1, readInfos.front()));
+		return;
+	}
+	
+	MatePairDelauny delaunyClusterer;
+	
+	IntegerTable delaunyClusters;
+	delaunyClusterer.DoClustering(matePairs, delaunyClusters);
+	
+	// Seed from the chromosome pair so that sampling is independent of
+	// the order in which partitions are clustered
+	MatePairGibbs gibbsClusterer(hash_value(chrStrIdxPair));
+	
+	for (IntegerTableConstIter delaunyClusterIter = delaunyClusters.begin(); delaunyClusterIter != delaunyClusters.end(); delaunyClusterIter++)
+	{
+		if (delaunyClusterIter->size() < minClusterSize)
+		{
+			continue;
+		}
+		
+		MatePairVec delaunyMatePairs;
+		IntegerVec alignPairIndices;
+		for (IntegerVecConstIter elementIter = delaunyClusterIter->begin(); elementIter != delaunyClusterIter->end(); elementIter++)
+		{
+			delaunyMatePairs.push_back(matePairs[*elementIter]);
+			alignPairIndices.push_back(*elementIter);
+		}
+		
+		IntegerTable gibbsClusters;
+		gibbsClusterer.DoClustering(delaunyMatePairs, gibbsClusters);
+		
+		for (int clusterIndex = 0; clusterIndex < gibbsClusters.size(); clusterIndex++)
+		{
+			const IntegerVec& cluster = gibbsClusters[clusterIndex];
+
+			if (cluster.size() < minClusterSize)
+			{
+				continue;
+			}
+
+			unordered_set<int> clusterReadIDs;
+			for (int elementIndex = 0; elementIndex < cluster.size(); elementIndex++)
+			{
+				int alignPairIndex = alignPairIndices[cluster[elementIndex]];
+
+				clusterReadIDs.insert(readInfos[alignPairIndex].first.readID);
+			}
+
+			if (clusterReadIDs.size() < minClusterSize)
+			{
+				continue;
+			}
+
+			clusters.push_back(ClusterReadInfos());
+			for (int elementIndex = 0; elementIndex < cluster.size(); elementIndex++)
+			{
+				int alignPairIndex = alignPairIndices[cluster[elementIndex]];
+				
+				clusters.back().push_back(readInfos[alignPairIndex]);
+			}
+		}
+	}
+}
+
+class PartitionClusterer
+{
+public:
+	PartitionClusterer(const DiscordantAlignments& discordantAlignments, const vector<pair<uint32_t,uint32_t> >& chrStrIdxPairs, int minClusterSize)
+		: mDiscordantAlignments(discordantAlignments),
+		  mChrStrIdxPairs(chrStrIdxPairs),
+		  mMinClusterSize(minClusterSize),
+		  mNextPartition(0),
+		  mPartitionClusters(chrStrIdxPairs.size()),
+		  mPartitionComplete(chrStrIdxPairs.size(), false)
+	{}
+	
+	void Run(int numThreads)
+	{
+		for (int threadIndex = 0; threadIndex < numThreads; threadIndex++)
+		{
+			mThreads.create_thread(boost::bind(&PartitionClusterer::Worker, this));
+		}
+	}
+	
+	void Join()
+	{
+		mThreads.join_all();
+	}
+	
+	// Wait for a partition to be clustered and take its clusters
+	void Take(int partitionIndex, PartitionClusters& clusters)
+	{
+		boost::mutex::scoped_lock lock(mMutex);
+		
+		while (!mPartitionComplete[partitionIndex])
+		{
+			mComplete.wait(lock);
+		}
+		
+		clusters.swap(mPartitionClusters[partitionIndex]);
+	}
+	
+private:
+	void Worker()
+	{
+		while (true)
+		{
+			int partitionIndex;
+			{
+				boost::mutex::scoped_lock lock(mMutex);
+				
+				if (mNextPartition >= mChrStrIdxPairs.size())
+				{
+					return;
+				}
+				
+				partitionIndex = mNextPartition++;
+			}
+			
+			PartitionClusters clusters;
+			ClusterPartition(mDiscordantAlignments, mChrStrIdxPairs[partitionIndex], mMinClusterSize, clusters);
+			
+			{
+				boost::mutex::scoped_lock lock(mMutex);
+				
+				mPartitionClusters[partitionIndex].swap(clusters);
+				mPartitionComplete[partitionIndex] = true;
+			}
+			
+			mComplete.notify_all();
+		}
+	}
+	
+	const DiscordantAlignments& mDiscordantAlignments;
+	const vector<pair<uint32_t,uint32_t> >& mChrStrIdxPairs;
+	int mMinClusterSize;
+	
+	boost::thread_group mThreads;
+	boost::mutex mMutex;
+	boost::condition_variable mComplete;
+	int mNextPartition;
+	vector<PartitionClusters> mPartitionClusters;
+	vector<bool> mPartitionComplete;
+};
+
 int main(int argc, char* argv[])
 {
 	string alignmentsFilename;
@@ -69,6 +231,7 @@ int main(int argc, char* argv[])
 	int maxFragmentLength;
 	string chromPair;
 	string exclChromPairs;
+	int numThreads;
 	
 	try
 	{
@@ -80,6 +243,7 @@ int main(int argc, char* argv[])
 		TCLAP::ValueArg<int> maxFragmentLengthArg("","fragmax","Maximum Fragment Length",true,-1,"integer",cmd);
 		TCLAP::ValueArg<string> chromPairArg("","inclchrompair","Include Chromosome Pair (comma separated)",false,"","string",cmd);
 		TCLAP::ValueArg<string> exclChromPairsArg("","exclchrompairs","Exclude Chromosome Pairs from Set (comma separated)",false,"","string",cmd);
+		TCLAP::ValueArg<int> numThreadsArg("t","threads","Number of Threads Clustering Chromosome Pairs",false,1,"integer",cmd);
 		cmd.parse(argc,argv);
 		
 		alignmentsFilename = alignmentsFilenameArg.getValue();
@@ -89,6 +253,7 @@ int main(int argc, char* argv[])
 		maxFragmentLength = maxFragmentLengthArg.getValue();
 		chromPair = chromPairArg.getValue();
 		exclChromPairs = exclChromPairsArg.getValue();
+		numThreads = numThreadsArg.getValue();
 	}
 	catch (TCLAP::ArgException &e)
 	{
@@ -156,86 +321,44 @@ int main(int argc, char* argv[])
 
 	vector<pair<uint32_t,uint32_t> > chrStrIdxPairs = discordantAlignments.GetChrStrIdxPairs();
 
-	for (vector<pair<uint32_t,uint32_t> >::const_iterator chrStrIdxPairIter = chrStrIdxPairs.begin(); chrStrIdxPairIter != chrStrIdxPairs.end(); chrStrIdxPairIter++)
+	// Clusters are output in chromosome pair order and numbered sequentially
+	// irrespective of the number of threads
+	PartitionClusterer partitionClusterer(discordantAlignments, chrStrIdxPairs, minClusterSize);
+
+	if (numThreads > 1)
+	{
+		partitionClusterer.Run(numThreads);
+	}
+
+	for (int partitionIndex = 0; partitionIndex < chrStrIdxPairs.size(); partitionIndex++)
 	{
-		pair<string,string> chromosomes = discordantAlignments.GetChromosomePair(*chrStrIdxPairIter);
-		pair<string,string> strands = discordantAlignments.GetStrandPair(*chrStrIdxPairIter);
-		vector<MatePair> matePairs = discordantAlignments.CreateMatePairs(*chrStrIdxPairIter);
-		vector<pair<ReadInfo,ReadInfo> > readInfos = discordantAlignments.CreateReadInfos(*chrStrIdxPairIter);
+		PartitionClusters clusters;
 
-		if (matePairs.size() < minClusterSize)
+		if (numThreads > 1)
 		{
-			continue;
+			partitionClusterer.Take(partitionIndex, clusters);
 		}
-		
-		if (matePairs.size() == 1)
+		else
 		{
-			OutputClusterMember(clustersFile, clusterID, 0, readInfos.front().first);
-			OutputClusterMember(clustersFile, clusterID, 1, readInfos.front().second);
-
-			clusterID++;
-			continue;
+			ClusterPartition(discordantAlignments, chrStrIdxPairs[partitionIndex], minClusterSize, clusters);
 		}
-		
-		MatePairDelauny delaunyClusterer;
-		
-		IntegerTable delaunyClusters;
-		delaunyClusterer.DoClustering(matePairs, delaunyClusters);
-		
-		for (IntegerTableConstIter delaunyClusterIter = delaunyClusters.begin(); delaunyClusterIter != delaunyClusters.end(); delaunyClusterIter++)
+
+		for (PartitionClusters::const_iterator clusterIter = clusters.begin(); clusterIter != clusters.end(); clusterIter++)
 		{
-			if (delaunyClusterIter->size() < minClusterSize)
+			for (ClusterReadInfos::const_iterator readInfoIter = clusterIter->begin(); readInfoIter != clusterIter->end(); readInfoIter++)
 			{
-				continue;
+				OutputClusterMember(clustersFile, clusterID, 0, readInfoIter->first);
+				OutputClusterMember(clustersFile, clusterID, 1, readInfoIter->second);
 			}
-			
-			MatePairVec delaunyMatePairs;
-			IntegerVec alignPairIndices;
-			for (IntegerVecConstIter elementIter = delaunyClusterIter->begin(); elementIter != delaunyClusterIter->end(); elementIter++)
-			{
-				delaunyMatePairs.push_back(matePairs[*elementIter]);
-				alignPairIndices.push_back(*elementIter);
-			}
-			
-			MatePairGibbs gibbsClusterer;
-			
-			IntegerTable gibbsClusters;
-			gibbsClusterer.DoClustering(delaunyMatePairs, gibbsClusters);
-			
-			for (int clusterIndex = 0; clusterIndex < gibbsClusters.size(); clusterIndex++)
-			{
-				const IntegerVec& cluster = gibbsClusters[clusterIndex];
-
-				if (cluster.size() < minClusterSize)
-				{
-					continue;
-				}
-
-				unordered_set<int> clusterReadIDs;
-				for (int elementIndex = 0; elementIndex < cluster.size(); elementIndex++)
-				{
-					int alignPairIndex = alignPairIndices[cluster[elementIndex]];
-
-					clusterReadIDs.insert(readInfos[alignPairIndex].first.readID);
-				}
-
-				if (clusterReadIDs.size() < minClusterSize)
-				{
-					continue;
-				}
-
-				for (int elementIndex = 0; elementIndex < cluster.size(); elementIndex++)
-				{
-					int alignPairIndex = alignPairIndices[cluster[elementIndex]];
-					
-					OutputClusterMember(clustersFile, clusterID, 0, readInfos[alignPairIndex].first);
-					OutputClusterMember(clustersFile, clusterID, 1, readInfos[alignPairIndex].second);
-				}
 
-				clusterID++;
-			}
+			clusterID++;
 		}
 	}
+
+	if (numThreads > 1)
+	{
+		partitionClusterer.Join();
+	}
 	
 	clustersFile.close();
 	
@@ -28,13 +28,76 @@ using namespace boost;
 using namespace std;
 
 
-bool BestSplitAlignment(const short int* scores1Fwd, int scores1FwdLength,
-                        const short int* scores2Rev, int scores2RevLength,
-                        int breakInsertScore, int minAnchor, int& score,
-                        int& seq1Length, int& seq2Length)
+class SplitAlignmentScorer
 {
-	IntegerVec scores1FwdBreakInsert(scores1FwdLength);
-	IntegerVec scores1FwdPrevMax(scores1FwdLength);
+public:
+	bool BestSplitAlignment(const short int* scores1Fwd, int scores1FwdLength,
+	                        const short int* scores2Rev, int scores2RevLength,
+	                        int breakInsertScore, int minAnchor, int& score,
+	                        int& seq1Length, int& seq2Length);
+	
+private:
+	int CalculateSplitScores(const short int* scores2Rev, int scores2RevLength, int scores1FwdLength);
+	
+	IntegerVec mScores1FwdBreakInsert;
+	IntegerVec mScores1FwdPrevMax;
+	IntegerVec mSplitScores;
+};
+
+int SplitAlignmentScorer::CalculateSplitScores(const short int* scores2Rev, int scores2RevLength, int scores1FwdLength)
+{
+	// Split score for each seq1 length is the break insert score for seq1
+	// plus the reverse score of the remainder of the read, reversed scores
+	// are loaded 4 at a time and widened to 32 bits
+	
+	const int* breakInsert = &mScores1FwdBreakInsert.front();
+	int* splitScores = &mSplitScores.front();
+	
+	__m128i maxScore = _mm_set1_epi32(numeric_limits<int>::min());
+	
+	int seq1Length = 0;
+	for (; seq1Length + 4 <= scores1FwdLength; seq1Length += 4)
+	{
+		const short int* scores2RevPtr = scores2Rev + scores2RevLength - seq1Length - 4;
+		
+		__m128i scores2 = _mm_loadl_epi64((const __m128i*)scores2RevPtr);
+		scores2 = _mm_shufflelo_epi16(scores2, _MM_SHUFFLE(0,1,2,3));
+		scores2 = _mm_srai_epi32(_mm_unpacklo_epi16(scores2, scores2), 16);
+		
+		__m128i scores1 = _mm_loadu_si128((const __m128i*)(breakInsert + seq1Length));
+		__m128i split = _mm_add_epi32(scores1, scores2);
+		
+		_mm_storeu_si128((__m128i*)(splitScores + seq1Length), split);
+		
+		__m128i splitCmp = _mm_cmpgt_epi32(split, maxScore);
+		maxScore = _mm_or_si128(_mm_and_si128(splitCmp, split), _mm_andnot_si128(splitCmp, maxScore));
+	}
+	
+	int maxScores[4];
+	_mm_storeu_si128((__m128i*)maxScores, maxScore);
+	
+	int score = *max_element(maxScores, maxScores + 4);
+	
+	for (; seq1Length < scores1FwdLength; seq1Length++)
+	{
+		splitScores[seq1Length] = breakInsert[seq1Length] + scores2Rev[scores2RevLength - seq1Length - 1];
+		score = max(score, splitScores[seq1Length]);
+	}
+	
+	return score;
+}
+
+bool SplitAlignmentScorer::BestSplitAlignment(const short int* scores1Fwd, int scores1FwdLength,
+                                              const short int* scores2Rev, int scores2RevLength,
+                                              int breakInsertScore, int minAnchor, int& score,
+                                              int& seq1Length, int& seq2Length)
+{
+	mScores1FwdBreakInsert.resize(scores1FwdLength);
+	mScores1FwdPrevMax.resize(scores1FwdLength);
+	mSplitScores.resize(scores1FwdLength);
+	
+	IntegerVec& scores1FwdBreakInsert = mScores1FwdBreakInsert;
+	IntegerVec& scores1FwdPrevMax = mScores1FwdPrevMax;
 	
 	scores1FwdBreakInsert[0] = scores1Fwd[0];
 	scores1FwdPrevMax[0] = 0;
@@ -52,28 +115,17 @@ bool BestSplitAlignment(const short int* scores1Fwd, int scores1FwdLength,
 		}
 	}
 	
-	IntegerVec seq1LengthMax;
+	score = CalculateSplitScores(scores2Rev, scores2RevLength, scores1FwdLength);
 	
-	score = numeric_limits<int>::min();
-	for (seq1Length = 0; seq1Length < scores1FwdLength; seq1Length++)
+	// Consider seq1 lengths with maximal split score in increasing order
+	for (int seq1LengthMax = 0; seq1LengthMax < scores1FwdLength; seq1LengthMax++)
 	{
-		int seq2Length = scores2RevLength - seq1Length - 1;
-		
-		if (scores1FwdBreakInsert[seq1Length] + scores2Rev[seq2Length] > score)
+		if (mSplitScores[seq1LengthMax] != score)
 		{
-			score = scores1FwdBreakInsert[seq1Length] + scores2Rev[seq2Length];
-			seq1LengthMax.clear();
+			continue;
 		}
 		
-		if (scores1FwdBreakInsert[seq1Length] + scores2Rev[seq2Length] >= score)
-		{
-			seq1LengthMax.push_back(seq1Length);
-		}
-	}
-	
-	for (int idx = 0; idx < seq1LengthMax.size(); idx++)
-	{
-		seq1Length = seq1LengthMax[idx];
+		seq1Length = seq1LengthMax;
 		seq2Length = scores2RevLength - seq1Length - 1;
 		
 		if (scores1FwdBreakInsert[seq1Length] == scores1Fwd[seq1Length])
@@ -299,6 +351,7 @@ int main(int argc, char* argv[])
 	cerr << "Realigning" << endl;
 	
 	SimpleAligner aligner(matchScore, misMatchScore, gapScore);
+	SplitAlignmentScorer splitScorer;
 	
 	SamAlignmentStream alignmentStream(alignmentsFilename);
 	FragmentAlignmentStream fragmentAlignmentStream(&alignmentStream);
@@ -515,9 +568,9 @@ int main(int argc, char* argv[])
 					int score;
 					int seq1Length;
 					int seq2Length;
-					bool hasSplit = BestSplitAlignment(selfAlignInfo.SeqScores(), selfAlignInfo.SeqScoresLength(),
-					                                   mateAlignInfo.SeqScores(), mateAlignInfo.SeqScoresLength(),
-					                                   cInsertedPenalty, cMinAnchor, score, seq1Length, seq2Length);
+					bool hasSplit = splitScorer.BestSplitAlignment(selfAlignInfo.SeqScores(), selfAlignInfo.SeqScoresLength(),
+					                                               mateAlignInfo.SeqScores(), mateAlignInfo.SeqScoresLength(),
+					                                               cInsertedPenalty, cMinAnchor, score, seq1Length, seq2Length);
 
 					if (!hasSplit)
 					{
@@ -7,13 +7,351 @@
 #include "ReadStream.h"
 #include "Sequences.h"
 
+#include <sstream>
 #include <boost/unordered_map.hpp>
+#include <boost/thread.hpp>
 #include <tclap/CmdLine.h>
 
 using namespace boost;
 using namespace std;
 
 
+typedef unordered_map<AlignmentKey,SpanningAlignmentRecord> SpanningAlignmentMap;
+typedef unordered_map<int,vector<ClusterMemberRecord> > ClusterMembershipMap;
+typedef vector<BreakpointRecord> BreakpointRecordVec;
+
+class BreakendSequenceCache
+{
+public:
+	BreakendSequenceCache(const Sequences& referenceSequences, int maxFragmentLength)
+		: mReferenceSequences(referenceSequences), mMaxFragmentLength(maxFragmentLength)
+	{}
+	
+	// Breakend sequence of length max fragment length ending at the breakend,
+	// optionally reverse complemented, extracted once per distinct breakend
+	const string& Get(const string& chromosome, const string& strand, int position, bool reverseComplement)
+	{
+		BreakendKey key(make_pair(chromosome, strand), position);
+		
+		unordered_map<BreakendKey,pair<string,string> >::iterator cacheIter = mCache.find(key);
+		
+		if (cacheIter == mCache.end())
+		{
+			int breakendStart;
+			int breakendEnd;
+			if (strand == "+")
+			{
+				breakendStart = position - mMaxFragmentLength + 1;
+				breakendEnd = position;
+			}
+			else
+			{
+				breakendStart = position;
+				breakendEnd = position + mMaxFragmentLength - 1;
+			}
+			
+			pair<string,string> sequences;
+			mReferenceSequences.Get(chromosome, breakendStart, breakendEnd, sequences.first);
+			
+			sequences.second = sequences.first;
+			ReverseComplement(sequences.second);
+			
+			cacheIter = mCache.insert(make_pair(key, sequences)).first;
+		}
+		
+		return (reverseComplement) ? cacheIter->second.second : cacheIter->second.first;
+	}
+	
+private:
+	typedef pair<pair<string,string>,int> BreakendKey;
+	
+	const Sequences& mReferenceSequences;
+	int mMaxFragmentLength;
+	unordered_map<BreakendKey,pair<string,string> > mCache;
+};
+
+class BreakpointRealigner
+{
+public:
+	BreakpointRealigner(const Sequences& referenceSequences,
+	                    const PreppedReads& preppedReads,
+	                    const SpanningAlignmentMap& spanningAlignments,
+	                    const ClusterMembershipMap& clusters,
+	                    int maxFragmentLength)
+		: mReferenceSequences(referenceSequences),
+		  mPreppedReads(preppedReads),
+		  mSpanningAlignments(spanningAlignments),
+		  mClusters(clusters),
+		  mMaxFragmentLength(maxFragmentLength)
+	{}
+	
+	// Realign the reads of a cluster to each of its breakpoints
+	void RealignCluster(SimpleAligner& aligner, const BreakpointRecordVec& breakpoints, ostream& realignmentsFile) const
+	{
+		BreakendSequenceCache breakendSequences(mReferenceSequences, mMaxFragmentLength);
+		
+		for (BreakpointRecordVec::const_iterator breakpointIter = breakpoints.begin(); breakpointIter != breakpoints.end(); breakpointIter++)
+		{
+			RealignBreakpoint(aligner, breakendSequences, *breakpointIter, realignmentsFile);
+		}
+	}
+	
+private:
+	void RealignBreakpoint(SimpleAligner& aligner, BreakendSequenceCache& breakendSequences, const BreakpointRecord& breakpointRecord, ostream& realignmentsFile) const
+	{
+		// Find reads that support this breakpoint
+		ClusterMembershipMap::const_iterator clusterIter = mClusters.find(breakpointRecord.clusterID);
+
+		// Skip this breakpoint since there are no reads for it in the current read set
+		if (clusterIter == mClusters.end())
+		{
+			return;
+		}
+
+		// Create a breakpoint sequence for each cluster end with the sequence of the reference maintained (not reverse
+		// complemented) for that breakend.  Breakend sequences of specific lengths are taken from the reference genome.
+		string breakpointSequence[2];
+		for (int clusterEnd = 0; clusterEnd <= 1; clusterEnd++)
+		{
+			const string& selfbreakendSequence = breakendSequences.Get(breakpointRecord.chromosome[clusterEnd],
+			                                                           breakpointRecord.strand[clusterEnd],
+			                                                           breakpointRecord.position[clusterEnd],
+			                                                           breakpointRecord.strand[clusterEnd] == "-");
+
+			const string& mateBreakendSequence = breakendSequences.Get(breakpointRecord.chromosome[1-clusterEnd],
+			                                                           breakpointRecord.strand[1-clusterEnd],
+			                                                           breakpointRecord.position[1-clusterEnd],
+			                                                           breakpointRecord.strand[1-clusterEnd] == "+");
+
+			string insertedSequence = breakpointRecord.inserted;
+
+			if (clusterEnd == 1)
+			{
+				ReverseComplement(insertedSequence);
+			}
+
+			breakpointSequence[clusterEnd] = selfbreakendSequence + insertedSequence + mateBreakendSequence;
+		}
+
+		// Iterate cluster reads and their alignments
+		const vector<ClusterMemberRecord>& memberships = clusterIter->second;
+		for (vector<ClusterMemberRecord>::const_iterator memberIter = memberships.begin(); memberIter != memberships.end(); memberIter++)
+		{
+			const ClusterMemberRecord& memberRecord = *memberIter;
+
+			SpanningAlignmentMap::const_iterator alignIter = mSpanningAlignments.find(memberRecord.GetAlignmentKey());
+			DebugCheck(alignIter != mSpanningAlignments.end());
+
+			const SpanningAlignmentRecord& spanningRecord = alignIter->second;
+
+			// Calculate the length between the breakend and the start of the read
+			int templateLength = abs(spanningRecord.position - breakpointRecord.position[memberRecord.clusterEnd]) + 1;
+
+			// Calculate position of alignment in breakpoint sequence
+			int adjustedPosition = mMaxFragmentLength - templateLength;
+
+			// Sequence of the current read
+			const char* readStartPtr;
+			const char* readEndPtr;
+			mPreppedReads.GetReadPtrs(memberRecord.readID, memberRecord.readEnd, PlusStrand, readStartPtr, readEndPtr);
+
+			int score = 0;
+			if (adjustedPosition >= 16 && adjustedPosition <= breakpointSequence[memberRecord.clusterEnd].size() / 2)
+			{
+				// Pointer to first position to which the read should align
+				const char* refPtr = &breakpointSequence[memberRecord.clusterEnd][adjustedPosition];
+
+				// Align to forward strand of breakpoint sequence
+				score = aligner.AlignBandedSSE2BW7ScoreFwd(refPtr, readStartPtr, readEndPtr);
+			}
+
+			BreakAlignScoreRecord scoreRecord;
+
+			scoreRecord.clusterID = breakpointRecord.clusterID;
+			scoreRecord.breakpointID = breakpointRecord.breakpointID;
+			scoreRecord.clusterEnd = memberRecord.clusterEnd;
+			scoreRecord.libID = memberRecord.libID;
+			scoreRecord.readID = memberRecord.readID;
+			scoreRecord.readEnd = memberRecord.readEnd;
+			scoreRecord.alignID = memberRecord.alignID;
+			scoreRecord.alignedLength = readEndPtr - readStartPtr;
+			scoreRecord.templateLength = templateLength;
+			scoreRecord.score = score;
+
+			realignmentsFile << scoreRecord;
+		}
+	}
+	
+	const Sequences& mReferenceSequences;
+	const PreppedReads& mPreppedReads;
+	const SpanningAlignmentMap& mSpanningAlignments;
+	const ClusterMembershipMap& mClusters;
+	int mMaxFragmentLength;
+};
+
+// Read consecutive breakpoints of the same cluster
+class ClusterBreakpointsReader
+{
+public:
+	ClusterBreakpointsReader(istream& breakpointsFile)
+		: mBreakpointsFile(breakpointsFile),
+		  mHaveNext(false)
+	{}
+	
+	bool Next(BreakpointRecordVec& breakpoints)
+	{
+		breakpoints.clear();
+		
+		if (!mHaveNext && !(mBreakpointsFile >> mNext))
+		{
+			return false;
+		}
+		
+		breakpoints.push_back(mNext);
+		mHaveNext = false;
+		
+		while (mBreakpointsFile >> mNext)
+		{
+			if (mNext.clusterID != breakpoints.front().clusterID)
+			{
+				mHaveNext = true;
+				break;
+			}
+			
+			breakpoints.push_back(mNext);
+		}
+		
+		return true;
+	}
+	
+private:
+	istream& mBreakpointsFile;
+	BreakpointRecord mNext;
+	bool mHaveNext;
+};
+
+class ClusterRealignerPool
+{
+public:
+	ClusterRealignerPool(const BreakpointRealigner& realigner, ClusterBreakpointsReader& clusterReader,
+	                     int matchScore, int misMatchScore, int gapScore, int maxPending)
+		: mRealigner(realigner),
+		  mClusterReader(clusterReader),
+		  mMatchScore(matchScore),
+		  mMisMatchScore(misMatchScore),
+		  mGapScore(gapScore),
+		  mMaxPending(maxPending),
+		  mNextCluster(0),
+		  mNextTake(0),
+		  mFinished(false)
+	{}
+	
+	void Run(int numThreads)
+	{
+		for (int threadIndex = 0; threadIndex < numThreads; threadIndex++)
+		{
+			mThreads.create_thread(boost::bind(&ClusterRealignerPool::Worker, this));
+		}
+	}
+	
+	void Join()
+	{
+		mThreads.join_all();
+	}
+	
+	// Wait for the next cluster in breakpoint file order to be realigned and
+	// take its formatted realignments, false if all clusters have been taken
+	bool Take(string& realignments)
+	{
+		boost::mutex::scoped_lock lock(mMutex);
+		
+		while (mClusterRealignments.find(mNextTake) == mClusterRealignments.end())
+		{
+			if (mFinished && mNextTake >= mNextCluster)
+			{
+				return false;
+			}
+			
+			mComplete.wait(lock);
+		}
+		
+		realignments.swap(mClusterRealignments[mNextTake]);
+		mClusterRealignments.erase(mNextTake);
+		mNextTake++;
+		
+		mAvailable.notify_all();
+		
+		return true;
+	}
+	
+private:
+	void Worker()
+	{
+		SimpleAligner aligner(mMatchScore, mMisMatchScore, mGapScore);
+		
+		while (true)
+		{
+			int clusterIndex;
+			BreakpointRecordVec breakpoints;
+			{
+				boost::mutex::scoped_lock lock(mMutex);
+				
+				// Pause while the maximum number of clusters are realigned
+				// or waiting to be taken
+				while (!mFinished && mNextCluster - mNextTake >= mMaxPending)
+				{
+					mAvailable.wait(lock);
+				}
+				
+				if (mFinished)
+				{
+					return;
+				}
+				
+				if (!mClusterReader.Next(breakpoints))
+				{
+					mFinished = true;
+					mAvailable.notify_all();
+					mComplete.notify_all();
+					return;
+				}
+				
+				clusterIndex = mNextCluster++;
+			}
+			
+			ostringstream realignments;
+			mRealigner.RealignCluster(aligner, breakpoints, realignments);
+			
+			string realignmentsStr = realignments.str();
+			
+			{
+				boost::mutex::scoped_lock lock(mMutex);
+				
+				mClusterRealignments[clusterIndex].swap(realignmentsStr);
+			}
+			
+			mComplete.notify_all();
+		}
+	}
+	
+	const BreakpointRealigner& mRealigner;
+	ClusterBreakpointsReader& mClusterReader;
+	int mMatchScore;
+	int mMisMatchScore;
+	int mGapScore;
+	int mMaxPending;
+	
+	boost::thread_group mThreads;
+	boost::mutex mMutex;
+	boost::condition_variable mComplete;
+	boost::condition_variable mAvailable;
+	int mNextCluster;
+	int mNextTake;
+	bool mFinished;
+	unordered_map<int,string> mClusterRealignments;
+};
+
+
 int main(int argc, char* argv[])
 {
 	int matchScore;
@@ -27,6 +365,8 @@ int main(int argc, char* argv[])
 	string clustersFilename;
 	string breakpointsFilename;
 	string realignmentsFilename;
+	int numThreads;
+	int maxPending;
 	
 	try
 	{
@@ -42,6 +382,8 @@ int main(int argc, char* argv[])
 		TCLAP::ValueArg<string> clustersFilenameArg("c","clusters","Clusters Filename",true,"","string",cmd);
 		TCLAP::ValueArg<string> breakpointsFilenameArg("b","breakpoints","Breakpoints Filename",true,"","string",cmd);
 		TCLAP::ValueArg<string> realignmentsFilenameArg("","realignments","Realignment Scores Filename",true,"","string",cmd);
+		TCLAP::ValueArg<int> numThreadsArg("t","threads","Number of Threads Realigning Clusters",false,1,"integer",cmd);
+		TCLAP::ValueArg<int> maxPendingArg("","maxpending","Maximum Clusters Realigned Ahead of Output",false,1024,"integer",cmd);
 		cmd.parse(argc,argv);
 		
 		matchScore = matchScoreArg.getValue();
@@ -55,6 +397,8 @@ int main(int argc, char* argv[])
 		clustersFilename = clustersFilenameArg.getValue();
 		breakpointsFilename = breakpointsFilenameArg.getValue();
 		realignmentsFilename = realignmentsFilenameArg.getValue();
+		numThreads = numThreadsArg.getValue();
+		maxPending = maxPendingArg.getValue();
 	}
 	catch (TCLAP::ArgException &e)
 	{
@@ -62,8 +406,6 @@ int main(int argc, char* argv[])
 		exit(1);
 	}
 
-	SimpleAligner aligner(matchScore, misMatchScore, gapScore);
-
 	cerr << "Reading reference fasta" << endl;
 	
 	Sequences referenceSequences(1000 + maxFragmentLength * 2);
@@ -80,7 +422,7 @@ int main(int argc, char* argv[])
 	
 	cerr << "Reading spanning alignments" << endl;
 
-	unordered_map<AlignmentKey,SpanningAlignmentRecord> spanningAlignments;
+	SpanningAlignmentMap spanningAlignments;
 	{
 		ifstream spanningFile(spanningFilename.c_str());
 		CheckFile(spanningFile, spanningFilename);
@@ -94,7 +436,7 @@ int main(int argc, char* argv[])
 
 	cerr << "Reading cluster memberships" << endl;
 
-	unordered_map<int,vector<ClusterMemberRecord> > clusters;
+	ClusterMembershipMap clusters;
 	{
 		ifstream clustersFile(clustersFilename.c_str());
 		CheckFile(clustersFile, clustersFilename);
@@ -112,125 +454,44 @@ int main(int argc, char* argv[])
 		}
 	}
 
-	cerr << "Iterating breakpoints" << endl;
+	cerr << "Realigning to breakpoints" << endl;
 
+	// Consecutive breakpoints of the same cluster are read and realigned together
 	ifstream breakpointsFile(breakpointsFilename.c_str());
 	CheckFile(breakpointsFile, breakpointsFilename);
 
+	ClusterBreakpointsReader clusterReader(breakpointsFile);
+
 	ofstream realignmentsFile(realignmentsFilename.c_str());
 	CheckFile(realignmentsFile, realignmentsFilename);
 
-	BreakpointRecord breakpointRecord;
-	while (breakpointsFile >> breakpointRecord)
+	BreakpointRealigner realigner(referenceSequences, preppedReads, spanningAlignments, clusters, maxFragmentLength);
+
+	if (numThreads > 1)
 	{
-		// Find reads that support this breakpoint
-		unordered_map<int,vector<ClusterMemberRecord> >::const_iterator clusterIter = clusters.find(breakpointRecord.clusterID);
+		// Realignments are written in breakpoint file order irrespective
+		// of the order in which clusters complete, with at most maxpending
+		// clusters read ahead of those written
+		ClusterRealignerPool realignerPool(realigner, clusterReader, matchScore, misMatchScore, gapScore, max(maxPending, numThreads));
 
-		// Skip this breakpoint since there are no reads for it in the current read set
-		if (clusterIter == clusters.end())
-		{
-			continue;
-		}
+		realignerPool.Run(numThreads);
 
-		// Create breakend sequences of specific lengths, and record the start and end of the region from which the
-		// sequence originated in the reference genome.
-		string breakendSequence[2];
-		int breakendStart[2];
-		int breakendEnd[2];
-		for (int clusterEnd = 0; clusterEnd <= 1; clusterEnd++)
+		string realignments;
+		while (realignerPool.Take(realignments))
 		{
-			if (breakpointRecord.strand[clusterEnd] == "+")
-			{
-				breakendStart[clusterEnd] = breakpointRecord.position[clusterEnd] - maxFragmentLength + 1;
-				breakendEnd[clusterEnd] = breakpointRecord.position[clusterEnd];
-			}
-			else
-			{
-				breakendStart[clusterEnd] = breakpointRecord.position[clusterEnd];
-				breakendEnd[clusterEnd] = breakpointRecord.position[clusterEnd] + maxFragmentLength - 1;
-			}
-
-			referenceSequences.Get(breakpointRecord.chromosome[clusterEnd],
-			                       breakendStart[clusterEnd],
-			                       breakendEnd[clusterEnd],
-			                       breakendSequence[clusterEnd]);
+			realignmentsFile << realignments;
 		}
 
-		// Create a breakpoint sequence for each cluster end with the sequence of the reference maintained (not reverse
-		// complemented) for that breakend.  Also calculate an offset which will be used for calculating the 0-based
-		// positions of alignments in the breakpoint sequence.
-		string breakpointSequence[2];
-		for (int clusterEnd = 0; clusterEnd <= 1; clusterEnd++)
-		{
-			string selfbreakendSequence = breakendSequence[clusterEnd];
-			string mateBreakendSequence = breakendSequence[1-clusterEnd];
-
-			if (breakpointRecord.strand[clusterEnd] == "-")
-			{
-				ReverseComplement(selfbreakendSequence);
-			}
-
-			if (breakpointRecord.strand[1-clusterEnd] == "+")
-			{
-				ReverseComplement(mateBreakendSequence);
-			}
-
-			string insertedSequence = breakpointRecord.inserted;
-
-			if (clusterEnd == 1)
-			{
-				ReverseComplement(insertedSequence);
-			}
-
-			breakpointSequence[clusterEnd] = selfbreakendSequence + insertedSequence + mateBreakendSequence;
-		}
+		realignerPool.Join();
+	}
+	else
+	{
+		SimpleAligner aligner(matchScore, misMatchScore, gapScore);
 
-		// Iterate cluster reads and their alignments
-		const vector<ClusterMemberRecord>& memberships = clusterIter->second;
-		for (vector<ClusterMemberRecord>::const_iterator memberIter = memberships.begin(); memberIter != memberships.end(); memberIter++)
+		BreakpointRecordVec breakpoints;
+		while (clusterReader.Next(breakpoints))
 		{
-			const ClusterMemberRecord& memberRecord = *memberIter;
-
-			unordered_map<AlignmentKey,SpanningAlignmentRecord>::const_iterator alignIter = spanningAlignments.find(memberRecord.GetAlignmentKey());
-			DebugCheck(alignIter != spanningAlignments.end());
-
-			const SpanningAlignmentRecord& spanningRecord = alignIter->second;
-
-			// Calculate the length between the breakend and the start of the read
-			int templateLength = abs(spanningRecord.position - breakpointRecord.position[memberRecord.clusterEnd]) + 1;
-
-			// Calculate position of alignment in breakpoint sequence
-			int adjustedPosition = maxFragmentLength - templateLength;
-
-			// Set current read in prepped read set
-			preppedReads.SetCurrentRead(memberRecord.readID);
-
-			int score = 0;
-			if (adjustedPosition >= 16 && adjustedPosition <= breakpointSequence[memberRecord.clusterEnd].size() / 2)
-			{
-				// Pointer to first position to which the read should align
-				const char* refPtr = &breakpointSequence[memberRecord.clusterEnd][adjustedPosition];
-
-				// Align to forward strand of breakpoint sequence
-				score = aligner.AlignBandedSSE2BW7ScoreFwd(refPtr, preppedReads.StartPtr(memberRecord.readEnd, PlusStrand), preppedReads.EndPtr(memberRecord.readEnd, PlusStrand));
-			}
-
-			BreakAlignScoreRecord scoreRecord;
-
-			scoreRecord.clusterID = breakpointRecord.clusterID;
-			scoreRecord.breakpointID = breakpointRecord.breakpointID;
-			scoreRecord.clusterEnd = memberRecord.clusterEnd;
-			scoreRecord.libID = memberRecord.libID;
-			scoreRecord.readID = memberRecord.readID;
-			scoreRecord.readEnd = memberRecord.readEnd;
-			scoreRecord.alignID = memberRecord.alignID;
-			scoreRecord.alignedLength = preppedReads.ReadLength(memberRecord.readEnd);
-			scoreRecord.templateLength = templateLength;
-			scoreRecord.score = score;
-
-			realignmentsFile << scoreRecord;
+			realigner.RealignCluster(aligner, breakpoints, realignmentsFile);
 		}
 	}
 }
-
-
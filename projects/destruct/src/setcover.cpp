@@ -15,16 +15,78 @@
 #include <string>
 #include <map>
 #include <tclap/CmdLine.h>
+#include <boost/thread.hpp>
 
 using namespace boost;
 using namespace std;
 
 
+class ComponentSetCover
+{
+public:
+	ComponentSetCover(const vector<unordered_set<ReadRecord> >& clusters, const vector<double>& weights, const vector<vector<int> >& components)
+		: mClusters(clusters), mWeights(weights), mComponents(components), mNextComponent(0), mSolutions(components.size())
+	{
+	}
+
+	void Run(int numThreads)
+	{
+		thread_group threads;
+		for (int threadIdx = 0; threadIdx < numThreads; threadIdx++)
+		{
+			threads.create_thread(boost::bind(&ComponentSetCover::Worker, this));
+		}
+		threads.join_all();
+	}
+
+	void GetSolution(vector<int>& solution) const
+	{
+		for (vector<vector<int> >::const_iterator componentIter = mSolutions.begin(); componentIter != mSolutions.end(); componentIter++)
+		{
+			solution.insert(solution.end(), componentIter->begin(), componentIter->end());
+		}
+	}
+
+private:
+	void Worker()
+	{
+		while (true)
+		{
+			int componentIdx;
+
+			{
+				boost::mutex::scoped_lock lock(mMutex);
+
+				if (mNextComponent >= (int)mComponents.size())
+				{
+					return;
+				}
+
+				componentIdx = mNextComponent++;
+			}
+
+			LazySetCover(mClusters, mWeights, mComponents[componentIdx], mSolutions[componentIdx]);
+		}
+	}
+
+	const vector<unordered_set<ReadRecord> >& mClusters;
+	const vector<double>& mWeights;
+	const vector<vector<int> >& mComponents;
+
+	boost::mutex mMutex;
+	int mNextComponent;
+
+	vector<vector<int> > mSolutions;
+};
+
+
 int main(int argc, char* argv[])
 {
 	string clustersFilename;
 	string weightsFilename;
 	string assignmentsFilename;
+	bool partition;
+	int numThreads;
 	
 	try
 	{
@@ -32,11 +94,15 @@ int main(int argc, char* argv[])
 		TCLAP::ValueArg<string> clustersFilenameArg("c","clusters","Clusters Filename",true,"","string",cmd);
 		TCLAP::ValueArg<string> weightsFilenameArg("w","weights","Weights Filename",false,"","string",cmd);
 		TCLAP::ValueArg<string> assignmentsFilenameArg("a","assignments","Output Assignments Filename",true,"","string",cmd);
+		TCLAP::SwitchArg partitionArg("p","partition","Solve connected components independently",cmd);
+		TCLAP::ValueArg<int> numThreadsArg("t","threads","Number of threads for partitioned set cover",false,1,"integer",cmd);
 		cmd.parse(argc,argv);
 		
 		clustersFilename = clustersFilenameArg.getValue();
 		weightsFilename = weightsFilenameArg.getValue();
 		assignmentsFilename = assignmentsFilenameArg.getValue();
+		partition = partitionArg.getValue();
+		numThreads = numThreadsArg.getValue();
 	}
 	catch (TCLAP::ArgException &e)
 	{
@@ -115,10 +181,27 @@ int main(int argc, char* argv[])
 		weights = vector<double>(clusters.size(), 1.0);
 	}
 
-	cout << "Calculating set cover solution" << endl;
-
 	vector<int> solution;
-	SetCover(clusters, weights, solution);
+
+	if (partition)
+	{
+		cout << "Partitioning clusters" << endl;
+
+		vector<vector<int> > components;
+		SetComponents(clusters, components);
+
+		cout << "Calculating set cover solution for " << components.size() << " components" << endl;
+
+		ComponentSetCover componentSetCover(clusters, weights, components);
+		componentSetCover.Run(max(numThreads, 1));
+		componentSetCover.GetSolution(solution);
+	}
+	else
+	{
+		cout << "Calculating set cover solution" << endl;
+
+		SetCover(clusters, weights, solution);
+	}
 	
 	cout << "Assigning fragments to solution sets" << endl;
 	
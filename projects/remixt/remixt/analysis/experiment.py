@@ -1,6 +1,7 @@
 import collections
 import itertools
 import pickle
+import struct
 import numpy as np
 import pandas as pd
 
@@ -237,8 +238,97 @@ def create_experiment(count_filename, breakpoint_filename, experiment_filename,
 
     experiment = Experiment(count_data, breakpoint_data, max_brk_dist=max_brk_dist)
 
-    with open(experiment_filename, 'w') as f:
-        pickle.dump(experiment, f)
+    write_experiment(experiment, experiment_filename)
+
+
+experiment_file_magic = b'REMIXTEXP1'
+experiment_file_alignment = 64
+
+
+def _column_array(values):
+    """ Convert column values to a contiguous array with a fixed size dtype
+    """
+    values = np.asarray(values)
+    if values.dtype == object:
+        values = values.astype(str)
+    return np.ascontiguousarray(values)
+
+
+def write_experiment(experiment, experiment_filename):
+    """ Write an experiment to a columnar memory mappable file
+
+    Args:
+        experiment (Experiment): remixt experiment data
+        experiment_filename (str): output experiment filename
+
+    The file consists of a small pickled header followed by one aligned
+    array per table column.  Tables are stored without their index, and
+    string columns are stored as fixed width strings.  Use read_experiment
+    to load the file.
+
+    """
+
+    tables = collections.OrderedDict([
+        ('count_data', experiment.count_data),
+        ('breakpoint_data', experiment.breakpoint_data),
+        ('breakpoint_segment_data', experiment.breakpoint_segment_data),
+        ('adjacencies', pd.DataFrame(
+            np.array(sorted(experiment.adjacencies), dtype=int).reshape(-1, 2),
+            columns=['n_1', 'n_2'])),
+    ])
+
+    arrays = list()
+    header = {'tables': dict()}
+    offset = 0
+    for table_name, table in tables.iteritems():
+        columns = list()
+        for column in table.columns:
+            array = _column_array(table[column].values)
+            columns.append((column, array.dtype.str, len(array), offset))
+            arrays.append((offset, array))
+            offset += -(-array.nbytes // experiment_file_alignment) * experiment_file_alignment
+        header['tables'][table_name] = columns
+
+    header_bytes = pickle.dumps(header, protocol=2)
+    data_offset = len(experiment_file_magic) + 8 + len(header_bytes)
+    data_offset = -(-data_offset // experiment_file_alignment) * experiment_file_alignment
+
+    with open(experiment_filename, 'wb') as f:
+        f.write(experiment_file_magic)
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        for offset, array in arrays:
+            f.seek(data_offset + offset)
+            f.write(array.tobytes())
+
+
+def read_experiment(experiment_filename):
+    """ Read an experiment written by write_experiment or pickled
+
+    Args:
+        experiment_filename (str): input experiment filename
+
+    Returns:
+        Experiment: remixt experiment data
+
+    Columnar experiment files are memory mapped and tables are only loaded
+    when accessed, so concurrent tasks share the same pages.  Pickled
+    experiments, such as those produced by simulations, are unpickled.
+
+    """
+
+    with open(experiment_filename, 'rb') as f:
+        if f.read(len(experiment_file_magic)) != experiment_file_magic:
+            f.seek(0)
+            return pickle.load(f)
+
+        header_length = struct.unpack('<Q', f.read(8))[0]
+        header = pickle.loads(f.read(header_length))
+
+    data_offset = len(experiment_file_magic) + 8 + header_length
+    header['data_offset'] = -(-data_offset // experiment_file_alignment) * experiment_file_alignment
+
+    return MappedExperiment(experiment_filename, header)
 
 
 class Experiment(object):
@@ -311,15 +401,109 @@ class Experiment(object):
 
     @property
     def chains(self):
+        num_segments = len(self.l)
         chain_start = [0]
-        chain_end = [len(self.count_data.index)]
-        for idx in xrange(len(self.count_data.index) - 1):
+        chain_end = [num_segments]
+        for idx in xrange(num_segments - 1):
             if (idx, idx+1) not in self.adjacencies:
                 chain_end.append(idx+1)  # Half-open interval indexing [start, end)
                 chain_start.append(idx+1)
         return zip(sorted(chain_start), sorted(chain_end))
 
 
+class MappedExperiment(Experiment):
+    """ Experiment backed by a memory mapped columnar file.
+
+    Segment arrays are memory mapped from the file, and tables are created
+    on first access.  Arrays and tables are cached.  Create using
+    read_experiment.
+
+    """
+
+    def __init__(self, experiment_filename, header):
+
+        self.experiment_filename = experiment_filename
+        self.header = header
+        self._tables = dict()
+        self._columns = dict()
+        self._adjacencies = None
+        self._segment_chromosome_id = None
+        self._x = None
+
+    def get_column(self, table_name, column):
+        if (table_name, column) not in self._columns:
+            self._columns[(table_name, column)] = self._map_column(table_name, column)
+        return self._columns[(table_name, column)]
+
+    def _map_column(self, table_name, column):
+        for name, dtype, length, offset in self.header['tables'][table_name]:
+            if name == column:
+                break
+        else:
+            raise KeyError('no column {} in table {}'.format(column, table_name))
+
+        if length == 0:
+            return np.empty(0, dtype=dtype)
+
+        return np.asarray(np.memmap(self.experiment_filename, dtype=dtype, mode='r',
+            offset=self.header['data_offset'] + offset, shape=(length,)))
+
+    def get_table(self, table_name):
+        if table_name not in self._tables:
+            columns = [a[0] for a in self.header['tables'][table_name]]
+            data = collections.OrderedDict([(c, self.get_column(table_name, c)) for c in columns])
+            self._tables[table_name] = pd.DataFrame(data, columns=columns)
+        return self._tables[table_name]
+
+    @property
+    def count_data(self):
+        return self.get_table('count_data')
+
+    @property
+    def breakpoint_data(self):
+        return self.get_table('breakpoint_data')
+
+    @property
+    def breakpoint_segment_data(self):
+        return self.get_table('breakpoint_segment_data')
+
+    @property
+    def adjacencies(self):
+        if self._adjacencies is None:
+            self._adjacencies = set(zip(
+                self.get_column('adjacencies', 'n_1').tolist(),
+                self.get_column('adjacencies', 'n_2').tolist()))
+        return self._adjacencies
+
+    @property
+    def segment_chromosome_id(self):
+        if self._segment_chromosome_id is None:
+            self._segment_chromosome_id = self.get_column('count_data', 'chromosome').astype(object)
+        return self._segment_chromosome_id
+
+    @property
+    def segment_start(self):
+        return self.get_column('count_data', 'start')
+
+    @property
+    def segment_end(self):
+        return self.get_column('count_data', 'end')
+
+    @property
+    def segment_major_is_allele_a(self):
+        return self.get_column('count_data', 'major_is_allele_a')
+
+    @property
+    def x(self):
+        if self._x is None:
+            self._x = np.column_stack([self.get_column('count_data', c) for c in ('major_readcount', 'minor_readcount', 'readcount')])
+        return self._x
+
+    @property
+    def l(self):
+        return self.get_column('count_data', 'length')
+
+
 def create_segment_table(experiment):
     """ Create a table of segment data
 
@@ -491,22 +491,29 @@ def phase_segments(*allele_counts_tables):
     allele_diffs = list()
 
     for idx, allele_data in enumerate(allele_counts_tables):
-        
+
+        # Workaround for empty dataframe
+        if len(allele_data.index) == 0:
+            continue
+
         # Allele readcount table
         allele_data = allele_data.set_index(['chromosome', 'start', 'end', 'hap_label', 'allele_id'])['readcount'].astype(float).unstack(fill_value=0.0)
         
         # Create major allele call
-        allele_phase = allele_data.apply(np.argmax, axis=1)
-        allele_phase.name = 'major_allele_id'
+        allele_phase = pd.Series(
+            allele_data.columns.values[np.argmax(allele_data.values, axis=1)],
+            index=allele_data.index, name='major_allele_id')
         allele_phase = allele_phase.reset_index().reindex(columns=['chromosome', 'start', 'end', 'hap_label', 'major_allele_id'])
         allele_phase['library_idx'] = idx
         allele_phases.append(allele_phase)
 
         # Calculate major minor allele read counts, and diff between them
-        allele_data['major_readcount'] = allele_data.apply(np.max, axis=1)
-        allele_data['minor_readcount'] = allele_data.apply(np.min, axis=1)
-        allele_data['diff_readcount'] = allele_data['major_readcount'] - allele_data['minor_readcount']
-        allele_data['total_readcount'] = allele_data['major_readcount'] + allele_data['minor_readcount']
+        major_readcount = np.max(allele_data.values, axis=1)
+        minor_readcount = np.min(allele_data.values, axis=1)
+        allele_data = pd.DataFrame({
+            'diff_readcount': major_readcount - minor_readcount,
+            'total_readcount': major_readcount + minor_readcount,
+        }, index=allele_data.index)
 
         # Calculate normalized major and minor read counts difference per segment
         allele_diff = allele_data.groupby(level=[0, 1, 2])[['diff_readcount', 'total_readcount']].sum()
@@ -518,17 +525,18 @@ def phase_segments(*allele_counts_tables):
         allele_diff['library_idx'] = idx
         allele_diffs.append(allele_diff)
 
+    # Workaround for all empty dataframes
+    if len(allele_phases) == 0:
+        return [pd.DataFrame(columns=['chromosome', 'start', 'end', 'hap_label', 'allele_id', 'readcount', 'is_allele_a'])
+                for allele_data in allele_counts_tables]
+
     allele_phases = pd.concat(allele_phases, ignore_index=True)
     allele_diffs = pd.concat(allele_diffs, ignore_index=True)
 
-    def select_largest_diff(df):
-        largest_idx = np.argmax(df['norm_diff_readcount'].values)
-        return df['library_idx'].values[largest_idx]
-
-    # For each segment, select the library with the largest difference between major and minor
-    segment_library = allele_diffs.set_index(['chromosome', 'start', 'end']).groupby(level=[0, 1, 2]).apply(select_largest_diff)
-    segment_library.name = 'library_idx'
-    segment_library = segment_library.reset_index().reindex(columns=['chromosome', 'start', 'end', 'library_idx'])
+    # For each segment, select the library with the largest difference between major and minor,
+    # ties are broken by the first library as for np.argmax
+    largest_diff_idx = allele_diffs.groupby(['chromosome', 'start', 'end'])['norm_diff_readcount'].idxmax()
+    segment_library = allele_diffs.loc[largest_diff_idx.values, ['chromosome', 'start', 'end', 'library_idx']]
 
     # For each haplotype block in each segment, take the major allele call of the library
     # with the largest major minor difference and call it allele 'a'
@@ -23,8 +23,7 @@ def init(
     max_copy_number = remixt.config.get_param(config, 'max_copy_number')
     random_seed = config.get('random_seed', 1234)
 
-    with open(experiment_filename, 'r') as f:
-        experiment = pickle.load(f)
+    experiment = remixt.analysis.experiment.read_experiment(experiment_filename)
 
     np.random.seed(random_seed)
 
@@ -115,8 +114,7 @@ def fit_task(
     init_params,
     config,
 ):
-    with open(experiment_filename, 'r') as f:
-        experiment = pickle.load(f)
+    experiment = remixt.analysis.experiment.read_experiment(experiment_filename)
         
     fit_results = fit(experiment, init_params, config)
     
@@ -283,8 +281,7 @@ def collate(collate_filename, experiment_filename, init_results_filename, fit_re
             for key, value in results.iteritems():
                 collated[key] = results[key]
 
-        with open(experiment_filename, 'r') as f:
-            experiment = pickle.load(f)
+        experiment = remixt.analysis.experiment.read_experiment(experiment_filename)
 
         for init_id, results_filename in fit_results_filenames.iteritems():
             results = pickle.load(open(results_filename))
@@ -55,10 +55,10 @@ def phase_segments(allele_counts_filenames, phased_allele_counts_filenames):
         phased_allele_counts.to_csv(phased_allele_counts_filename, sep='\t', index=False)
 
 
-def prepare_readcount_table(segments_filename, alleles_filename, count_filename):
+def prepare_readcount_table(segments_filename, alleles_filename, count_filename, chunksize=1000000):
 
     segment_data = pd.read_csv(segments_filename, sep='\t', converters={'chromosome': str})
-    allele_data = pd.read_csv(alleles_filename, sep='\t', converters={'chromosome': str})
+    allele_data = pd.read_csv(alleles_filename, sep='\t', converters={'chromosome': str}, chunksize=chunksize)
 
     segment_allele_counts = remixt.analysis.segment.create_segment_allele_counts(segment_data, allele_data)
 
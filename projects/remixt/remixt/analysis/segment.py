@@ -194,7 +194,7 @@ def create_segment_allele_counts(segment_data, allele_data):
 
     Args:
         segment_data (pandas.DataFrame): counts of reads in segments
-        allele_data (pandas.DataFrame): counts of reads in segment haplotype blocks with phasing
+        allele_data (pandas.DataFrame or iterable): counts of reads in segment haplotype blocks with phasing
 
     Returns:
         pandas.DataFrame: output segment data
@@ -202,38 +202,64 @@ def create_segment_allele_counts(segment_data, allele_data):
     Input segment_counts table is expected to have columns 'chromosome', 'start', 'end', 'readcount'.
 
     Input phased_allele_counts table is expected to have columns 'chromosome', 'start', 'end', 
-    'hap_label', 'is_allele_a', 'readcount'.
+    'hap_label', 'is_allele_a', 'readcount'.  Phased allele counts may also be provided as an
+    iterable of chunks of the same table, for instance as streamed by `pandas.read_csv` with
+    `chunksize`, and will be aggregated chunk by chunk.
 
     Output table will have columns 'chromosome', 'start', 'end', 'readcount', 'major_readcount',
     'minor_readcount', 'major_is_allele_a'
     
     """
 
-    # Calculate allele a/b readcounts
-    allele_data = (
-        allele_data
-        .set_index(['chromosome', 'start', 'end', 'hap_label', 'is_allele_a'])['readcount']
-        .unstack(fill_value=0)
-        .reindex(columns=[0, 1])
-        .fillna(0.0)
-        .astype(int)
-        .rename(columns={0: 'allele_b_readcount', 1: 'allele_a_readcount'})
-    )
+    if isinstance(allele_data, pd.DataFrame):
+        allele_data = [allele_data]
 
-    # Merge haplotype blocks contained within the same segment
-    allele_data = allele_data.groupby(level=[0, 1, 2])[['allele_a_readcount', 'allele_b_readcount']].sum()
+    segment_index = pd.MultiIndex.from_arrays([
+        segment_data['chromosome'].values,
+        segment_data['start'].values,
+        segment_data['end'].values,
+    ])
 
-    # Reindex and fill with 0
-    allele_data = allele_data.reindex(segment_data.set_index(['chromosome', 'start', 'end']).index, fill_value=0)
+    num_segments = len(segment_index)
 
-    # Calculate major and minor readcounts, and relationship to allele a/b
-    allele_data['major_readcount'] = allele_data[['allele_a_readcount', 'allele_b_readcount']].apply(max, axis=1)
-    allele_data['minor_readcount'] = allele_data[['allele_a_readcount', 'allele_b_readcount']].apply(min, axis=1)
-    allele_data['major_is_allele_a'] = (allele_data['major_readcount'] == allele_data['allele_a_readcount']) * 1
+    allele_a_readcount = np.zeros(num_segments, dtype=int)
+    allele_b_readcount = np.zeros(num_segments, dtype=int)
 
-    # Merge allele data with segment data
-    segment_data = segment_data.merge(allele_data, left_on=['chromosome', 'start', 'end'], right_index=True)
+    # Accumulate allele a/b readcounts per segment, one chunk at a time,
+    # merging haplotype blocks contained within the same segment
+    for allele_chunk in allele_data:
+        if len(allele_chunk.index) == 0:
+            continue
 
-    return segment_data
+        segment_idx = segment_index.get_indexer(pd.MultiIndex.from_arrays([
+            allele_chunk['chromosome'].values,
+            allele_chunk['start'].values,
+            allele_chunk['end'].values,
+        ]))
+
+        is_allele_a = allele_chunk['is_allele_a'].values.astype(int)
+        readcount = allele_chunk['readcount'].values.astype(int)
+
+        # Remove allele counts for segments not in the segment table
+        is_in_segment = segment_idx >= 0
+        segment_idx = segment_idx[is_in_segment]
+        is_allele_a = is_allele_a[is_in_segment]
+        readcount = readcount[is_in_segment]
 
+        allele_a_readcount += np.bincount(
+            segment_idx, weights=readcount * is_allele_a,
+            minlength=num_segments).astype(int)
+        allele_b_readcount += np.bincount(
+            segment_idx, weights=readcount * (1 - is_allele_a),
+            minlength=num_segments).astype(int)
 
+    segment_data = segment_data.reset_index(drop=True)
+
+    # Calculate major and minor readcounts, and relationship to allele a/b
+    segment_data['allele_a_readcount'] = allele_a_readcount
+    segment_data['allele_b_readcount'] = allele_b_readcount
+    segment_data['major_readcount'] = np.maximum(allele_a_readcount, allele_b_readcount)
+    segment_data['minor_readcount'] = np.minimum(allele_a_readcount, allele_b_readcount)
+    segment_data['major_is_allele_a'] = (allele_a_readcount >= allele_b_readcount) * 1
+
+    return segment_data
@@ -25,8 +25,10 @@ cdef extern from "BamAlleleReader.h":
             string chromosome,
             int maxFragmentLength,
             int maxSoftClipped,
-            bool checkProperPair) except +
-        bool ReadAlignments(int maxAlignments) except +
+            bool checkProperPair,
+            int regionStart,
+            int regionEnd) except +
+        bool ReadAlignments(int maxAlignments) nogil except +
         vector[FragmentData] mFragmentData
         vector[AlleleData] mAlleleData
 
@@ -58,36 +60,39 @@ def create_allele_table(nrows):
 
 cdef class AlleleReader:
     cdef CAlleleReader *thisptr
-    def __cinit__(self, bam_filename, snp_filename, chromosome, max_fragment_length, max_soft_clipped, check_proper_pair):
-        self.thisptr = new CAlleleReader(bam_filename, snp_filename, chromosome, max_fragment_length, max_soft_clipped, check_proper_pair)
+    def __cinit__(self, bam_filename, snp_filename, chromosome, max_fragment_length, max_soft_clipped, check_proper_pair, start=None, end=None):
+        if start is None:
+            start = -1
+        if end is None:
+            end = -1
+        self.thisptr = new CAlleleReader(bam_filename, snp_filename, chromosome, max_fragment_length, max_soft_clipped, check_proper_pair, start, end)
     def __dealloc__(self):
         del self.thisptr
-    def ReadAlignments(self, max_alignments):
-        return self.thisptr.ReadAlignments(max_alignments)
+    def ReadAlignments(self, int max_alignments):
+        # Release the gil so that readers for separate regions can run in parallel threads
+        cdef bool result
+        with nogil:
+            result = self.thisptr.ReadAlignments(max_alignments)
+        return result
     def GetFragmentTable(self):
-        data = create_fragment_table(self.thisptr.mFragmentData.size())
-        cdef np.ndarray fragmentID = data['fragment_id'].values
-        cdef np.ndarray fragmentStart = data['start'].values
-        cdef np.ndarray fragmentEnd = data['end'].values
-        cdef np.ndarray mappingQuality = data['mapping_quality'].values
-        cdef np.ndarray isDuplicate = data['is_duplicate'].values
-        cdef int idx
-        for idx in range(self.thisptr.mFragmentData.size()):
-            fragmentID[idx] = self.thisptr.mFragmentData[idx].fragmentID
-            fragmentStart[idx] = self.thisptr.mFragmentData[idx].fragmentStart
-            fragmentEnd[idx] = self.thisptr.mFragmentData[idx].fragmentEnd
-            mappingQuality[idx] = self.thisptr.mFragmentData[idx].mappingQuality
-            isDuplicate[idx] = self.thisptr.mFragmentData[idx].isDuplicate
-        return data
+        # Fragment data is a contiguous array of structs of 5 ints, copy once into a 2d array
+        assert sizeof(FragmentData) == 5 * sizeof(int)
+        cdef int nrows = self.thisptr.mFragmentData.size()
+        if nrows == 0:
+            return create_fragment_table(0)
+        cdef int[:, ::1] view = <int[:nrows, :5]>(<int*>&self.thisptr.mFragmentData[0])
+        return pd.DataFrame(
+            np.array(view, dtype=np.int32),
+            columns=create_fragment_table(0).columns,
+        )
     def GetAlleleTable(self):
-        data = create_allele_table(self.thisptr.mAlleleData.size())
-        cdef np.ndarray fragmentID = data['fragment_id'].values
-        cdef np.ndarray position = data['position'].values
-        cdef np.ndarray isAlt = data['is_alt'].values
-        cdef int idx
-        for idx in range(self.thisptr.mAlleleData.size()):
-            fragmentID[idx] = self.thisptr.mAlleleData[idx].fragmentID
-            position[idx] = self.thisptr.mAlleleData[idx].position
-            isAlt[idx] = self.thisptr.mAlleleData[idx].isAlt
-        return data
-
+        # Allele data is a contiguous array of structs of 3 ints, copy once into a 2d array
+        assert sizeof(AlleleData) == 3 * sizeof(int)
+        cdef int nrows = self.thisptr.mAlleleData.size()
+        if nrows == 0:
+            return create_allele_table(0)
+        cdef int[:, ::1] view = <int[:nrows, :3]>(<int*>&self.thisptr.mAlleleData[0])
+        return pd.DataFrame(
+            np.array(view, dtype=np.int32),
+            columns=create_allele_table(0).columns,
+        )
@@ -14,6 +14,116 @@ import matplotlib.backends.backend_pdf
 
 import remixt.analysis.experiment
 import remixt.analysis.readdepth
+import remixt.utils
+
+
+def downsample_segments(cnv, max_points, weight_col='length', seed=1234):
+    """ Downsample segments to a fixed point budget
+
+    Args:
+        cnv (pandas.DataFrame): cnv table
+        max_points (int): maximum number of segments to retain
+
+    KwArgs:
+        weight_col (str): name of column by which segments are weighted when sampling
+        seed (int): seed for sampling segments
+
+    Returns:
+        pandas.DataFrame: subset of the cnv table
+
+    Segments are sampled without replacement with probability proportional to
+    'weight_col', using a fixed seed for reproducible plots.
+
+    """
+
+    if max_points is None or len(cnv.index) <= max_points:
+        return cnv
+
+    weights = cnv[weight_col].values.astype(float)
+    sample_prob = weights / weights.sum()
+
+    random_state = np.random.RandomState(seed)
+    sample_idx = random_state.choice(len(cnv.index), size=max_points, replace=False, p=sample_prob)
+
+    return cnv.iloc[np.sort(sample_idx)]
+
+
+def _create_density_image(density, color):
+    """ Create an RGBA image of a given color with alpha given by density in [0, 1]
+    """
+
+    image = np.zeros(density.shape + (4,))
+    image[:, :, :3] = colorConverter.to_rgb(color)
+    image[:, :, 3] = np.clip(density, 0., 1.)
+
+    return image
+
+
+def plot_cnv_segments_density(ax, cnv, chromosome_info, mincopies, maxcopies, major_col='major', minor_col='minor',
+                              bin_length=1000000, num_copies_bins=200):
+    """ Plot raw major/minor copy number as rasterized density images
+
+    Args:
+        ax (matplotlib.axes.Axes): plot axes
+        cnv (pandas.DataFrame): cnv table
+        chromosome_info (pandas.DataFrame): per chromosome start and length in plot
+        mincopies (float): minimum number of copies binned
+        maxcopies (float): maximum number of copies binned
+
+    KwArgs:
+        major_col (str): name of major copies column
+        minor_col (str): name of minor copies column
+        bin_length (int): genomic length of each bin
+        num_copies_bins (int): number of bins for copy number
+
+    Segments are binned into a 2-D histogram of genomic position by copy number for each
+    chromosome, weighted by the length of overlap between segments and position bins.
+    The columns 'chromosome', 'start' and 'end' are expected in chromosome coordinates.
+    Each chromosome is drawn as a single image rather than an artist per segment, clipped
+    to the end of the chromosome, with the final partial bin weighted by its length.
+
+    """
+
+    segment_color_major = plt.get_cmap('RdBu')(0.1)
+    segment_color_minor = plt.get_cmap('RdBu')(0.9)
+
+    copies_edges = np.linspace(mincopies, maxcopies, num_copies_bins + 1)
+
+    cnv = cnv.replace(np.inf, np.nan).dropna(subset=[major_col, minor_col])
+
+    for chromosome, chrom_cnv in cnv.groupby('chromosome'):
+        chromosome_start = chromosome_info.loc[chromosome, 'start']
+        chromosome_length = chromosome_info.loc[chromosome, 'length']
+
+        num_bins = max(1, int(np.ceil(chromosome_length / float(bin_length))))
+
+        # Expand each segment to the position bins it overlaps
+        start = chrom_cnv['start'].values
+        end = chrom_cnv['end'].values
+        start_bin = start // bin_length
+        end_bin = (end - 1) // bin_length
+        num_seg_bins = end_bin - start_bin + 1
+        seg_idx = np.repeat(np.arange(len(start)), num_seg_bins)
+        bin_idx = np.repeat(start_bin, num_seg_bins) + (np.arange(len(seg_idx)) - np.repeat(np.cumsum(num_seg_bins) - num_seg_bins, num_seg_bins))
+        overlap = (np.minimum(end[seg_idx], (bin_idx + 1) * bin_length) - np.maximum(start[seg_idx], bin_idx * bin_length))
+
+        bin_start = np.arange(num_bins) * bin_length
+        bin_width = np.minimum(bin_start + bin_length, chromosome_length) - bin_start
+
+        for col, color in ((major_col, segment_color_major), (minor_col, segment_color_minor)):
+            density, _, _ = np.histogram2d(
+                chrom_cnv[col].values[seg_idx], bin_idx,
+                bins=(copies_edges, np.arange(num_bins + 1)),
+                weights=overlap.astype(float) / bin_width[bin_idx])
+
+            image = ax.imshow(
+                _create_density_image(density, color),
+                extent=(chromosome_start, chromosome_start + num_bins * bin_length, mincopies, maxcopies),
+                origin='lower', aspect='auto', interpolation='nearest', zorder=2)
+
+            image.set_clip_path(Rectangle(
+                (chromosome_start, mincopies), chromosome_length, maxcopies - mincopies,
+                transform=ax.transData))
 
 
 def plot_cnv_segments(ax, cnv, major_col='major', minor_col='minor', do_fill=False,):
@@ -83,7 +193,8 @@ def plot_cnv_segments(ax, cnv, major_col='major', minor_col='minor', do_fill=Fal
 
 
 def plot_cnv_genome(ax, cnv, mincopies=-0.4, maxcopies=4, minlength=1000, major_col='major', minor_col='minor', 
-                    chromosome=None, start=None, end=None, tick_step=None, do_fill=False):
+                    chromosome=None, start=None, end=None, tick_step=None, do_fill=False, density=False,
+                    bin_length=1000000, num_copies_bins=200):
     """ Plot major/minor copy number across the genome
 
     Args:
@@ -101,6 +212,9 @@ def plot_cnv_genome(ax, cnv, mincopies=-0.4, maxcopies=4, minlength=1000, major_
         end (int): end of region in chromosome, None for end of chromosome
         tick_step (float): genomic length between x steps
         do_fill (boolean): fill to 0 for copy number
+        density (boolean): plot binned density images instead of segments
+        bin_length (int): genomic length of density bins
+        num_copies_bins (int): number of copy number density bins
 
     """
 
@@ -134,14 +248,20 @@ def plot_cnv_genome(ax, cnv, mincopies=-0.4, maxcopies=4, minlength=1000, major_
     if minlength is not None:
         cnv = cnv[cnv['length'] >= minlength]
 
-    cnv.set_index('chromosome', inplace=True)
-    cnv['chromosome_start'] = chromosome_info['start']
-    cnv.reset_index(inplace=True)
+    if density:
+        plot_cnv_segments_density(
+            ax, cnv, chromosome_info, mincopies, maxcopies, major_col=major_col, minor_col=minor_col,
+            bin_length=bin_length, num_copies_bins=num_copies_bins)
+
+    else:
+        cnv.set_index('chromosome', inplace=True)
+        cnv['chromosome_start'] = chromosome_info['start']
+        cnv.reset_index(inplace=True)
 
-    cnv['start'] = cnv['start'] + cnv['chromosome_start']
-    cnv['end'] = cnv['end'] + cnv['chromosome_start']
+        cnv['start'] = cnv['start'] + cnv['chromosome_start']
+        cnv['end'] = cnv['end'] + cnv['chromosome_start']
 
-    plot_cnv_segments(ax, cnv, major_col=major_col, minor_col=minor_col, do_fill=do_fill)
+        plot_cnv_segments(ax, cnv, major_col=major_col, minor_col=minor_col, do_fill=do_fill)
 
     ax.set_yticks(range(int(mincopies), int(maxcopies - mincopies) + 1))
     ax.set_ylim((mincopies, maxcopies))
@@ -256,7 +376,8 @@ def create_chromosome_color_map(chromosomes):
     return chromosome_colors
 
 
-def plot_cnv_scatter(ax, cnv, major_col='major', minor_col='minor', highlight_col=None, chromosome_colors=None):
+def plot_cnv_scatter(ax, cnv, major_col='major', minor_col='minor', highlight_col=None, chromosome_colors=None,
+                     max_points=None, density=False, num_bins=200):
     """ Scatter plot segments major by minor.
 
     Args:
@@ -268,10 +389,23 @@ def plot_cnv_scatter(ax, cnv, major_col='major', minor_col='minor', highlight_co
         minor_col (str): name of minor copies column
         highlight_col (str): name of boolean column for highlighting specific segments
         chromosome_colors (pandas.DataFrame): chromosome color table
+        max_points (int): maximum number of segments plotted, None for all segments
+        density (boolean): plot a binned density image instead of a scatter
+        num_bins (int): number of density bins for major and minor
+
+    The density image includes all segments, highlight_col and max_points are
+    not supported with density.
 
     """
 
-    cnv = cnv[['chromosome', 'start', 'end', 'length', major_col, minor_col]].replace(np.inf, np.nan).dropna()
+    if density and (highlight_col is not None or max_points is not None):
+        raise ValueError('highlight_col and max_points are not supported with density')
+
+    columns = ['chromosome', 'start', 'end', 'length', major_col, minor_col]
+    if highlight_col is not None:
+        columns.append(highlight_col)
+
+    cnv = cnv[columns].replace(np.inf, np.nan).dropna()
 
     # Create color map for chromosomes
     chromosomes = remixt.utils.sort_chromosome_names(cnv['chromosome'].unique())
@@ -298,16 +432,23 @@ def plot_cnv_scatter(ax, cnv, major_col='major', minor_col='minor', highlight_co
     minor_margin = 0.25 * (minor_max - minor_min)
     ylim = (minor_min - minor_margin, minor_max + minor_margin)
 
-    if highlight_col is not None:
-        cnv_greyed = cnv[~cnv[highlight_col]]
-        cnv = cnv[cnv[highlight_col]]
-        points = ax.scatter(cnv_greyed[major_col], cnv_greyed[minor_col],
-            s=cnv_greyed['scatter_size'], facecolor='#d0d0e0', edgecolor='#d0d0e0',
-            linewidth=0.0, zorder=2)
+    if density:
+        plot_cnv_scatter_density_image(ax, cnv, xlim, ylim, major_col=major_col, minor_col=minor_col,
+                                       chromosome_colors=chromosome_colors, num_bins=num_bins)
+
+    else:
+        cnv = downsample_segments(cnv, max_points)
+
+        if highlight_col is not None:
+            cnv_greyed = cnv[~cnv[highlight_col]]
+            cnv = cnv[cnv[highlight_col]]
+            points = ax.scatter(cnv_greyed[major_col], cnv_greyed[minor_col],
+                s=cnv_greyed['scatter_size'], facecolor='#d0d0e0', edgecolor='#d0d0e0',
+                linewidth=0.0, zorder=2)
 
-    points = ax.scatter(cnv[major_col], cnv[minor_col],
-        s=cnv['scatter_size'], facecolor=cnv['color'], edgecolor=cnv['color'],
-        linewidth=0.0, zorder=2)
+        points = ax.scatter(cnv[major_col], cnv[minor_col],
+            s=cnv['scatter_size'], facecolor=cnv['color'], edgecolor=cnv['color'],
+            linewidth=0.0, zorder=2)
     
     ax.set_xlim(xlim)
     ax.set_xlabel('major')
@@ -328,6 +469,58 @@ def plot_cnv_scatter(ax, cnv, major_col='major', minor_col='minor', highlight_co
     lgnd.get_frame().set_edgecolor('w')
 
 
+def plot_cnv_scatter_density_image(ax, cnv, xlim, ylim, major_col='major', minor_col='minor', chromosome_colors=None, num_bins=200):
+    """ Plot segments major by minor as a rasterized density image.
+
+    Args:
+        ax (matplotlib.axes.Axes): plot axes
+        cnv (pandas.DataFrame): copy number table
+        xlim (tuple): range of major copies binned
+        ylim (tuple): range of minor copies binned
+
+    KwArgs:
+        major_col (str): name of major copies column
+        minor_col (str): name of minor copies column
+        chromosome_colors (pandas.DataFrame): chromosome color table
+        num_bins (int): number of density bins for major and minor
+
+    Segments are binned into a length weighted 2-D histogram for each chromosome.  Each bin
+    is colored by the chromosome contributing the most length, with opacity scaled by
+    the total length in the bin.
+
+    """
+
+    if chromosome_colors is None:
+        chromosome_colors = create_chromosome_color_map(
+            remixt.utils.sort_chromosome_names(cnv['chromosome'].unique()))
+
+    major_edges = np.linspace(xlim[0], xlim[1], num_bins + 1)
+    minor_edges = np.linspace(ylim[0], ylim[1], num_bins + 1)
+
+    chromosome_density = list()
+    colors = list()
+    for chromosome, color in chromosome_colors[['chromosome', 'color']].values:
+        chrom_cnv = cnv[cnv['chromosome'] == chromosome]
+        density, _, _ = np.histogram2d(
+            chrom_cnv[minor_col].values, chrom_cnv[major_col].values,
+            bins=(minor_edges, major_edges), weights=chrom_cnv['length'].values.astype(float))
+        chromosome_density.append(density)
+        colors.append(colorConverter.to_rgb(color))
+    chromosome_density = np.array(chromosome_density)
+    colors = np.array(colors)
+
+    total_density = chromosome_density.sum(axis=0)
+
+    image = np.zeros(total_density.shape + (4,))
+    image[:, :, :3] = colors[np.argmax(chromosome_density, axis=0)]
+    if total_density.max() > 0:
+        image[:, :, 3] = np.sqrt(total_density / total_density.max())
+
+    ax.imshow(
+        image, extent=(xlim[0], xlim[1], ylim[0], ylim[1]),
+        origin='lower', aspect='auto', interpolation='nearest', zorder=2)
+
+
 def plot_cnv_scatter_density(fig, transform, data, major_col='major', minor_col='minor', annotate=(), info=''):
     """ Plot CNV Scatter with major minor densities on axes.
 
@@ -655,11 +848,10 @@ def plot_experiment(experiment_plot_filename, experiment_filename):
 
     Args:
         experiment_plot_filename (str): plot PDF filename
-        experiment_filename (str): filename of experiment pickle
+        experiment_filename (str): experiment filename
 
     """
-    with open(experiment_filename, 'r') as experiment_file:
-        exp = pickle.load(experiment_file)
+    exp = remixt.analysis.experiment.read_experiment(experiment_filename)
 
     fig = experiment_plot(exp, exp.cn, exp.h)
 
@@ -686,13 +878,12 @@ def ploidy_analysis_plots(experiment_filename, plots_filename):
     """ Generate ploidy analysis plots
 
     Args:
-        experiment_filename (str): experiment pickle filename
+        experiment_filename (str): experiment filename
         plots_filename (str): ploidy analysis plots filename
 
     """
 
-    with open(experiment_filename, 'r') as experiment_file:
-        experiment = pickle.load(experiment_file)
+    experiment = remixt.analysis.experiment.read_experiment(experiment_filename)
 
     read_depth = remixt.analysis.readdepth.calculate_depth(experiment)
     minor_modes = remixt.analysis.readdepth.calculate_minor_modes(read_depth)
@@ -78,6 +78,15 @@ bam_max_soft_clipped                        = 8
 # disable for irregular fragment length distribution
 bam_check_proper_pair                       = True
 
+# Length of regions extracted from the bam using the index, None for whole
+# chromosomes, and number of regions extracted in parallel threads
+bam_region_length                           = None
+bam_num_threads                             = 1
+
+# Length of regions if bam_region_length is None and regions are extracted
+# in parallel threads, bounding the data held in memory by each thread
+bam_threaded_region_length                  = 10000000
+
 # Heterozygous snp calling
 sequencing_base_call_error                  = 0.01
 het_snp_call_threshold                      = 0.9
@@ -1,3 +1,4 @@
+import multiprocessing.pool
 import numpy as np
 import pandas as pd
 
@@ -26,7 +27,54 @@ def _unique_index_append(store, key, data):
         store.append(key, data)
 
 
-def create_chromosome_seqdata(seqdata_filename, bam_filename, snp_filename, chromosome, max_fragment_length, max_soft_clipped, check_proper_pair):
+def _read_region_seqdata(bam_filename, snp_filename, chromosome, max_fragment_length, max_soft_clipped, check_proper_pair, region, chunksize=10000000):
+    """ Stream chunks of fragment and allele data for a region of a chromosome.
+    """
+
+    start, end = region
+
+    reader = remixt.bamreader.AlleleReader(
+        bam_filename,
+        snp_filename,
+        chromosome,
+        max_fragment_length,
+        max_soft_clipped,
+        check_proper_pair,
+        start=start,
+        end=end,
+    )
+
+    while reader.ReadAlignments(chunksize):
+        yield reader.GetFragmentTable(), reader.GetAlleleTable()
+
+
+def _read_region_seqdata_full(args):
+    """ Read all fragment and allele data for a region of a chromosome.
+    """
+
+    return list(_read_region_seqdata(*args))
+
+
+def create_regions(chromosome_length, region_length):
+    """ Create a list of disjoint regions tiling a chromosome.
+
+    Args:
+        chromosome_length(int): length of the chromosome
+        region_length(int): length of each region, None for a single region
+
+    Returns:
+        list of (start, end) tuples
+
+    """
+
+    if region_length is None:
+        return [(None, None)]
+
+    return [(start, min(start + region_length, chromosome_length))
+        for start in xrange(0, chromosome_length, region_length)]
+
+
+def create_chromosome_seqdata(seqdata_filename, bam_filename, snp_filename, chromosome, max_fragment_length, max_soft_clipped, check_proper_pair, regions=None, num_threads=1):
     """ Create seqdata from bam for one chromosome.
 
     Args:
@@ -38,21 +86,57 @@ def create_chromosome_seqdata(seqdata_filename, bam_filename, snp_filename, chro
         max_soft_clipped(int): maximum soft clipping for considering a read concordant
         check_proper_pair(boo): check proper pair flag
 
+    KwArgs:
+        regions(list): list of disjoint (start, end) regions to extract, None for the whole chromosome
+        num_threads(int): number of regions to read in parallel
+
+    Regions are queried using the bam index.  Fragments are assigned to the region containing
+    their start, and fragment ids are offset so as to be unique across the chromosome, output
+    is written in region order irrespective of the number of threads.  Regions read in parallel
+    are held in memory in full, a single region is streamed.
+
     """
 
-    reader = remixt.bamreader.AlleleReader(
-        bam_filename,
-        snp_filename,
-        chromosome,
-        max_fragment_length,
-        max_soft_clipped,
-        check_proper_pair,
-    )
+    if regions is None:
+        regions = [(None, None)]
+
+    region_args = [
+        (bam_filename, snp_filename, chromosome, max_fragment_length, max_soft_clipped, check_proper_pair, region)
+        for region in regions]
+
+    if num_threads > 1 and len(region_args) > 1:
+        pool = multiprocessing.pool.ThreadPool(num_threads)
 
-    with pd.HDFStore(seqdata_filename, 'w', complevel=9, complib='zlib') as store:
-        while reader.ReadAlignments(10000000):
-            _unique_index_append(store, _get_key('fragments', chromosome), reader.GetFragmentTable())
-            _unique_index_append(store, _get_key('alleles', chromosome), reader.GetAlleleTable())
+        # Read batches of regions in parallel, keeping at most one batch in memory
+        def iter_region_chunks():
+            for batch_idx in xrange(0, len(region_args), num_threads):
+                for region_chunks in pool.map(_read_region_seqdata_full, region_args[batch_idx:batch_idx+num_threads]):
+                    yield region_chunks
+
+    else:
+        pool = None
+
+        def iter_region_chunks():
+            for args in region_args:
+                yield _read_region_seqdata(*args)
+
+    try:
+        with pd.HDFStore(seqdata_filename, 'w', complevel=9, complib='zlib') as store:
+            fragment_id_offset = 0
+            for region_chunks in iter_region_chunks():
+                num_region_fragments = 0
+                for fragment_data, allele_data in region_chunks:
+                    fragment_data['fragment_id'] += fragment_id_offset
+                    allele_data['fragment_id'] += fragment_id_offset
+                    num_region_fragments += len(fragment_data.index)
+                    _unique_index_append(store, _get_key('fragments', chromosome), fragment_data)
+                    _unique_index_append(store, _get_key('alleles', chromosome), allele_data)
+                fragment_id_offset += num_region_fragments
+
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
 
 
 def merge_seqdata(out_filename, in_filenames):
@@ -0,0 +1,108 @@
+import sys
+import os
+import shutil
+import tempfile
+import pickle
+import unittest
+import numpy as np
+import pandas as pd
+
+remixt_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+sys.path.append(remixt_directory)
+
+import remixt.analysis.experiment
+
+np.random.seed(2014)
+
+
+class experiment_unittest(unittest.TestCase):
+
+
+    def setUp(self):
+        self.temp_directory = tempfile.mkdtemp()
+
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_directory)
+
+
+    def random_experiment(self, n=100, num_breakpoints=20):
+
+        count_data = pd.DataFrame({
+            'chromosome': np.repeat(['1', '2'], n // 2),
+            'start': np.tile(np.arange(0, n // 2) * 1000, 2),
+        })
+        count_data['end'] = count_data['start'] + 1000
+        count_data['length'] = 1000
+        count_data['major_readcount'] = np.random.randint(0, 1000, size=n)
+        count_data['minor_readcount'] = np.random.randint(0, 1000, size=n)
+        count_data['readcount'] = count_data['major_readcount'] + count_data['minor_readcount']
+        count_data['major_is_allele_a'] = np.random.randint(0, 2, size=n)
+
+        breakpoint_data = pd.DataFrame({
+            'prediction_id': np.arange(num_breakpoints),
+            'chromosome_1': np.random.choice(['1', '2'], size=num_breakpoints),
+            'strand_1': np.random.choice(['+', '-'], size=num_breakpoints),
+            'position_1': np.random.randint(0, n // 2, size=num_breakpoints) * 1000,
+            'chromosome_2': np.random.choice(['1', '2'], size=num_breakpoints),
+            'strand_2': np.random.choice(['+', '-'], size=num_breakpoints),
+            'position_2': np.random.randint(0, n // 2, size=num_breakpoints) * 1000,
+        })
+
+        return remixt.analysis.experiment.Experiment(count_data, breakpoint_data)
+
+
+    def test_write_read_experiment(self):
+
+        experiment = self.random_experiment()
+
+        experiment_filename = os.path.join(self.temp_directory, 'experiment.pickle')
+        remixt.analysis.experiment.write_experiment(experiment, experiment_filename)
+
+        mapped = remixt.analysis.experiment.read_experiment(experiment_filename)
+
+        self.assertTrue(np.all(mapped.x == experiment.x))
+        self.assertTrue(np.all(mapped.l == experiment.l))
+        self.assertTrue(np.all(mapped.segment_chromosome_id == experiment.segment_chromosome_id))
+        self.assertTrue(np.all(mapped.segment_start == experiment.segment_start))
+        self.assertTrue(np.all(mapped.segment_end == experiment.segment_end))
+        self.assertTrue(np.all(mapped.segment_major_is_allele_a == experiment.segment_major_is_allele_a))
+        self.assertEqual(mapped.adjacencies, experiment.adjacencies)
+        self.assertEqual(mapped.breakpoints, experiment.breakpoints)
+        self.assertEqual(mapped.chains, experiment.chains)
+        self.assertTrue(np.all(mapped.count_data.values == experiment.count_data.values))
+        self.assertTrue(np.all(mapped.breakpoint_segment_data.values == experiment.breakpoint_segment_data.values))
+
+
+    def test_mapped_experiment_cache(self):
+
+        experiment = self.random_experiment()
+
+        experiment_filename = os.path.join(self.temp_directory, 'experiment.experiment')
+        remixt.analysis.experiment.write_experiment(experiment, experiment_filename)
+
+        mapped = remixt.analysis.experiment.read_experiment(experiment_filename)
+
+        self.assertIs(mapped.x, mapped.x)
+        self.assertIs(mapped.l, mapped.l)
+        self.assertIs(mapped.segment_chromosome_id, mapped.segment_chromosome_id)
+        self.assertIs(mapped.count_data, mapped.count_data)
+
+
+    def test_read_pickled_experiment(self):
+
+        experiment = self.random_experiment()
+
+        experiment_filename = os.path.join(self.temp_directory, 'experiment.pickle')
+        with open(experiment_filename, 'w') as f:
+            pickle.dump(experiment, f)
+
+        loaded = remixt.analysis.experiment.read_experiment(experiment_filename)
+
+        self.assertTrue(np.all(loaded.x == experiment.x))
+        self.assertEqual(loaded.breakpoints, experiment.breakpoints)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import sys
+import os
+import unittest
+import numpy as np
+import pandas as pd
+
+remixt_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+sys.path.append(remixt_directory)
+
+import remixt.analysis.haplotype
+import remixt.analysis.segment
+
+np.random.seed(2014)
+
+
+class segment_unittest(unittest.TestCase):
+
+
+    def random_segments(self, n=100):
+
+        segment_data = pd.DataFrame({
+            'chromosome': np.repeat(['1', '2'], n // 2),
+            'start': np.tile(np.arange(0, n // 2) * 1000, 2),
+        })
+        segment_data['end'] = segment_data['start'] + 1000
+        segment_data['readcount'] = np.random.randint(0, 1000, size=n)
+
+        return segment_data
+
+
+    def random_allele_data(self, segment_data, n=1000):
+
+        allele_data = segment_data.iloc[np.random.randint(0, len(segment_data.index), size=n)][['chromosome', 'start', 'end']]
+        allele_data['hap_label'] = np.random.randint(0, 10, size=n)
+        allele_data['is_allele_a'] = np.random.randint(0, 2, size=n)
+        allele_data = allele_data.drop_duplicates(['chromosome', 'start', 'end', 'hap_label', 'is_allele_a'])
+        allele_data['readcount'] = np.random.randint(1, 100, size=len(allele_data.index))
+
+        return allele_data.reset_index(drop=True)
+
+
+    def test_create_segment_allele_counts(self):
+
+        segment_data = self.random_segments()
+        allele_data = self.random_allele_data(segment_data)
+
+        counts = remixt.analysis.segment.create_segment_allele_counts(segment_data, allele_data)
+
+        for idx, row in counts.iterrows():
+            segment_alleles = allele_data[
+                (allele_data['chromosome'] == row['chromosome']) &
+                (allele_data['start'] == row['start']) &
+                (allele_data['end'] == row['end'])]
+
+            allele_a_readcount = segment_alleles.loc[segment_alleles['is_allele_a'] == 1, 'readcount'].sum()
+            allele_b_readcount = segment_alleles.loc[segment_alleles['is_allele_a'] == 0, 'readcount'].sum()
+
+            self.assertEqual(row['allele_a_readcount'], allele_a_readcount)
+            self.assertEqual(row['allele_b_readcount'], allele_b_readcount)
+            self.assertEqual(row['major_readcount'], max(allele_a_readcount, allele_b_readcount))
+            self.assertEqual(row['minor_readcount'], min(allele_a_readcount, allele_b_readcount))
+            self.assertEqual(row['major_is_allele_a'], int(allele_a_readcount >= allele_b_readcount))
+
+
+    def test_create_segment_allele_counts_chunked(self):
+
+        segment_data = self.random_segments()
+        allele_data = self.random_allele_data(segment_data)
+
+        counts = remixt.analysis.segment.create_segment_allele_counts(segment_data, allele_data)
+
+        allele_chunks = (allele_data.iloc[idx:idx+77] for idx in range(0, len(allele_data.index), 77))
+        counts_chunked = remixt.analysis.segment.create_segment_allele_counts(segment_data, allele_chunks)
+
+        self.assertTrue(np.all(counts.values == counts_chunked.values))
+
+
+    def random_allele_counts(self, segment_data, n=1000):
+
+        allele_counts = segment_data.iloc[np.random.randint(0, len(segment_data.index), size=n)][['chromosome', 'start', 'end']]
+        allele_counts['hap_label'] = np.random.randint(0, 10, size=n)
+        allele_counts['allele_id'] = np.random.randint(0, 2, size=n)
+        allele_counts = allele_counts.drop_duplicates(['chromosome', 'start', 'end', 'hap_label', 'allele_id'])
+        allele_counts['readcount'] = np.random.randint(1, 100, size=len(allele_counts.index))
+
+        return allele_counts.reset_index(drop=True)
+
+
+    def test_phase_segments_empty(self):
+
+        segment_data = self.random_segments()
+        allele_counts = self.random_allele_counts(segment_data)
+        empty_allele_counts = allele_counts.iloc[:0]
+
+        phased = remixt.analysis.haplotype.phase_segments(empty_allele_counts)
+
+        self.assertEqual(len(phased), 1)
+        self.assertEqual(len(phased[0].index), 0)
+        self.assertIn('is_allele_a', phased[0].columns)
+
+        phased = remixt.analysis.haplotype.phase_segments(allele_counts, empty_allele_counts)
+        phased_single = remixt.analysis.haplotype.phase_segments(allele_counts)
+
+        self.assertEqual(len(phased[1].index), 0)
+        self.assertTrue(np.all(phased[0].values == phased_single[0].values))
+
+
+if __name__ == '__main__':
+    unittest.main()
+
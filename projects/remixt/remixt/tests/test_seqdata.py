@@ -63,6 +63,14 @@ class seqdata_unittest(unittest.TestCase):
         self.assertTrue(np.all(alleles.values == alleles_test.values))
 
 
+    def test_create_regions(self):
+
+        regions = remixt.seqdataio.create_regions(2500, 1000)
+
+        self.assertEqual(regions, [(0, 1000), (1000, 2000), (2000, 2500)])
+        self.assertEqual(remixt.seqdataio.create_regions(2500, None), [(None, None)])
+
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -0,0 +1,121 @@
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+
+remixt_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+sys.path.append(remixt_directory)
+
+import remixt.wrappers.utils
+
+np.random.seed(2014)
+
+
+class Counted(object):
+
+    def __init__(self):
+        self.num_calls = 0
+
+    def count(self, length):
+        self.num_calls += 1
+        return pd.DataFrame({'value':np.arange(length)})
+
+
+class EvictingCache(remixt.wrappers.utils.DataCache):
+    """ Cache for which entries are removed between lookup and read.
+    """
+    def _lookup(self, cache_filename):
+        found = remixt.wrappers.utils.DataCache._lookup(self, cache_filename)
+        remixt.wrappers.utils.remove(cache_filename)
+        return found
+
+
+class wrappers_unittest(unittest.TestCase):
+
+
+    def setUp(self):
+        self.temp_directory = tempfile.mkdtemp()
+        self.cache_directory = os.path.join(self.temp_directory, 'cache')
+        self.input_filename = os.path.join(self.temp_directory, 'input.txt')
+        with open(self.input_filename, 'w') as f:
+            f.write('input')
+
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_directory)
+
+
+    def test_cache_hit(self):
+
+        counted = Counted()
+
+        cache = remixt.wrappers.utils.DataCache(self.cache_directory)
+        result_1 = cache.cached(counted.count, [self.input_filename], 10)
+
+        # Hit from a second cache sharing the same directory
+        cache = remixt.wrappers.utils.DataCache(self.cache_directory)
+        result_2 = cache.cached(counted.count, [self.input_filename], 10)
+
+        self.assertEqual(counted.num_calls, 1)
+        self.assertTrue(result_1.equals(result_2))
+
+
+    def test_cache_miss(self):
+
+        counted = Counted()
+
+        cache = remixt.wrappers.utils.DataCache(self.cache_directory)
+        cache.cached(counted.count, [self.input_filename], 10)
+
+        # Miss on different arguments
+        result = cache.cached(counted.count, [self.input_filename], 11)
+        self.assertEqual(counted.num_calls, 2)
+        self.assertEqual(len(result.index), 11)
+
+        # Miss on modified input
+        with open(self.input_filename, 'w') as f:
+            f.write('modified input')
+        cache.cached(counted.count, [self.input_filename], 10)
+        self.assertEqual(counted.num_calls, 3)
+
+
+    def test_cache_eviction(self):
+
+        counted = Counted()
+
+        cache = remixt.wrappers.utils.DataCache(self.cache_directory)
+        cache.cached(counted.count, [self.input_filename], 1000)
+        os.utime(cache.get_cache_filename(cache.get_key(counted.count, [self.input_filename], (1000,), {})), (0, 0))
+
+        # Room for one entry only
+        entry_size = os.path.getsize(cache.get_cache_filename(cache.get_key(counted.count, [self.input_filename], (1000,), {})))
+        cache = remixt.wrappers.utils.DataCache(self.cache_directory, max_size=int(entry_size * 1.5))
+        cache.cached(counted.count, [self.input_filename], 1001)
+
+        # Least recently used entry evicted
+        self.assertEqual(len(os.listdir(self.cache_directory)), 1)
+        cache.cached(counted.count, [self.input_filename], 1001)
+        self.assertEqual(counted.num_calls, 2)
+        cache.cached(counted.count, [self.input_filename], 1000)
+        self.assertEqual(counted.num_calls, 3)
+
+
+    def test_cache_evicted_after_lookup(self):
+
+        counted = Counted()
+
+        remixt.wrappers.utils.DataCache(self.cache_directory).cached(counted.count, [self.input_filename], 10)
+
+        cache = EvictingCache(self.cache_directory)
+
+        result = cache.cached(counted.count, [self.input_filename], 10)
+        self.assertEqual(counted.num_calls, 2)
+        self.assertEqual(len(result.index), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
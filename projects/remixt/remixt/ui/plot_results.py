@@ -38,7 +38,8 @@ def create_plot(**args):
         fig = plt.figure(figsize=(8, 8))
         ax = plt.gca()
 
-        remixt.cn_plot.plot_cnv_scatter(ax, cnv, major_col='major_raw', minor_col='minor_raw')
+        remixt.cn_plot.plot_cnv_scatter(ax, cnv, major_col='major_raw', minor_col='minor_raw',
+            max_points=args['max_points'], density=args['density'])
 
         fig.savefig(args['plot_file'], bbox_inches='tight')
 
@@ -54,7 +55,8 @@ def create_plot(**args):
         fig = plt.figure(figsize=(12, 2))
         ax = plt.gca()
 
-        remixt.cn_plot.plot_cnv_genome(ax, cnv, major_col='major_raw', minor_col='minor_raw', maxcopies=6)
+        remixt.cn_plot.plot_cnv_genome(ax, cnv, major_col='major_raw', minor_col='minor_raw', maxcopies=6,
+            density=args['density'])
 
         fig.savefig(args['plot_file'], bbox_inches='tight')
 
@@ -70,6 +72,12 @@ def add_arguments(argparser):
         help='Output plot type',
         choices=plot_choices)
 
+    argparser.add_argument('--density', action='store_true', default=False,
+        help='Plot binned density images for scatter and raw plots')
+
+    argparser.add_argument('--max_points', type=int, default=None,
+        help='Maximum number of segments in scatter plots, not supported with --density')
+
     argparser.set_defaults(func=create_plot)
 
 
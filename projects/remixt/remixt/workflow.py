@@ -20,16 +20,31 @@ def create_extract_seqdata_workflow(
      config,
      ref_data_dir,
 ):
-    chromosomes = remixt.config.get_chromosomes(config, ref_data_dir)
+    chromosome_lengths = remixt.config.get_chromosome_lengths(config, ref_data_dir)
     snp_positions_filename = remixt.config.get_filename(config, ref_data_dir, 'snp_positions')
 
     bam_max_fragment_length = remixt.config.get_param(config, 'bam_max_fragment_length')
     bam_max_soft_clipped = remixt.config.get_param(config, 'bam_max_soft_clipped')
     bam_check_proper_pair = remixt.config.get_param(config, 'bam_check_proper_pair')
+    bam_region_length = remixt.config.get_param(config, 'bam_region_length')
+    bam_num_threads = remixt.config.get_param(config, 'bam_num_threads')
+
+    # Threads read each region in full, avoid reading whole chromosomes
+    if bam_region_length is None and bam_num_threads > 1:
+        bam_region_length = remixt.config.get_param(config, 'bam_threaded_region_length')
+
+    chromosome_regions = dict(
+        (chromosome, remixt.seqdataio.create_regions(length, bam_region_length))
+        for chromosome, length in chromosome_lengths.iteritems())
 
     workflow = pypeliner.workflow.Workflow()
 
-    workflow.setobj(obj=mgd.OutputChunks('chromosome'), value=chromosomes)
+    workflow.setobj(obj=mgd.OutputChunks('chromosome'), value=chromosome_lengths.keys())
+
+    workflow.setobj(
+        obj=mgd.TempOutputObj('regions', 'chromosome'),
+        value=chromosome_regions,
+    )
 
     workflow.transform(
         name='create_chromosome_seqdata',
@@ -45,6 +60,10 @@ def create_extract_seqdata_workflow(
             bam_max_soft_clipped,
             bam_check_proper_pair,
         ),
+        kwargs={
+            'regions': mgd.TempInputObj('regions', 'chromosome'),
+            'num_threads': bam_num_threads,
+        },
     )
 
     workflow.transform(
@@ -364,7 +383,7 @@ def create_remixt_seqdata_workflow(
     segment_filename = os.path.join(raw_data_directory, 'segments.tsv')
     haplotypes_filename = os.path.join(raw_data_directory, 'haplotypes.tsv')
     counts_table_template = os.path.join(raw_data_directory, 'counts', 'sample_{tumour_id}.tsv')
-    experiment_template = os.path.join(raw_data_directory, 'experiment', 'sample_{tumour_id}.pickle')
+    experiment_template = os.path.join(raw_data_directory, 'experiment', 'sample_{tumour_id}.experiment')
     ploidy_plots_template = os.path.join(raw_data_directory, 'ploidy_plots', 'sample_{tumour_id}.pdf')
 
     workflow = pypeliner.workflow.Workflow()
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+
+import remixt.seqdataio
+import remixt.segalg
+import remixt.analysis.haplotype
+
+
+def calculate_allele_counts(seqdata_filename):
+    """ Calculate reference and alternate counts for each SNP.
+
+    Args:
+        seqdata_filename (str): sequence data filename
+
+    Returns:
+        pandas.DataFrame: columns 'chromosome', 'position', 'ref_count', 'alt_count'
+
+    """
+
+    allele_counts = list()
+
+    chromosomes = remixt.seqdataio.read_chromosomes(seqdata_filename)
+
+    for chrom in chromosomes:
+
+        chrom_allele_counts = remixt.analysis.haplotype.read_snp_counts(seqdata_filename, chrom)
+
+        chrom_allele_counts['chromosome'] = chrom
+
+        allele_counts.append(chrom_allele_counts)
+
+    allele_counts = pd.concat(allele_counts, ignore_index=True)
+
+    return allele_counts
+
+
+def infer_het_positions(seqdata_filename):
+    """ Infer heterozygous SNP positions.
+
+    Args:
+        seqdata_filename (str): normal sequence data filename
+
+    Returns:
+        pandas.DataFrame: columns 'chromosome', 'position'
+
+    """
+
+    allele_count = calculate_allele_counts(seqdata_filename)
+
+    remixt.analysis.haplotype.infer_snp_genotype(allele_count)
+
+    het_positions = allele_count.loc[allele_count['AB'] == 1, ['chromosome', 'position']]
+
+    return het_positions
+
+
+def calculate_segment_counts(seqdata_filename, segments):
+    """ Count reads contained in each segment.
+
+    Args:
+        seqdata_filename (str): sequence data filename
+        segments (pandas.DataFrame): columns 'chromosome', 'start', 'end'
+
+    Returns:
+        pandas.DataFrame: segments with additional column 'count'
+
+    """
+
+    segment_counts = list()
+
+    chromosomes = remixt.seqdataio.read_chromosomes(seqdata_filename)
+
+    for chrom, chrom_segs in segments.groupby('chromosome'):
+
+        try:
+            chrom_reads = next(remixt.seqdataio.read_read_data(seqdata_filename, chromosome=chrom))
+        except StopIteration:
+            chrom_reads = pd.DataFrame(columns=['start', 'end'])
+
+        chrom_segs.sort('start', inplace=True)
+        chrom_reads.sort('start', inplace=True)
+
+        chrom_segs['count'] = remixt.segalg.contained_counts(
+            chrom_segs[['start', 'end']].values,
+            chrom_reads[['start', 'end']].values,
+        )
+
+        chrom_segs['count'] = chrom_segs['count'].astype(int)
+
+        segment_counts.append(chrom_segs)
+
+    segment_counts = pd.concat(segment_counts, ignore_index=True)
+
+    return segment_counts
+
+
+def calculate_bin_counts(seqdata_filename, chromosome_lengths, bin_length=1000):
+    """ Count reads contained in fixed length bins.
+
+    Args:
+        seqdata_filename (str): sequence data filename
+        chromosome_lengths (pandas.Series): chromosome lengths indexed by chromosome
+
+    KwArgs:
+        bin_length (int): length of bins
+
+    Returns:
+        pandas.DataFrame: columns 'chromosome', 'start', 'end', 'count'
+
+    Bins are ordered by chromosome as they appear in the sequence data.
+
+    """
+
+    bin_counts = list()
+
+    chromosomes = remixt.seqdataio.read_chromosomes(seqdata_filename)
+
+    for chrom in chromosomes:
+
+        reads = next(remixt.seqdataio.read_read_data(seqdata_filename, chromosome=chrom))
+
+        reads.sort('start', inplace=True)
+
+        bin_start = np.arange(0, chromosome_lengths[chrom], bin_length)
+
+        bins = pd.DataFrame({'start':bin_start, 'end':bin_start + bin_length})
+
+        bins['count'] = remixt.segalg.contained_counts(
+            bins[['start', 'end']].values,
+            reads[['start', 'end']].values,
+        )
+
+        bins['chromosome'] = chrom
+
+        bin_counts.append(bins[['chromosome', 'start', 'end', 'count']])
+
+    bin_counts = pd.concat(bin_counts, ignore_index=True)
+
+    return bin_counts
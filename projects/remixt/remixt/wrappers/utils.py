@@ -2,6 +2,8 @@ import os
 import shutil
 import subprocess
 import hashlib
+import pickle
+import tempfile
 
 
 def hash_kwargs(kwargs):
@@ -109,4 +111,107 @@ class InvalidInitParam(Exception):
     pass
 
 
+def file_signature(filename):
+    filename = os.path.realpath(filename)
+    return (filename, os.path.getsize(filename), os.path.getmtime(filename))
 
+
+class DataCache(object):
+    """ Cache of derived input data shared between tools and analyses.
+
+    Entries are keyed by a hash of the function, the signature (path, size
+    and modification time) of input files, and the pickled arguments, such
+    that reference data such as chromosome lengths and segmentations are
+    keyed by content.  Least recently used entries are evicted when the
+    total size of the cache exceeds max_size bytes.  Entries evicted by
+    another process between lookup and read are recomputed.
+
+    """
+    def __init__(self, cache_directory, max_size=20 * 1024**3):
+        self.cache_directory = cache_directory
+        self.max_size = max_size
+        makedirs(self.cache_directory)
+
+    def get_key(self, func, input_filenames, args, kwargs):
+        key = hashlib.sha224()
+        key.update(func.__module__ + '.' + func.__name__)
+        key.update(repr([file_signature(a) for a in input_filenames]))
+        key.update(pickle.dumps((args, sorted(kwargs.items())), 2))
+        return key.hexdigest()
+
+    def get_cache_filename(self, key):
+        return os.path.join(self.cache_directory, key)
+
+    def _lookup(self, cache_filename):
+        try:
+            os.utime(cache_filename, None)
+        except OSError as e:
+            if e.errno != 2:
+                raise
+            return False
+        return True
+
+    def _store(self, cache_filename, write):
+        fd, temp_filename = tempfile.mkstemp(dir=self.cache_directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            write(temp_filename)
+            os.rename(temp_filename, cache_filename)
+        finally:
+            remove(temp_filename)
+
+    def cached(self, func, input_filenames, *args, **kwargs):
+        """ Return func(*args, **kwargs), from the cache if available.
+        """
+        cache_filename = self.get_cache_filename(self.get_key(func, input_filenames, args, kwargs))
+        if self._lookup(cache_filename):
+            try:
+                with open(cache_filename, 'rb') as f:
+                    return pickle.load(f)
+            except IOError as e:
+                if e.errno != 2:
+                    raise
+        result = func(*args, **kwargs)
+        def write(filename):
+            with open(filename, 'wb') as f:
+                pickle.dump(result, f, pickle.HIGHEST_PROTOCOL)
+        self._store(cache_filename, write)
+        self.evict()
+        return result
+
+    def evict(self):
+        """ Remove least recently used entries until the cache is within max_size.
+        """
+        entries = list()
+        for name in os.listdir(self.cache_directory):
+            if name.endswith('.tmp'):
+                continue
+            filename = os.path.join(self.cache_directory, name)
+            try:
+                entries.append((os.path.getmtime(filename), os.path.getsize(filename), filename))
+            except OSError:
+                continue
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, filename in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            remove(filename)
+            total_size -= size
+
+
+def shared_cache(install_directory, cache_directory=None):
+    """ Data cache shared by tools installed in the same directory.
+
+    Args:
+        install_directory (str): tool installation directory
+
+    KwArgs:
+        cache_directory (str): cache directory, defaults to 'cache' alongside the tool installations
+
+    Returns:
+        DataCache: shared cache
+
+    """
+    if cache_directory is None:
+        cache_directory = os.path.join(os.path.dirname(os.path.abspath(install_directory)), 'cache')
+    return DataCache(cache_directory)
@@ -12,10 +12,9 @@ import scipy.stats
 
 import utils
 import cmdline
+import preprocess
 
-import remixt.seqdataio
 import remixt.segalg
-import remixt.analysis.haplotype
 
 
 def read_chromosome_lengths(chrom_info_filename):
@@ -27,81 +26,48 @@ def read_chromosome_lengths(chrom_info_filename):
     return chrom_info.set_index('chrom')['length']
 
 
-def create_segments(chrom_length, segment_length=1000):
+def write_cna(cna_filename, bin_counts):
 
-    seg_start = np.arange(0, chrom_length, segment_length)
-    seg_end = seg_start + segment_length
+    bin_counts = bin_counts.copy()
+    bin_counts['num_obs'] = 1
 
-    segments = pd.DataFrame({'start':seg_start, 'end':seg_end})
+    bin_counts.to_csv(cna_filename, sep='\t', index=False, header=False,
+        columns=['chromosome', 'end', 'count', 'num_obs'])
 
-    return segments
 
-
-def write_cna(cna_filename, seqdata_filename, chromosome_lengths, segment_length=1000):
-
-    with open(cna_filename, 'w') as cna:
-
-        chromosomes = remixt.seqdataio.read_chromosomes(seqdata_filename)
-
-        for chrom in chromosomes:
-
-            reads = next(remixt.seqdataio.read_read_data(seqdata_filename, chromosome=chrom))
-
-            reads.sort('start', inplace=True)
-
-            segments = create_segments(chromosome_lengths[chrom], segment_length)
-
-            segments['count'] = remixt.segalg.contained_counts(
-                segments[['start', 'end']].values,
-                reads[['start', 'end']].values,
-            )
-
-            segments['chromosome'] = chrom
-            segments['num_obs'] = 1
-
-            segments.to_csv(cna, sep='\t', index=False, header=False,
-                columns=['chromosome', 'end', 'count', 'num_obs'])
-
-
-def write_tumour_baf(baf_filename, normal_filename, tumour_filename):
+def write_tumour_baf(baf_filename, het_positions, tumour_allele_count):
 
     with open(baf_filename, 'w') as baf_file:
 
-        chromosomes = remixt.seqdataio.read_chromosomes(normal_filename)
-
-        for chrom in chromosomes:
-
-            normal_allele_count = remixt.analysis.haplotype.read_snp_counts(normal_filename, chrom)
-
-            remixt.analysis.haplotype.infer_snp_genotype(normal_allele_count)
-
-            het_positions = normal_allele_count.loc[normal_allele_count['AB'] == 1, ['position']]
+        for chrom, chrom_het_positions in het_positions.groupby('chromosome', sort=False):
 
-            tumour_allele_count = remixt.analysis.haplotype.read_snp_counts(tumour_filename, chrom)
-            tumour_allele_count = tumour_allele_count.merge(het_positions)
+            chrom_allele_count = tumour_allele_count.loc[
+                tumour_allele_count['chromosome'] == chrom, ['position', 'ref_count', 'alt_count']]
+            chrom_allele_count = chrom_allele_count.merge(chrom_het_positions[['position']])
 
-            tumour_allele_count['ref_count'] = tumour_allele_count['ref_count'].astype(int)
-            tumour_allele_count['alt_count'] = tumour_allele_count['alt_count'].astype(int)
+            chrom_allele_count['ref_count'] = chrom_allele_count['ref_count'].astype(int)
+            chrom_allele_count['alt_count'] = chrom_allele_count['alt_count'].astype(int)
 
-            tumour_allele_count['minor_count'] = np.minimum(
-                tumour_allele_count['ref_count'],
-                tumour_allele_count['alt_count'],
+            chrom_allele_count['minor_count'] = np.minimum(
+                chrom_allele_count['ref_count'],
+                chrom_allele_count['alt_count'],
             )
 
-            tumour_allele_count['total_count'] = (
-                tumour_allele_count['ref_count'] +
-                tumour_allele_count['alt_count']
+            chrom_allele_count['total_count'] = (
+                chrom_allele_count['ref_count'] +
+                chrom_allele_count['alt_count']
             )
 
-            tumour_allele_count['chromosome'] = chrom
+            chrom_allele_count['chromosome'] = chrom
 
-            tumour_allele_count.to_csv(baf_file, sep='\t', index=False, header=False,
+            chrom_allele_count.to_csv(baf_file, sep='\t', index=False, header=False,
                 columns=['chromosome', 'position', 'minor_count', 'total_count'])
 
 
+
 class CloneHDTool(object):
 
-    def __init__(self, install_directory):
+    def __init__(self, install_directory, cache_directory=None):
 
         self.install_directory = os.path.abspath(install_directory)
 
@@ -117,6 +83,8 @@ class CloneHDTool(object):
         self.filterhd_bin = os.path.join(self.bin_directory, 'filterHD')
         self.clonehd_bin = os.path.join(self.bin_directory, 'cloneHD')
 
+        self.cache = utils.shared_cache(self.install_directory, cache_directory=cache_directory)
+
 
     def get_analysis_filename(self, *names):
         return os.path.realpath(os.path.join(self.analysis_directory, *names))
@@ -188,10 +156,18 @@ class CloneHDAnalysis(object):
 
         chromosome_lengths = read_chromosome_lengths(self.tool.chrom_info_filename)
 
-        write_cna(self.get_analysis_filename('normal.cna.txt'), normal_filename, chromosome_lengths)
-        write_cna(self.get_analysis_filename('tumour.cna.txt'), tumour_filename, chromosome_lengths)
+        cache = self.tool.cache
+
+        normal_bin_counts = cache.cached(preprocess.calculate_bin_counts, [normal_filename], normal_filename, chromosome_lengths)
+        tumour_bin_counts = cache.cached(preprocess.calculate_bin_counts, [tumour_filename], tumour_filename, chromosome_lengths)
+
+        write_cna(self.get_analysis_filename('normal.cna.txt'), normal_bin_counts)
+        write_cna(self.get_analysis_filename('tumour.cna.txt'), tumour_bin_counts)
+
+        het_positions = cache.cached(preprocess.infer_het_positions, [normal_filename], normal_filename)
+        tumour_allele_count = cache.cached(preprocess.calculate_allele_counts, [tumour_filename], tumour_filename)
 
-        write_tumour_baf(self.get_analysis_filename('tumour.baf.txt'), normal_filename, tumour_filename)
+        write_tumour_baf(self.get_analysis_filename('tumour.baf.txt'), het_positions, tumour_allele_count)
 
         return 1
 
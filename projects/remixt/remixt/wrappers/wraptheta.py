@@ -11,59 +11,7 @@ import pandas as pd
 
 import utils
 import cmdline
-
-import remixt.seqdataio
-import remixt.segalg
-import remixt.analysis.haplotype
-
-
-def calculate_segment_counts(seqdata_filename, segments):
-
-    segment_counts = list()
-    
-    chromosomes = remixt.seqdataio.read_chromosomes(seqdata_filename)
-
-    for chrom, chrom_segs in segments.groupby('chromosome'):
-
-        try:
-            chrom_reads = next(remixt.seqdataio.read_read_data(seqdata_filename, chromosome=chrom))
-        except StopIteration:
-            chrom_reads = pd.DataFrame(columns=['start', 'end'])
-
-        chrom_segs.sort('start', inplace=True)
-        chrom_reads.sort('start', inplace=True)
-
-        chrom_segs['count'] = remixt.segalg.contained_counts(
-            chrom_segs[['start', 'end']].values,
-            chrom_reads[['start', 'end']].values,
-        )
-
-        chrom_segs['count'] = chrom_segs['count'].astype(int)
-
-        segment_counts.append(chrom_segs)
-
-    segment_counts = pd.concat(segment_counts, ignore_index=True)
-
-    return segment_counts
-
-
-def calculate_allele_counts(seqdata_filename):
-
-    allele_counts = list()
-    
-    chromosomes = remixt.seqdataio.read_chromosomes(seqdata_filename)
-
-    for chrom in chromosomes:
-
-        chrom_allele_counts = remixt.analysis.haplotype.read_snp_counts(seqdata_filename, chrom)
-
-        chrom_allele_counts['chromosome'] = chrom
-
-        allele_counts.append(chrom_allele_counts)
-
-    allele_counts = pd.concat(allele_counts, ignore_index=True)
-
-    return allele_counts
+import preprocess
 
 
 def write_theta_format_alleles(allele_filename, allele_count):
@@ -101,7 +49,7 @@ count_cols = [
 
 class ThetaTool(object):
 
-    def __init__(self, install_directory):
+    def __init__(self, install_directory, cache_directory=None):
 
         self.install_directory = os.path.abspath(install_directory)
 
@@ -112,6 +60,8 @@ class ThetaTool(object):
 
         self.max_copynumber = 6
 
+        self.cache = utils.shared_cache(self.install_directory, cache_directory=cache_directory)
+
 
     def install(self, **kwargs):
 
@@ -155,8 +105,10 @@ class ThetaAnalysis(object):
 
         segments = pd.read_csv(perfect_segment_filename, sep='\t', converters={'chromosome':str})
 
-        normal_segment_count = calculate_segment_counts(normal_filename, segments)
-        tumour_segment_count = calculate_segment_counts(tumour_filename, segments)
+        cache = self.tool.cache
+
+        normal_segment_count = cache.cached(preprocess.calculate_segment_counts, [normal_filename], normal_filename, segments)
+        tumour_segment_count = cache.cached(preprocess.calculate_segment_counts, [tumour_filename], tumour_filename, segments)
 
         count_data = pd.merge(normal_segment_count, tumour_segment_count,
             on=['chromosome', 'start', 'end'],
@@ -193,8 +145,8 @@ class ThetaAnalysis(object):
         normal_allele_filename = self.get_analysis_filename('normal_alleles.tsv')
         tumour_allele_filename = self.get_analysis_filename('tumour_alleles.tsv')
 
-        normal_allele_count = calculate_allele_counts(normal_filename)
-        tumour_allele_count = calculate_allele_counts(tumour_filename)
+        normal_allele_count = cache.cached(preprocess.calculate_allele_counts, [normal_filename], normal_filename)
+        tumour_allele_count = cache.cached(preprocess.calculate_allele_counts, [tumour_filename], tumour_filename)
 
         normal_allele_count = normal_allele_count.merge(chrom_idx)
         tumour_allele_count = tumour_allele_count.merge(chrom_idx)
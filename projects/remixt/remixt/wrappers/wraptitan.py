@@ -13,10 +13,7 @@ import scipy.stats
 
 import utils
 import cmdline
-
-import remixt.seqdataio
-import remixt.segalg
-import remixt.analysis.haplotype
+import preprocess
 
 
 def read_chromosome_lengths(chrom_info_filename):
@@ -28,71 +25,18 @@ def read_chromosome_lengths(chrom_info_filename):
     return chrom_info.set_index('chrom')['length']
 
 
-def create_segments(chrom_length, segment_length=1000):
-
-    seg_start = np.arange(0, chrom_length, segment_length)
-    seg_end = seg_start + segment_length
-
-    segments = np.array([seg_start, seg_end]).T
-
-    return segments
-
-
-def write_segment_count_wig(wig_filename, seqdata_filename, chromosome_lengths, segment_length=1000):
+def write_segment_count_wig(wig_filename, bin_counts, segment_length=1000):
 
     with open(wig_filename, 'w') as wig:
 
-        chromosomes = remixt.seqdataio.read_chromosomes(seqdata_filename)
-
-        for chrom in chromosomes:
+        for chrom, chrom_bin_counts in bin_counts.groupby('chromosome', sort=False):
 
             wig.write('fixedStep chrom={0} start=1 step={1} span={1}\n'.format(chrom, segment_length))
 
-            chrom_reads = next(remixt.seqdataio.read_read_data(seqdata_filename, chromosome=chrom))
-
-            chrom_reads.sort('start', inplace=True)
-
-            chrom_segments = create_segments(chromosome_lengths[chrom], segment_length)
-
-            seg_count = remixt.segalg.contained_counts(
-                chrom_segments,
-                chrom_reads[['start', 'end']].values,
-            )
-
-            wig.write('\n'.join([str(c) for c in seg_count]))
+            wig.write('\n'.join([str(c) for c in chrom_bin_counts['count']]))
             wig.write('\n')
 
 
-def calculate_allele_counts(seqdata_filename):
-
-    allele_counts = list()
-    
-    chromosomes = remixt.seqdataio.read_chromosomes(seqdata_filename)
-
-    for chrom in chromosomes:
-
-        chrom_allele_counts = remixt.analysis.haplotype.read_snp_counts(seqdata_filename, chrom)
-        
-        chrom_allele_counts['chromosome'] = chrom
-
-        allele_counts.append(chrom_allele_counts)
-
-    allele_counts = pd.concat(allele_counts, ignore_index=True)
-
-    return allele_counts
-
-
-def infer_het_positions(seqdata_filename):
-
-    allele_count = calculate_allele_counts(seqdata_filename)
-    
-    remixt.analysis.haplotype.infer_snp_genotype(allele_count)
-
-    het_positions = allele_count.loc[allele_count['AB'] == 1, ['chromosome', 'position']]
-
-    return het_positions
-
-
 def write_titan_format_alleles(allele_filename, allele_count):
 
     allele_count = allele_count.rename(columns={
@@ -134,7 +78,7 @@ def read_titan_params(params_filename):
 
 class TitanTool(object):
 
-    def __init__(self, install_directory):
+    def __init__(self, install_directory, cache_directory=None):
 
         self.install_directory = os.path.abspath(install_directory)
 
@@ -150,6 +94,8 @@ class TitanTool(object):
 
         self.max_copy_number = 5
 
+        self.cache = utils.shared_cache(self.install_directory, cache_directory=cache_directory)
+
 
     def get_analysis_filename(self, *names):
         return os.path.realpath(os.path.join(self.analysis_directory, *names))
@@ -238,14 +184,19 @@ class TitanAnalysis(object):
         normal_wig_filename = self.get_analysis_filename('normal.wig')
         tumour_wig_filename = self.get_analysis_filename('tumour.wig')
 
-        write_segment_count_wig(normal_wig_filename, normal_filename, chromosome_lengths)
-        write_segment_count_wig(tumour_wig_filename, tumour_filename, chromosome_lengths)
+        cache = self.tool.cache
+
+        normal_bin_counts = cache.cached(preprocess.calculate_bin_counts, [normal_filename], normal_filename, chromosome_lengths)
+        tumour_bin_counts = cache.cached(preprocess.calculate_bin_counts, [tumour_filename], tumour_filename, chromosome_lengths)
+
+        write_segment_count_wig(normal_wig_filename, normal_bin_counts)
+        write_segment_count_wig(tumour_wig_filename, tumour_bin_counts)
 
         # Identify het from normal
-        het_positions = infer_het_positions(normal_filename)
+        het_positions = cache.cached(preprocess.infer_het_positions, [normal_filename], normal_filename)
 
         # Filter tumour for het positions
-        tumour_allele_count = calculate_allele_counts(tumour_filename).merge(het_positions)
+        tumour_allele_count = cache.cached(preprocess.calculate_allele_counts, [tumour_filename], tumour_filename).merge(het_positions)
 
         tumour_allele_filename = self.get_analysis_filename('alleles.tsv')
         write_titan_format_alleles(tumour_allele_filename, tumour_allele_count)
@@ -64,13 +64,17 @@ AlleleReader::AlleleReader(const string& bamFilename,
                            const string& chromosome,
                            int maxFragmentLength,
                            int maxSoftClipped,
-                           bool checkProperPair)
+                           bool checkProperPair,
+                           int regionStart,
+                           int regionEnd)
 	: mChromosome(chromosome),
 	  mMaxFragmentLength(maxFragmentLength),
 	  mMaxSoftClipped(maxSoftClipped),
 	  mRefID(-1),
 	  mNextFragmentID(0),
-	  mCheckProperPair(checkProperPair)
+	  mCheckProperPair(checkProperPair),
+	  mRegionStart(regionStart),
+	  mRegionEnd(regionEnd)
 {
 	if (!mBamReader.Open(bamFilename))
 	{
@@ -105,8 +109,27 @@ AlleleReader::AlleleReader(const string& bamFilename,
 		}
 	}
 
-	// Set region in bam
-	mBamReader.SetRegion(BamRegion(mRefID, 0, mRefID+1, 1));
+	// Set region in bam, either the whole chromosome, or the requested region
+	// extended by the maximum fragment length so that fragments starting within
+	// the region can be paired with their downstream mate
+	if (mRegionStart < 0 && mRegionEnd < 0)
+	{
+		mBamReader.SetRegion(BamRegion(mRefID, 0, mRefID+1, 1));
+	}
+	else
+	{
+		if (mRegionStart < 0)
+		{
+			mRegionStart = 0;
+		}
+
+		if (mRegionEnd < 0)
+		{
+			mRegionEnd = mBamReader.GetReferenceData()[mRefID].RefLength;
+		}
+
+		mBamReader.SetRegion(BamRegion(mRefID, mRegionStart, mRefID, mRegionEnd + mMaxFragmentLength));
+	}
 
 	if (!snpFilename.empty())
 	{
@@ -218,11 +241,16 @@ bool AlleleReader::ReadAlignments(int maxAlignments)
 			bool valid2 = IsReadValidConcordant(alignment2, mMaxSoftClipped);
 			bool validPair = valid1 && valid2;
 			
+			// Calculate start and end of fragment alignment
+			int fragmentStart = min(alignment1.Position, alignment2.Position);
+			int fragmentEnd = fragmentStart + abs(alignment1.InsertSize);
+			
+			// Fragments are assigned to the region containing their start, ensuring
+			// each fragment is counted once for a set of disjoint regions
+			validPair = validPair && IsInRegion(fragmentStart);
+			
 			if (validPair)
 			{
-				// Calculate start and end of fragment alignment
-				int fragmentStart = min(alignment1.Position, alignment2.Position);
-				int fragmentEnd = fragmentStart + abs(alignment1.InsertSize);
 
 				// Set as duplicate if either is duplicate
 				int isDuplicate = (int)(alignment1.IsDuplicate() || alignment2.IsDuplicate());
@@ -285,7 +313,10 @@ bool AlleleReader::ReadAlignments(int maxAlignments)
 			// Check for an unmatched read stuck in the queue
 			else if (alignment.Position - nextAlignment.Position > 2.0 * mMaxFragmentLength)
 			{
-				cerr << "Warning: Could not match read " << nextAlignment.Name << endl;
+				if (IsInRegion(nextAlignment.Position) && IsInRegion(nextAlignment.MatePosition))
+				{
+					cerr << "Warning: Could not match read " << nextAlignment.Name << endl;
+				}
 			}
 			// Read pair status unavailable but read not yet considered stuck
 			else
@@ -321,7 +352,7 @@ bool AlleleReader::ReadAlignments(int maxAlignments)
 				mReadStatus[GetReadEnd(nextAlignment)].erase(readStatusIter);
 			}
 			// Check for an unmatched read stuck in the queue
-			else
+			else if (IsInRegion(nextAlignment.Position) && IsInRegion(nextAlignment.MatePosition))
 			{
 				cerr << "Warning: Could not match read " << nextAlignment.Name << endl;
 			}
@@ -396,3 +427,13 @@ void AlleleReader::Visit(const BamAlignment& alignment)
 	mFragmentID[GetReadEnd(alignment)].erase(alignment.Name);
 }
 
+bool AlleleReader::IsInRegion(int position) const
+{
+	if (mRegionStart < 0 && mRegionEnd < 0)
+	{
+		return true;
+	}
+
+	return position >= mRegionStart && position < mRegionEnd;
+}
+
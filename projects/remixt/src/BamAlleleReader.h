@@ -68,7 +68,9 @@ struct AlleleReader : BamTools::PileupVisitor, BamTools::DiscardAlignmentVisitor
 	             const std::string& chromosome,
 	             int maxFragmentLength,
 	             int maxSoftClipped,
-	             bool checkProperPair);
+	             bool checkProperPair,
+	             int regionStart=-1,
+	             int regionEnd=-1);
 
 	void ReadSNPs(const std::string& snpFilename);
 
@@ -78,6 +80,8 @@ struct AlleleReader : BamTools::PileupVisitor, BamTools::DiscardAlignmentVisitor
 	
 	void Visit(const BamTools::BamAlignment& alignment);
 	
+	bool IsInRegion(int position) const;
+	
 	BamTools::BamReader mBamReader;
 	const std::string& mChromosome;
 	std::string mAlternateChromosome;
@@ -89,6 +93,9 @@ struct AlleleReader : BamTools::PileupVisitor, BamTools::DiscardAlignmentVisitor
 	int mMaxSoftClipped;
 	bool mCheckProperPair;
 	
+	int mRegionStart;
+	int mRegionEnd;
+	
 	std::deque<BamTools::BamAlignment> mReadQueue;
 	std::map<std::string,BamTools::BamAlignment> mReadBuffer[2];
 	std::map<std::string,bool> mReadStatus[2];
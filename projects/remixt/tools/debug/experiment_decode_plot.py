@@ -4,12 +4,13 @@ import os
 import pickle
 import numpy as np
 
+import remixt.analysis.experiment
 import remixt.cn_plot
 
 argparser = argparse.ArgumentParser()
 
 argparser.add_argument('experiment',
-                       help='Input pickled experiment filename')
+                       help='Input experiment filename')
 
 argparser.add_argument('model',
                        help='Input pickled model filename')
@@ -22,8 +23,7 @@ argparser.add_argument('--hapdepth', nargs='+', type=float,
 
 args = vars(argparser.parse_args())
 
-with open(args['experiment'], 'r') as experiment_file:
-    experiment = pickle.load(experiment_file)
+experiment = remixt.analysis.experiment.read_experiment(args['experiment'])
 
 with open(args['model'], 'r') as model_file:
     model = pickle.load(model_file)
@@ -4,10 +4,12 @@ import os
 import pickle
 import numpy as np
 
+import remixt.analysis.experiment
+
 argparser = argparse.ArgumentParser()
 
 argparser.add_argument('experiment',
-                       help='Input pickled experiment filename')
+                       help='Input experiment filename')
 
 argparser.add_argument('model',
                        help='Input pickled model filename')
@@ -17,8 +19,7 @@ argparser.add_argument('--hapdepth', nargs='+', type=float,
 
 args = vars(argparser.parse_args())
 
-with open(args['experiment'], 'r') as experiment_file:
-    experiment = pickle.load(experiment_file)
+experiment = remixt.analysis.experiment.read_experiment(args['experiment'])
 
 with open(args['model'], 'r') as model_file:
     model = pickle.load(model_file)